@@ -5,25 +5,47 @@ server side of a python editor.
 
 """
 from .workers import calltips
+from .workers import close_document
+from .workers import complete_page
 from .workers import defined_names
+from .workers import defined_names_diff
+from .workers import get_stats
 from .workers import goto_assignments
 from .workers import icon_from_typename
+from .workers import open_document
 from .workers import quick_doc
+from .workers import resolve_completions
 from .workers import run_pyflakes
 # for backward compatibility, will be removed in a future release
 from .workers import run_pyflakes as run_frosted
+from .workers import run_lint
 from .workers import run_pep8
+from .workers import set_project_root
+from .workers import update_document
+from .workers import update_symbol_index
+from .workers import warmup_status
 from .workers import JediCompletionProvider
 
 
 __all__ = [
     'calltips',
+    'close_document',
+    'complete_page',
     'defined_names',
+    'defined_names_diff',
+    'get_stats',
     'goto_assignments',
     'icon_from_typename',
+    'open_document',
     'quick_doc',
+    'resolve_completions',
     'run_pyflakes',
     'run_frosted',
+    'run_lint',
     'run_pep8',
+    'set_project_root',
+    'update_document',
+    'update_symbol_index',
+    'warmup_status',
     'JediCompletionProvider'
 ]
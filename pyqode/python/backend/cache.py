@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the caches used by the backend workers to avoid
+recomputing expensive results (e.g. parsing a whole module with jedi) when the
+document did not change between two requests.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def content_hash(code):
+    """
+    Returns a hash of the given source code, suitable to be used as (part
+    of) a cache key.
+
+    :param code: source code (unicode string)
+    """
+    if code is None:
+        code = ''
+    return hashlib.md5(code.encode('utf-8', 'replace')).hexdigest()
+
+
+class LRUCache(object):
+    """
+    A thread safe least recently used cache with a memory cap.
+
+    Each entry has a size (an approximation of the memory it uses, e.g. the
+    length of the source code that was parsed to produce the entry). The least
+    recently used entries are evicted as soon as the total size exceeds
+    :attr:`max_size` or the number of entries exceeds :attr:`max_entries`.
+
+    The cache keeps a few statistics about its usage (hits, misses, evictions)
+    that can be retrieved using :meth:`stats`.
+    """
+    def __init__(self, max_entries=16, max_size=10 * 1024 * 1024):
+        """
+        :param max_entries: maximum number of entries
+        :param max_size: maximum cumulated size of the entries.
+        """
+        #: Maximum number of entries
+        self.max_entries = max_entries
+        #: Maximum cumulated size of the entries
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def size(self):
+        """
+        Returns the cumulated size of all entries.
+        """
+        return self._size
+
+    def get(self, key, default=None):
+        """
+        Gets the value associated with ``key`` and marks it as the most
+        recently used entry.
+
+        :param key: key of the entry to retrieve.
+        :param default: value returned if the key is not in the cache.
+        """
+        with self._lock:
+            try:
+                value, size = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries[key] = (value, size)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, size=1):
+        """
+        Adds (or replaces) an entry, evicting the least recently used entries
+        if needed.
+
+        Entries whose size is larger than :attr:`max_size` are not cached.
+
+        :param key: key of the entry
+        :param value: value of the entry
+        :param size: approximate size of the entry.
+        """
+        with self._lock:
+            self._discard(key)
+            if size > self.max_size:
+                return
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._entries and (len(self._entries) > self.max_entries or
+                                     self._size > self.max_size):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+
+    def discard(self, key):
+        """
+        Removes an entry from the cache (if it exists).
+        """
+        with self._lock:
+            self._discard(key)
+
+    def _discard(self, key):
+        try:
+            _, size = self._entries.pop(key)
+        except KeyError:
+            pass
+        else:
+            self._size -= size
+
+    def clear(self):
+        """
+        Removes all entries and resets the statistics.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """
+        Returns the cache statistics as a dict (json serializable).
+        """
+        return {
+            'entries': len(self._entries),
+            'size': self._size,
+            'max_entries': self.max_entries,
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the request cancellation API used by the workers.
+
+A request is cancelled when it has been superseded by a newer request made by
+the same editor on a newer version of the document (see
+:class:`pyqode.python.backend.pool.JobQueue`). Long running workers call
+:func:`check_cancelled` at safe points (e.g. between two analysis steps) so
+that the work on an obsolete version of a document is aborted as soon as
+possible.
+"""
+import threading
+
+
+_local = threading.local()
+
+
+class RequestCancelled(Exception):
+    """
+    Raised by :func:`check_cancelled` if the current request has been
+    cancelled.
+    """
+    pass
+
+
+def set_current_request(is_cancelled):
+    """
+    Sets the cancellation token of the request that is run by the current
+    thread.
+
+    :param is_cancelled: callable that returns True if the request has been
+        cancelled, None if the request cannot be cancelled.
+    """
+    _local.is_cancelled = is_cancelled
+
+
+def is_cancelled():
+    """
+    Returns True if the request run by the current thread has been
+    cancelled.
+    """
+    token = getattr(_local, 'is_cancelled', None)
+    return token is not None and token()
+
+
+def check_cancelled():
+    """
+    Aborts the current request if it has been cancelled.
+
+    :raises: RequestCancelled
+    """
+    if is_cancelled():
+        raise RequestCancelled()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the server side ranking of the code completions.
+
+The completions are filtered and sorted by :func:`rank` using a fuzzy match
+of the typed prefix, from the best match to the worst one:
+
+    1. the name starts with the prefix (same case)
+    2. the name starts with the prefix (ignoring case)
+    3. the prefix matches the start of the words of the name, e.g. ``gcw``
+       matches ``get_current_window`` and ``GetCurrentWindow``
+    4. the prefix is a subsequence of the name (ignoring case), the names
+       where the matched characters are the closest come first
+
+The ties are broken by putting the public names before the private ones
+(``_name``) and the special ones (``__name__``), then by sorting the names
+in alphabetical order.
+"""
+
+
+#: Match categories, see :func:`match_score`
+MATCH_PREFIX = 0
+MATCH_PREFIX_IGNORE_CASE = 1
+MATCH_WORDS = 2
+MATCH_SUBSEQUENCE = 3
+
+
+def _word_starts(name):
+    """
+    Returns the (lower case) characters that start a word of an identifier
+    (snake_case or CamelCase).
+    """
+    starts = []
+    previous = '_'
+    for char in name:
+        if char != '_' and (previous == '_' or
+                            (char.isupper() and previous.islower()) or
+                            (char.isdigit() and not previous.isdigit())):
+            starts.append(char.lower())
+        previous = char
+    return ''.join(starts)
+
+
+def _is_subsequence(prefix, text):
+    it = iter(text)
+    return all(char in it for char in prefix)
+
+
+def _subsequence_span(prefix, text):
+    """
+    Returns the (start, gaps) of the leftmost match of ``prefix`` as a
+    subsequence of ``text`` or None if it does not match.
+    """
+    start = position = -1
+    for char in prefix:
+        position = text.find(char, position + 1)
+        if position == -1:
+            return None
+        if start == -1:
+            start = position
+    return start, position - start + 1 - len(prefix)
+
+
+def _visibility(name):
+    if name.startswith('__') and name.endswith('__'):
+        return 2
+    if name.startswith('_'):
+        return 1
+    return 0
+
+
+def match_score(name, prefix):
+    """
+    Computes the match score of a name (the lowest score is the best match).
+
+    :param name: the completion name
+    :param prefix: the typed prefix
+    :returns: a sortable score or None if the name does not match the
+        prefix.
+    """
+    tie_break = (_visibility(name), name.lower(), name)
+    if name.startswith(prefix):
+        return (MATCH_PREFIX, 0, 0) + tie_break
+    lower_name = name.lower()
+    lower_prefix = prefix.lower()
+    if lower_name.startswith(lower_prefix):
+        return (MATCH_PREFIX_IGNORE_CASE, 0, 0) + tie_break
+    if _is_subsequence(lower_prefix, _word_starts(name)):
+        return (MATCH_WORDS, 0, 0) + tie_break
+    span = _subsequence_span(lower_prefix, lower_name)
+    if span is None:
+        return None
+    start, gaps = span
+    return (MATCH_SUBSEQUENCE, gaps, start) + tie_break
+
+
+def rank(items, prefix, key=None):
+    """
+    Filters and sorts a list of completions.
+
+    :param items: the completions
+    :param prefix: the typed prefix
+    :param key: function that returns the name of a completion, the items
+        are the names if None.
+    :returns: the list of the matching items, the best match first.
+    """
+    scored = []
+    for index, item in enumerate(items):
+        score = match_score(item if key is None else key(item), prefix)
+        if score is not None:
+            scored.append((score, index, item))
+    scored.sort()
+    return [item for _, _, item in scored]
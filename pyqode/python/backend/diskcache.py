@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains a persistent cache that keeps the results of expensive
+analysis (e.g. the list of the members of a module of an installed package)
+on disk so that they survive a restart of the backend.
+
+Each entry records the files it depends on (with their modification time and
+size) and is discarded as soon as one of them changes. The cache directory is
+specific to the interpreter (and the jedi version), results computed by
+another interpreter are never used.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import sys
+import threading
+
+
+#: Version of the on-disk format, bump it whenever the format of the entries
+#: changes.
+CACHE_VERSION = 1
+
+
+def _logger():
+    return logging.getLogger(__name__)
+
+
+def interpreter_id():
+    """
+    Returns a string that identifies the running interpreter and the version
+    of jedi.
+    """
+    import jedi
+    key = '%s|%s|%s|%d' % (sys.executable, sys.version, jedi.__version__,
+                           CACHE_VERSION)
+    return hashlib.md5(key.encode('utf-8', 'replace')).hexdigest()
+
+
+def file_signature(path):
+    """
+    Returns the (path, mtime, size) signature of a file, None if the file
+    does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return path, stat.st_mtime, stat.st_size
+
+
+class DiskCache(object):
+    """
+    A persistent cache with a size limit.
+
+    Entries are stored in the memory once they have been loaded or computed
+    and written to a pickle file (one per entry). When the cumulated size of
+    the files exceeds :attr:`max_size`, the least recently used entries are
+    removed (see :meth:`prune`).
+    """
+    def __init__(self, directory, max_size=50 * 1024 * 1024):
+        """
+        :param directory: the cache directory, the interpreter id is appended
+            to this path.
+        :param max_size: maximum size of the cache directory (in bytes)
+        """
+        #: Directory where the entries of the interpreter are stored
+        self.directory = os.path.join(directory, interpreter_id())
+        #: Maximum size of the cache directory
+        self.max_size = max_size
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        """
+        Loads all the valid entries in memory (e.g. when the backend starts)
+        and prunes the cache.
+
+        :returns: the number of loaded entries
+        """
+        if not os.path.isdir(self.directory):
+            return 0
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.pickle'):
+                continue
+            entry = self._read(os.path.join(self.directory, filename))
+            if entry is not None and self._is_valid(entry):
+                with self._lock:
+                    self._entries[entry['key']] = entry
+        self.prune()
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Gets the value of an entry.
+
+        :returns: the value or None if there is no valid entry for the key.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            entry = self._read(self._path(key))
+        if entry is None or entry['key'] != key or \
+                not self._is_valid(entry):
+            with self._lock:
+                self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        with self._lock:
+            self._entries[key] = entry
+        self.hits += 1
+        return entry['value']
+
+    def put(self, key, value, dependencies=()):
+        """
+        Adds an entry to the cache.
+
+        :param key: key of the entry, must be hashable and picklable
+        :param value: the value to cache, must be picklable
+        :param dependencies: paths of the files the value depends on.
+        """
+        signatures = []
+        for path in dependencies:
+            signature = file_signature(path)
+            if signature is None:
+                return
+            signatures.append(signature)
+        entry = {'key': key, 'dependencies': signatures, 'value': value}
+        with self._lock:
+            self._entries[key] = entry
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            path = self._path(key)
+            tmp_path = '%s.%d.tmp' % (path, os.getpid())
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entry, f, 2)
+            if os.path.exists(path):
+                os.remove(path)
+            os.rename(tmp_path, path)
+        except (IOError, OSError, pickle.PicklingError):
+            _logger().exception('failed to write cache entry %r', key)
+            return
+        self.prune()
+
+    def prune(self):
+        """
+        Removes the least recently used entries until the size of the cache
+        directory is below :attr:`max_size`.
+        """
+        try:
+            filenames = os.listdir(self.directory)
+        except OSError:
+            return
+        files = []
+        total = 0
+        for filename in filenames:
+            path = os.path.join(self.directory, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_atime, stat.st_size, path))
+            total += stat.st_size
+        files.sort()
+        while files and total > self.max_size:
+            _, size, path = files.pop(0)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+            with self._lock:
+                for key, entry in list(self._entries.items()):
+                    if self._path(key) == path:
+                        del self._entries[key]
+
+    def clear(self):
+        """
+        Removes all the entries.
+        """
+        with self._lock:
+            self._entries.clear()
+        try:
+            filenames = os.listdir(self.directory)
+        except OSError:
+            return
+        for filename in filenames:
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except OSError:
+                pass
+
+    def stats(self):
+        """
+        Returns a dict with the cache statistics.
+        """
+        return {'directory': self.directory, 'entries': len(self._entries),
+                'max_size': self.max_size, 'hits': self.hits,
+                'misses': self.misses}
+
+    def _path(self, key):
+        digest = hashlib.md5(repr(key).encode('utf-8', 'replace')).hexdigest()
+        return os.path.join(self.directory, digest + '.pickle')
+
+    @staticmethod
+    def _is_valid(entry):
+        for signature in entry['dependencies']:
+            if file_signature(signature[0]) != tuple(signature):
+                return False
+        return True
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except (IOError, OSError):
+            return None
+        except Exception:
+            # corrupted entry
+            _logger().debug('removing corrupted cache entry %r', path)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        # touch the file so that prune removes the least recently used
+        # entries first (atime is not updated on all file systems)
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return entry
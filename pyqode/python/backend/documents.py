@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the document store used to keep a shadow copy of the
+editor documents on the backend side.
+
+Instead of sending the whole document with every request, the editor opens
+the document once and then only sends the text edits that happened since
+the previous synchronisation. Each synchronisation bumps the document
+version and the workers read the shadow copy that matches the version of the
+request.
+"""
+import threading
+
+
+def common_prefix_length(a, b):
+    """
+    Returns the length of the common prefix of two sequences (strings or
+    lists).
+    """
+    # binary search using slice comparisons (memcmp) which is a lot faster
+    # than comparing the items one by one in python.
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def common_suffix_length(a, b, limit):
+    """
+    Returns the length of the common suffix of two sequences, the result is
+    never greater than ``limit``.
+    """
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def compute_edit(old_text, new_text):
+    """
+    Computes the edit that transforms ``old_text`` into ``new_text``.
+
+    :returns: a tuple (start, end, replacement) where start and end are the
+        offsets of the replaced range in ``old_text`` or None if both texts
+        are equal.
+    """
+    if old_text == new_text:
+        return None
+    prefix = common_prefix_length(old_text, new_text)
+    limit = min(len(old_text), len(new_text)) - prefix
+    suffix = common_suffix_length(old_text, new_text, limit)
+    return (prefix, len(old_text) - suffix,
+            new_text[prefix:len(new_text) - suffix])
+
+
+def apply_edits(text, edits):
+    """
+    Applies a list of edits to a text.
+
+    :param text: the text to modify
+    :param edits: list of (start, end, replacement) tuples. Edits are applied
+        sequentially, offsets of an edit are relative to the text produced
+        by the previous edits.
+    :returns: the modified text
+    :raises: ValueError if an edit range is out of the text bounds.
+    """
+    for start, end, replacement in edits:
+        if not 0 <= start <= end <= len(text):
+            raise ValueError('invalid edit range: (%d, %d)' % (start, end))
+        text = text[:start] + replacement + text[end:]
+    return text
+
+
+class Document(object):
+    """
+    The shadow copy of an editor document.
+    """
+    def __init__(self, document_id, text, version, path=None):
+        #: Unique identifier of the document (generated by the editor)
+        self.document_id = document_id
+        #: Text of the document
+        self.text = text
+        #: Version of the text
+        self.version = version
+        #: File path of the document (may be None)
+        self.path = path
+
+
+class DocumentStore(object):
+    """
+    Keeps the shadow copies of the documents opened in the editors.
+    """
+    def __init__(self):
+        self._documents = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def open(self, document_id, text, version, path=None):
+        """
+        Opens (or resets) a document.
+        """
+        with self._lock:
+            self._documents[document_id] = Document(
+                document_id, text, version, path)
+
+    def update(self, document_id, edits, base_version, version, length=None,
+               path=None):
+        """
+        Applies a list of edits to a document.
+
+        :param document_id: id of the document to update
+        :param edits: list of edits, see :func:`apply_edits`
+        :param base_version: version the edits apply to.
+        :param version: version of the document once the edits are applied
+        :param length: expected length of the resulting text, used to detect
+            a desynchronisation. None to skip the check.
+        :param path: new document path (None to keep the current one)
+        :returns: True if the edits could be applied, False if the document is
+            unknown or out of sync. In that case the editor must open the
+            document again.
+        """
+        with self._lock:
+            try:
+                document = self._documents[document_id]
+            except KeyError:
+                return False
+            if document.version != base_version:
+                del self._documents[document_id]
+                return False
+            try:
+                text = apply_edits(document.text, edits)
+            except ValueError:
+                del self._documents[document_id]
+                return False
+            if length is not None and len(text) != length:
+                del self._documents[document_id]
+                return False
+            document.text = text
+            document.version = version
+            if path is not None:
+                document.path = path
+            return True
+
+    def close(self, document_id):
+        """
+        Removes a document from the store.
+        """
+        with self._lock:
+            self._documents.pop(document_id, None)
+
+    def get(self, document_id, version=None):
+        """
+        Gets the text of a document.
+
+        :param document_id: id of the document
+        :param version: the expected version, None to get the latest version.
+        :returns: the document text or None if the document is unknown or if
+            the shadow copy version does not match the requested version.
+        """
+        with self._lock:
+            try:
+                document = self._documents[document_id]
+            except KeyError:
+                return None
+            if version is not None and document.version != version:
+                return None
+            return document.text
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the instrumentation of the backend workers.
+
+The workers decorated with :func:`instrumented` record their call count,
+their wall time (total, max and histogram), the size of their input (i.e. the
+length of the code) and the size of their result. The statistics are
+returned by the :func:`pyqode.python.backend.workers.get_stats` worker and
+can be written to a file when the server stops (``server.py --stats-file``).
+"""
+import functools
+import json
+import threading
+import time
+
+from pyqode.python.backend import tracing
+from pyqode.python.backend.cancellation import RequestCancelled
+
+try:
+    clock = time.perf_counter
+except AttributeError:
+    clock = time.time
+
+
+#: Upper bounds (in milliseconds) of the buckets of the wall time histogram,
+#: the last bucket has no upper bound.
+HISTOGRAM_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+_lock = threading.Lock()
+_stats = {}
+
+
+class WorkerStats(object):
+    """
+    The statistics of a worker.
+    """
+    def __init__(self):
+        #: Number of calls
+        self.count = 0
+        #: Number of calls that raised an exception
+        self.errors = 0
+        #: Number of calls that have been cancelled
+        self.cancelled = 0
+        #: Total wall time, in seconds
+        self.total_time = 0.0
+        #: Longest call, in seconds
+        self.max_time = 0.0
+        #: Number of calls per bucket of :data:`HISTOGRAM_BUCKETS`
+        self.histogram = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        #: Total and max size of the inputs
+        self.input_size = 0
+        self.max_input_size = 0
+        #: Total size of the results
+        self.result_size = 0
+
+    def record(self, duration, input_size=0, result_size=0, error=False,
+               cancelled=False):
+        self.count += 1
+        self.errors += bool(error)
+        self.cancelled += bool(cancelled)
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        milliseconds = 1000 * duration
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if milliseconds <= bound:
+                self.histogram[i] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+        self.input_size += input_size
+        self.max_input_size = max(self.max_input_size, input_size)
+        self.result_size += result_size
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'cancelled': self.cancelled,
+            'total_time': self.total_time,
+            'mean_time': self.total_time / self.count if self.count else 0,
+            'max_time': self.max_time,
+            'histogram': [[bound, count] for bound, count in zip(
+                HISTOGRAM_BUCKETS + (None, ), self.histogram)],
+            'input_size': self.input_size,
+            'max_input_size': self.max_input_size,
+            'result_size': self.result_size,
+        }
+
+
+def record(name, duration, input_size=0, result_size=0, error=False,
+           cancelled=False):
+    """
+    Records a call of a worker.
+
+    :param name: name of the worker
+    :param duration: wall time of the call, in seconds
+    :param input_size: size of the worker input (e.g. length of the code)
+    :param result_size: size of the worker result (e.g. number of messages)
+    :param error: True if the worker raised an exception
+    :param cancelled: True if the request has been cancelled
+    """
+    with _lock:
+        try:
+            stats = _stats[name]
+        except KeyError:
+            stats = _stats[name] = WorkerStats()
+        stats.record(duration, input_size, result_size, error, cancelled)
+
+
+def request_size(request_data, *args, **kwargs):
+    """
+    Returns the input size of a request: the length of the code sent with
+    the request, 0 if the request does not contain any code.
+    """
+    try:
+        return len(request_data['code'])
+    except (KeyError, TypeError):
+        return 0
+
+
+def result_size(result):
+    """
+    Returns the size of a worker result: its length if it has one, 0
+    otherwise.
+    """
+    try:
+        return len(result)
+    except TypeError:
+        return 0
+
+
+def instrumented(name=None, input_size=request_size):
+    """
+    Decorator that records the statistics of a worker.
+
+    :param name: name of the worker, defaults to the function name.
+    :param input_size: callable that receives the worker arguments and
+        returns the size of its input.
+    """
+    def decorator(function):
+        worker_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            error = cancelled = False
+            result = None
+            start = clock()
+            try:
+                result = function(*args, **kwargs)
+                return result
+            except RequestCancelled:
+                cancelled = True
+                raise
+            except Exception:
+                error = True
+                raise
+            finally:
+                duration = clock() - start
+                try:
+                    size = input_size(*args, **kwargs)
+                except Exception:
+                    size = 0
+                size_of_result = result_size(result)
+                record(worker_name, duration, size, size_of_result, error,
+                       cancelled)
+                tracing.trace('worker', worker=worker_name,
+                              duration=duration, input_size=size,
+                              result_size=size_of_result, error=error,
+                              cancelled=cancelled)
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """
+    Returns the statistics of the workers: a dict that maps the worker names
+    to the dict of their statistics (see :class:`WorkerStats`).
+    """
+    with _lock:
+        return dict((name, stats.to_dict()) for name, stats in _stats.items())
+
+
+def reset():
+    """
+    Clears the statistics.
+    """
+    with _lock:
+        _stats.clear()
+
+
+def merge(snapshots):
+    """
+    Merges the snapshots of several processes (e.g. the processes of a
+    worker pool) into a single snapshot.
+    """
+    merged = {}
+    for snapshot_ in snapshots:
+        for name, stats in (snapshot_ or {}).items():
+            try:
+                total = merged[name]
+            except KeyError:
+                merged[name] = dict(stats, histogram=[
+                    list(bucket) for bucket in stats['histogram']])
+                continue
+            for key in ('count', 'errors', 'cancelled', 'total_time',
+                        'input_size', 'result_size'):
+                total[key] += stats[key]
+            for key in ('max_time', 'max_input_size'):
+                total[key] = max(total[key], stats[key])
+            for bucket, (_, count) in zip(total['histogram'],
+                                          stats['histogram']):
+                bucket[1] += count
+            total['mean_time'] = total['total_time'] / total['count'] \
+                if total['count'] else 0
+    return merged
+
+
+def dump(path, stats=None):
+    """
+    Writes the statistics to a json file.
+
+    :param path: path of the file
+    :param stats: the statistics to write, defaults to :func:`snapshot`.
+    """
+    if stats is None:
+        stats = snapshot()
+    with open(path, 'w') as f:
+        json.dump(stats, f, indent=2, sort_keys=True)
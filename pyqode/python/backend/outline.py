@@ -0,0 +1,562 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the incremental outline engine used by the
+:func:`pyqode.python.backend.workers.defined_names` and
+:func:`pyqode.python.backend.workers.defined_names_diff` workers.
+
+The module is split into blocks of top-level statements (see
+:func:`pyqode.python.backend.pyflakesutils.make_segments`). The outline of a
+block only depends on its text, it is cached by content hash: when the
+document changes, only the blocks that were modified are analysed again, the
+outline of the other blocks is reused (and its line numbers shifted if
+needed).
+
+The outline is a list of definition dicts (see
+``pyqode.core.share.Definition.to_dict``). Two outlines can be compared with
+:func:`diff`, the diff is applied on the editor side by :func:`apply_diff`.
+
+The nodes of an outline are identified by their path in the tree: the names
+of their ancestors and their own name (e.g. ``/Class/method(self)``), a
+``#n`` suffix is appended to the n-th duplicate of a name.
+
+The outline of a piece of code is computed by jedi (``jedi.names``) or, by
+the faster :func:`parse_outline`, using the ``ast`` module (or the
+``tokenize`` module when the code cannot be parsed).
+"""
+import ast
+import keyword
+import re
+import tokenize
+
+from pyqode.python.backend.cache import content_hash
+from pyqode.python.backend.cancellation import check_cancelled
+from pyqode.python.backend.documents import (
+    common_prefix_length, common_suffix_length)
+from pyqode.python.backend.pyflakesutils import make_segments, split_lines
+
+
+def _shift(definition, delta):
+    """
+    Returns a copy of a definition dict with its line numbers (and the line
+    numbers of its children) shifted by ``delta``.
+    """
+    ret_val = dict(definition)
+    ret_val['line'] += delta
+    ret_val['children'] = [_shift(child, delta)
+                           for child in definition['children']]
+    return ret_val
+
+
+class OutlineEngine(object):
+    """
+    Computes the outline of a document, reusing the outline of the blocks
+    that did not change since the previous call.
+
+    If the document cannot be parsed (syntax error), the blocks of the
+    previous call that are outside of the modified lines are reused and the
+    modified lines are analysed as a single block.
+    """
+    def __init__(self, extract, block_cache):
+        """
+        :param extract: function that returns the outline of a piece of code:
+            ``extract(code, path) -> list of definition dicts``.
+        :param block_cache: the cache of the outline of the blocks (a
+            :class:`pyqode.python.backend.cache.LRUCache`), it can be shared by
+            several engines, even if they use different extract functions.
+        """
+        self._extract = extract
+        self.block_cache = block_cache
+        self._lines = None
+        self._blocks = []
+        #: Number of lines analysed by the last call to :meth:`outline`
+        self.analysed_lines = 0
+
+    def outline(self, code, path=None):
+        """
+        Computes the outline of a document.
+
+        :param code: the code of the document
+        :param path: path of the document
+        :returns: the list of the top-level definition dicts.
+        """
+        lines = split_lines(code)
+        blocks = self._split(code, lines)
+        ret_val = []
+        self.analysed_lines = 0
+        for start, end in blocks:
+            check_cancelled()
+            text = ''.join(lines[start:end])
+            # the block cache may be shared by engines of different providers
+            key = (content_hash(text), path, self._extract)
+            definitions = self.block_cache.get(key)
+            if definitions is None:
+                definitions = self._extract(text, path)
+                self.block_cache.put(key, definitions, 1)
+                self.analysed_lines += end - start
+            if start:
+                definitions = [_shift(d, start) for d in definitions]
+            ret_val += definitions
+        self._lines = lines
+        self._blocks = blocks
+        return ret_val
+
+    def _split(self, code, lines):
+        """
+        Splits the document into blocks of top-level statements.
+
+        :returns: a list of (start, end) line ranges.
+        """
+        try:
+            tree = compile(code, '<outline>', 'exec', ast.PyCF_ONLY_AST)
+        except (SyntaxError, ValueError, TypeError):
+            return self._split_modified(lines)
+        blocks = [(s.start, s.end)
+                  for s in make_segments(tree.body, 0, len(lines))]
+        return blocks or [(0, len(lines))]
+
+    def _split_modified(self, lines):
+        old_lines = self._lines
+        if old_lines is None or not self._blocks:
+            return [(0, len(lines))]
+        prefix = common_prefix_length(old_lines, lines)
+        limit = min(len(old_lines), len(lines)) - prefix
+        suffix = common_suffix_length(old_lines, lines, limit)
+        old_end = len(old_lines) - suffix
+        delta = len(lines) - len(old_lines)
+        head = [b for b in self._blocks if b[1] <= prefix]
+        tail = [(start + delta, end + delta) for start, end in self._blocks
+                if start >= old_end and start >= (head[-1][1] if head else 0)]
+        start = head[-1][1] if head else 0
+        end = tail[0][0] if tail else len(lines)
+        middle = [(start, end)] if end > start else []
+        return head + middle + tail
+
+
+def _iter_nodes(definitions, parent=''):
+    """
+    Iterates over the nodes of an outline (pre-order).
+
+    :param definitions: list of definitions, either dicts or objects with a
+        name and children (e.g. ``pyqode.core.share.Definition``).
+    :returns: an iterator over (key, parent key, index, definition) tuples
+    """
+    counts = {}
+    for index, definition in enumerate(definitions):
+        if isinstance(definition, dict):
+            name, children = definition['name'], definition['children']
+        else:
+            name, children = definition.name, definition.children
+        count = counts.get(name, 0)
+        counts[name] = count + 1
+        key = '%s/%s' % (parent, name)
+        if count:
+            key += '#%d' % count
+        yield key, parent, index, definition
+        for node in _iter_nodes(children, key):
+            yield node
+
+
+def diff(old, new):
+    """
+    Computes the difference between two outlines.
+
+    :param old: the previous list of definition dicts
+    :param new: the new list of definition dicts
+    :returns: a dict with the following keys:
+
+        - removed: keys of the removed nodes (the descendants of a removed
+          node are not listed)
+        - added: list of dicts (key, parent, index, definition) that
+          describe the added nodes (with their children)
+        - moved: list of dicts (key, line, column) that describe the nodes
+          whose position changed
+        - changed: list of dicts (key, icon, description) that describe the
+          nodes whose icon or description changed
+    """
+    old_nodes = dict((key, node) for key, _, _, node in _iter_nodes(old))
+    ret_val = {'removed': [], 'added': [], 'moved': [], 'changed': []}
+    new_keys = set()
+    added = set()
+    for key, parent, index, node in _iter_nodes(new):
+        new_keys.add(key)
+        try:
+            old_node = old_nodes[key]
+        except KeyError:
+            added.add(key)
+            if parent not in added:
+                ret_val['added'].append({'key': key, 'parent': parent,
+                                         'index': index, 'definition': node})
+            continue
+        if old_node['line'] != node['line'] or \
+                old_node['column'] != node['column']:
+            ret_val['moved'].append({'key': key, 'line': node['line'],
+                                     'column': node['column']})
+        if old_node['icon'] != node['icon'] or \
+                old_node['description'] != node['description']:
+            ret_val['changed'].append({'key': key, 'icon': node['icon'],
+                                       'description': node['description']})
+    removed = set()
+    for key, parent, _, _ in _iter_nodes(old):
+        if key not in new_keys:
+            removed.add(key)
+            if parent not in removed:
+                ret_val['removed'].append(key)
+    return ret_val
+
+
+def is_empty(outline_diff):
+    """
+    Returns True if an outline diff does not contain any change.
+    """
+    return not any(outline_diff.values())
+
+
+def apply_diff(definitions, outline_diff, from_dict):
+    """
+    Applies a diff computed by :func:`diff` to an outline made of
+    definition objects (e.g. ``pyqode.core.share.Definition``). The
+    definitions that are not removed are modified in place.
+
+    :param definitions: the list of top-level definitions (the old outline
+        of the diff)
+    :param outline_diff: the diff
+    :param from_dict: function that creates a definition object from a
+        definition dict (e.g. ``Definition.from_dict``)
+    :returns: the new list of top-level definitions
+    """
+    definitions = list(definitions)
+    nodes = {'': definitions}
+    parents = {}
+    for key, parent, _, definition in _iter_nodes(definitions):
+        nodes[key] = definition
+        parents[key] = parent
+    touched = set()
+
+    def siblings(parent):
+        return nodes[parent] if parent == '' else nodes[parent].children
+
+    for key in outline_diff['removed']:
+        children = siblings(parents[key])
+        # remove by identity, definitions may compare equal
+        for i, definition in enumerate(children):
+            if definition is nodes[key]:
+                del children[i]
+                break
+    for added in outline_diff['added']:
+        definition = from_dict(added['definition'])
+        nodes[added['key']] = definition
+        siblings(added['parent']).insert(added['index'], definition)
+        touched.add(added['parent'])
+    for moved in outline_diff['moved']:
+        definition = nodes[moved['key']]
+        definition.line = moved['line']
+        definition.column = moved['column']
+        touched.add(parents[moved['key']])
+    for changed in outline_diff['changed']:
+        definition = nodes[changed['key']]
+        definition.icon = changed['icon']
+        definition.description = changed['description']
+    for parent in touched:
+        siblings(parent).sort(key=lambda d: (d.line, d.column))
+    return definitions
+
+
+_DEFINITION = re.compile(r'\b(?:def|class)\s+(\w+)')
+_FUNCTIONS = tuple(getattr(ast, name) for name in (
+    'FunctionDef', 'AsyncFunctionDef') if hasattr(ast, name))
+_BLOCKS = tuple(getattr(ast, name) for name in (
+    'If', 'For', 'AsyncFor', 'While', 'With', 'AsyncWith', 'Try',
+    'TryExcept', 'TryFinally', 'ExceptHandler') if hasattr(ast, name))
+_FOR_LOOPS = tuple(getattr(ast, name) for name in ('For', 'AsyncFor')
+                   if hasattr(ast, name))
+_WITH_STATEMENTS = tuple(getattr(ast, name) for name in ('With', 'AsyncWith')
+                         if hasattr(ast, name))
+
+
+def _node(name, typename, line, column, params=None):
+    """
+    Creates an outline node, see :func:`parse_outline`.
+    """
+    return {'name': name, 'type': typename, 'line': line, 'column': column,
+            'params': params, 'children': []}
+
+
+def _column(lines, line, offset):
+    """
+    Converts the utf-8 offset of an ast node to a column (in characters).
+    """
+    text = lines[line]
+    try:
+        text.encode('ascii')
+    except UnicodeError:
+        return len(text.encode('utf-8')[:offset].decode('utf-8', 'replace'))
+    return offset
+
+
+def _name_position(lines, node):
+    """
+    Returns the position (line, column) of the name of a function or a
+    class (the position of the node is the position of its decorators with
+    old versions of python).
+    """
+    line = node.lineno - 1
+    start = node.col_offset
+    while line < len(lines):
+        match = _DEFINITION.search(lines[line], start)
+        if match and match.group(1) == node.name:
+            return line, match.start(1)
+        line += 1
+        start = 0
+    return node.lineno - 1, node.col_offset
+
+
+def _params(arguments):
+    names = []
+    for arg in getattr(arguments, 'posonlyargs', []) + arguments.args:
+        names.append(getattr(arg, 'arg', None) or getattr(arg, 'id', ''))
+    for arg in (arguments.vararg, ) + tuple(
+            getattr(arguments, 'kwonlyargs', [])) + (arguments.kwarg, ):
+        if arg is not None:
+            # the variadic arguments are strings with python < 3.4
+            names.append(getattr(arg, 'arg', arg))
+    return names
+
+
+def _target_names(target):
+    if isinstance(target, ast.Name):
+        yield target
+    elif isinstance(target, (ast.Tuple, ast.List)):
+        for element in target.elts:
+            for name in _target_names(element):
+                yield name
+    elif isinstance(target, getattr(ast, 'Starred', ())):
+        for name in _target_names(target.value):
+            yield name
+
+
+def _assigned_names(statement):
+    if isinstance(statement, (ast.Assign, ast.Delete)):
+        # like jedi, the names of a del statement are definitions
+        targets = statement.targets
+    elif isinstance(statement, getattr(ast, 'AnnAssign', ())):
+        targets = [statement.target]
+    elif isinstance(statement, _FOR_LOOPS):
+        targets = [statement.target]
+    elif isinstance(statement, _WITH_STATEMENTS):
+        items = getattr(statement, 'items', [statement])
+        targets = [item.optional_vars for item in items
+                   if item.optional_vars is not None]
+    else:
+        return
+    for target in targets:
+        for name in _target_names(target):
+            yield name
+
+
+def _ast_nodes(statements, lines, scope):
+    """
+    Returns the outline nodes of the statements of a scope ('module',
+    'class' or 'function'): the functions and the classes of a scope and its
+    variables (except the variables of the functions).
+    """
+    ret_val = []
+    for statement in statements:
+        if isinstance(statement, _FUNCTIONS):
+            line, column = _name_position(lines, statement)
+            node = _node(statement.name, 'function', line, column,
+                         _params(statement.args))
+            node['children'] = _ast_nodes(statement.body, lines, 'function')
+            ret_val.append(node)
+            continue
+        if isinstance(statement, ast.ClassDef):
+            if scope != 'function':
+                line, column = _name_position(lines, statement)
+                node = _node(statement.name, 'class', line, column)
+                node['children'] = _ast_nodes(statement.body, lines, 'class')
+                ret_val.append(node)
+            continue
+        if scope != 'function':
+            for name in _assigned_names(statement):
+                line = name.lineno - 1
+                ret_val.append(_node(name.id, 'statement', line,
+                                     _column(lines, line, name.col_offset)))
+        if isinstance(statement, _BLOCKS):
+            # the names defined in the nested blocks belong to the scope
+            for field in ('body', 'orelse', 'handlers', 'finalbody'):
+                ret_val += _ast_nodes(
+                    getattr(statement, field, []), lines, scope)
+    ret_val.sort(key=lambda node: (node['line'], node['column']))
+    return ret_val
+
+
+def _tokens(lines):
+    """
+    Generates the tokens of some lines, stops at the first tokenize error.
+    """
+    lines = iter(lines)
+    try:
+        for token in tokenize.generate_tokens(lambda: next(lines, '')):
+            yield token
+    except (tokenize.TokenError, SyntaxError):
+        pass
+
+
+def _logical_lines(lines):
+    """
+    Generates the logical lines of some code: lists of (type, string,
+    line, column) tuples, without the comments, the indentation and the new
+    lines.
+    """
+    skipped = (tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE,
+               tokenize.INDENT, tokenize.DEDENT, tokenize.ENDMARKER)
+    logical_line = []
+    for token_type, string, start, _, _ in _tokens(lines):
+        if token_type == tokenize.NEWLINE:
+            yield logical_line
+            logical_line = []
+        elif token_type not in skipped:
+            logical_line.append((token_type, string, start[0] - 1, start[1]))
+    if logical_line:
+        # the incomplete statement at the end of the code (or before the
+        # tokenize error)
+        yield logical_line
+
+
+def _tokenize_params(tokens):
+    """
+    Returns the names of the parameters found in the tokens of a function
+    definition (the tokens that follow the function name).
+    """
+    names = []
+    depth = 0
+    previous = None
+    for token_type, string, _, _ in tokens:
+        if token_type == tokenize.OP and string in '([{':
+            depth += 1
+        elif token_type == tokenize.OP and string in ')]}':
+            depth -= 1
+            if not depth:
+                break
+        elif token_type == tokenize.NAME and depth == 1 and \
+                previous in ('(', ',', '*', '**'):
+            names.append(string)
+        previous = string
+    return names
+
+
+def _tokenize_names(tokens):
+    """
+    Returns the tokens of the names assigned by a logical line (simple
+    statements and the targets of the for loops and the with statements).
+    """
+    first = tokens[0][1]
+    if first == 'for':
+        names = []
+        for token in tokens[1:]:
+            if token[1] == 'in':
+                break
+            if token[0] == tokenize.NAME:
+                names.append(token)
+        return names
+    if first == 'del':
+        return [t for i, t in enumerate(tokens[1:]) if t[0] == tokenize.NAME
+                and tokens[i][1] in ('del', ',')]
+    if first == 'with':
+        return [tokens[i + 1] for i, t in enumerate(tokens[:-1])
+                if t[1] == 'as' and tokens[i + 1][0] == tokenize.NAME]
+    if keyword.iskeyword(first):
+        return []
+    if len(tokens) > 1 and tokens[1][1] == ':':
+        # annotated assignment
+        return [tokens[0]]
+    # the brackets that enclose the current token: True for the tuples and
+    # the lists, False for the calls and the subscripts
+    brackets = []
+    # the names of the targets of the assignment, ``a = b = value``
+    # has 2 targets
+    ret_val = []
+    names = []
+    previous = None
+    for i, token in enumerate(tokens):
+        token_type, string = token[0], token[1]
+        if token_type == tokenize.OP and string in '([{':
+            brackets.append(previous is None or previous in '([{,=')
+        elif token_type == tokenize.OP and string in ')]}':
+            if brackets:
+                brackets.pop()
+        elif token_type == tokenize.OP and string == '=' and not brackets:
+            ret_val += names
+            names = []
+        elif string == 'lambda':
+            break
+        elif token_type == tokenize.NAME and all(brackets) and \
+                previous != '.' and not keyword.iskeyword(string):
+            after = tokens[i + 1][1] if i + 1 < len(tokens) else ''
+            # skip the attributes and subscripts
+            if after not in ('.', '[', '('):
+                names.append(token)
+        previous = string
+    return ret_val
+
+
+def _tokenize_nodes(lines):
+    """
+    Returns the outline nodes of some code that cannot be parsed, using the
+    tokens of the code and its indentation.
+    """
+    ret_val = []
+    # stack of (indentation, node) of the enclosing classes and functions
+    stack = []
+    for tokens in _logical_lines(lines):
+        if not tokens or tokens[0][1] == '@':
+            continue
+        column = tokens[0][3]
+        while stack and stack[-1][0] >= column:
+            stack.pop()
+        parent = stack[-1][1] if stack else None
+        siblings = parent['children'] if parent else ret_val
+        if tokens[0][1] == 'async':
+            tokens = tokens[1:]
+        strings = [t[1] for t in tokens]
+        if strings[:1] in (['def'], ['class']) and len(tokens) > 1 and \
+                tokens[1][0] == tokenize.NAME:
+            _, name, line, name_column = tokens[1]
+            if strings[0] == 'def':
+                node = _node(name, 'function', line, name_column,
+                             _tokenize_params(tokens[2:]))
+            else:
+                node = _node(name, 'class', line, name_column)
+            if parent is None or parent['type'] == 'class' or \
+                    node['type'] == 'function':
+                siblings.append(node)
+            stack.append((column, node))
+        elif parent is None or parent['type'] == 'class':
+            for _, name, line, name_column in _tokenize_names(tokens):
+                siblings.append(_node(name, 'statement', line, name_column))
+    return ret_val
+
+
+def parse_outline(code):
+    """
+    Computes the outline of some python code without jedi.
+
+    The code is parsed by the ``ast`` module, if it contains a syntax error,
+    the outline is extracted from its tokens and its indentation instead.
+
+    The outline contains the same definitions as ``jedi.names``: the
+    functions, classes and variables of the module, the methods and the
+    attributes of the classes and the nested functions of the functions
+    (but not the imports).
+
+    :param code: the code
+    :returns: a list of nodes, each node is a dict with the following keys:
+        name, type (the jedi type: 'class', 'function' or 'statement'), line
+        (0 based), column, params (the names of the parameters of a
+        function, None for the other types) and children (list of nodes).
+    """
+    lines = split_lines(code)
+    try:
+        tree = compile(code, '<outline>', 'exec', ast.PyCF_ONLY_AST)
+    except (SyntaxError, ValueError, TypeError):
+        return _tokenize_nodes(lines)
+    return _ast_nodes(tree.body, lines, 'module')
@@ -4,8 +4,22 @@ This module contains utility classes for interacting with the pycodestyle
 module using strings instread of files. This allow live checking on code
 without the need to save.
 """
+import bisect
+
 import pycodestyle
 
+from pyqode.python.backend.cache import LRUCache
+from pyqode.python.backend.cancellation import check_cancelled
+
+
+#: Names of the checker attributes that a logical line check may depend on
+#: without making its results depend on the rest of the document. The
+#: results of the checks that only use those arguments are cached.
+CACHEABLE_ARGUMENTS = frozenset([
+    'logical_line', 'tokens', 'indent_level', 'previous_indent_level',
+    'previous_logical', 'indent_char', 'noqa', 'hang_closing', 'verbose',
+    'max_doc_length', 'max_line_length'])
+
 
 class CustomReport(pycodestyle.StandardReport):
     """
@@ -21,8 +35,107 @@ class CustomReport(pycodestyle.StandardReport):
 class CustomChecker(pycodestyle.Checker):
     """
     Custom Checker with our Custom report.
+
+    If the options have a ``logical_line_cache`` (see
+    :class:`CustomStyleGuide`), the results of the logical line checks that
+    do not depend on the rest of the document are cached, keyed on the tokens
+    of the logical line and on the indentation context. Only the logical lines
+    that changed since the previous check are then checked again.
     """
 
     def __init__(self, *args, **kwargs):
+        options = kwargs['options']
         super(CustomChecker, self).__init__(
-            *args, report=CustomReport(kwargs.pop("options")), **kwargs)
+            *args, report=CustomReport(options), **kwargs)
+        self._line_cache = getattr(options, 'logical_line_cache', None)
+        self._cached_checks = []
+        self._uncached_checks = []
+        for name, check, argument_names in self._logical_checks:
+            if CACHEABLE_ARGUMENTS.issuperset(argument_names):
+                self._cached_checks.append((name, check, argument_names))
+            else:
+                self._uncached_checks.append((name, check, argument_names))
+
+    def check_logical(self):
+        check_cancelled()
+        if self._line_cache is None:
+            return super(CustomChecker, self).check_logical()
+        self.report.increment_logical_line()
+        mapping = self.build_tokens_line()
+        if not mapping:
+            return
+        (start_row, start_col) = mapping[0][1]
+        start_line = self.lines[start_row - 1]
+        self.indent_level = pycodestyle.expand_indent(start_line[:start_col])
+        if self.blank_before < self.blank_lines:
+            self.blank_before = self.blank_lines
+        key = self._line_key(start_row)
+        errors = self._line_cache.get(key)
+        if errors is None:
+            errors = [(row - start_row, col, text, check)
+                      for row, col, text, check in self._run_checks(
+                          self._cached_checks, mapping)]
+            self._line_cache.put(key, errors)
+        for row, col, text, check in errors:
+            self.report_error(start_row + row, col, text, check)
+        for row, col, text, check in self._run_checks(
+                self._uncached_checks, mapping):
+            self.report_error(row, col, text, check)
+        if self.logical_line:
+            self.previous_indent_level = self.indent_level
+            self.previous_logical = self.logical_line
+            if not self.indent_level:
+                self.previous_unindented_logical_line = self.logical_line
+        self.blank_lines = 0
+        self.tokens = []
+
+    def _line_key(self, start_row):
+        tokens = tuple(
+            (token_type, text, (srow - start_row, scol),
+             (erow - start_row, ecol), line)
+            for token_type, text, (srow, scol), (erow, ecol), line
+            in self.tokens)
+        return (tokens, self.indent_level, self.previous_indent_level,
+                self.previous_logical, self.indent_char, bool(self.noqa))
+
+    def _run_checks(self, checks, mapping):
+        """
+        Runs the given logical line checks and returns the errors as a list of
+        (row, col, text, check) tuples.
+        """
+        errors = []
+        mapping_offsets = [offset for offset, _ in mapping]
+        for name, check, argument_names in checks:
+            self.init_checker_state(name, argument_names)
+            for offset, text in self.run_check(check, argument_names) or ():
+                if not isinstance(offset, tuple):
+                    token_offset, pos = mapping[bisect.bisect_left(
+                        mapping_offsets, offset)]
+                    offset = (pos[0], pos[1] + offset - token_offset)
+                errors.append((offset[0], offset[1], text, check))
+        return errors
+
+
+class CustomStyleGuide(pycodestyle.StyleGuide):
+    """
+    Style guide that uses :class:`CustomChecker` and keeps a cache of the
+    logical line results that is shared by all the files it checks.
+
+    The style guide does not read any configuration file nor the command
+    line arguments, all the options are given as keyword arguments (e.g.
+    ``max_line_length``) which means that several style guides with
+    different options can be used in the same process.
+    """
+
+    def __init__(self, cache_size=20000, **kwargs):
+        """
+        :param cache_size: maximum number of logical lines results to cache.
+        :param kwargs: pycodestyle options.
+        """
+        super(CustomStyleGuide, self).__init__(
+            parse_argv=False, config_file='', checker_class=CustomChecker,
+            **kwargs)
+        #: The cache of the logical lines results
+        self.logical_line_cache = LRUCache(
+            max_entries=cache_size, max_size=cache_size)
+        self.options.logical_line_cache = self.logical_line_cache
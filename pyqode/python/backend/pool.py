@@ -0,0 +1,745 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains a multi-process backend server.
+
+The default pyqode server handles the requests one by one in a single
+process, which means that a slow request (e.g. running pyflakes on a huge
+file) delays all the other requests, including the latency critical ones
+(code completion, calltips).
+
+The :class:`PoolServer` handles each request in a thread and routes the
+requests to a pool of worker processes organised in lanes:
+
+    - the interactive lane (one dedicated process) runs the latency critical
+      workers (code completion, calltips, go to assignments, quick doc)
+    - the lint lane (one or more processes) runs the other workers (pyflakes,
+      pycodestyle, outline)
+
+The worker processes do not share anything: each process has its own caches.
+The document synchronisation workers (see
+:class:`pyqode.python.modes.DocumentSyncMode`) are broadcast to all the
+processes so that each one keeps its own shadow copy of the documents.
+
+A request made on a synchronised document (i.e. with a document id and a
+version) supersedes the requests of the same worker made on older versions of
+the document: the queued ones are dropped and the running one is cancelled
+(see :mod:`pyqode.python.backend.cancellation`).
+
+The queued requests of a process are not run in FIFO order but by priority
+(see :attr:`PRIORITIES`): document synchronisation first, then the
+interactive workers (completion, calltips), the navigation workers (go to
+assignments, quick doc), the outline and finally the linters. The priority of
+a queued request is raised every :attr:`AGING_DELAY` seconds so that the low
+priority requests are never starved. The document synchronisation requests
+never overtake (and are never overtaken by) the queued requests of the same
+document, they only overtake the requests of the other documents. The steps
+of the warm-up stage are only run when no other request is queued. Use the
+:func:`queue_stats` worker to get the depth of each priority queue.
+"""
+import inspect
+import itertools
+import logging
+import multiprocessing
+import threading
+import time
+
+from pyqode.core.backend import JsonServer
+from pyqode.core.backend.server import import_class
+from pyqode.python.backend import cancellation
+from pyqode.python.backend import instrumentation
+from pyqode.python.backend import tracing
+from pyqode.python.backend.cancellation import RequestCancelled
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+
+#: Name of the lane that runs the latency critical workers
+LANE_INTERACTIVE = 'interactive'
+#: Name of the lane that runs the throughput workers
+LANE_LINT = 'lint'
+
+_WORKERS = 'pyqode.python.backend.workers.'
+
+#: Lane of the workers, workers that are not listed here run on the
+#: interactive lane.
+ROUTES = {
+    'pyqode.core.backend.workers.CodeCompletionWorker': LANE_INTERACTIVE,
+    _WORKERS + 'calltips': LANE_INTERACTIVE,
+    _WORKERS + 'goto_assignments': LANE_INTERACTIVE,
+    _WORKERS + 'quick_doc': LANE_INTERACTIVE,
+    _WORKERS + 'defined_names': LANE_LINT,
+    _WORKERS + 'defined_names_diff': LANE_LINT,
+    _WORKERS + 'run_pep8': LANE_LINT,
+    _WORKERS + 'run_pyflakes': LANE_LINT,
+    _WORKERS + 'run_frosted': LANE_LINT,
+    _WORKERS + 'run_lint': LANE_LINT,
+}
+
+#: Priority of the document synchronisation workers (highest priority)
+PRIORITY_SYNC = 0
+#: Priority of the latency critical workers (code completion, calltips)
+PRIORITY_INTERACTIVE = 1
+#: Priority of the navigation workers (go to assignments, quick doc)
+PRIORITY_NAVIGATION = 2
+#: Priority of the outline worker
+PRIORITY_OUTLINE = 3
+#: Priority of the linters
+PRIORITY_LINT = 4
+#: Priority of the warm-up stage (lowest priority, never promoted)
+PRIORITY_WARMUP = 5
+
+#: Names of the priorities, used by :func:`queue_stats`
+PRIORITY_NAMES = {
+    PRIORITY_SYNC: 'sync',
+    PRIORITY_INTERACTIVE: 'interactive',
+    PRIORITY_NAVIGATION: 'navigation',
+    PRIORITY_OUTLINE: 'outline',
+    PRIORITY_LINT: 'lint',
+    PRIORITY_WARMUP: 'warmup',
+}
+
+#: Name of the worker that runs the steps of the warm-up stage (see
+#: :func:`pyqode.python.backend.warmup.submit`)
+WARMUP_WORKER = 'pyqode.python.backend.warmup.run_step'
+
+#: Priority of the workers, workers that are not listed here have the
+#: interactive priority.
+PRIORITIES = {
+    _WORKERS + 'open_document': PRIORITY_SYNC,
+    _WORKERS + 'update_document': PRIORITY_SYNC,
+    _WORKERS + 'close_document': PRIORITY_SYNC,
+    'pyqode.core.backend.workers.CodeCompletionWorker': PRIORITY_INTERACTIVE,
+    _WORKERS + 'calltips': PRIORITY_INTERACTIVE,
+    _WORKERS + 'goto_assignments': PRIORITY_NAVIGATION,
+    _WORKERS + 'quick_doc': PRIORITY_NAVIGATION,
+    _WORKERS + 'set_project_root': PRIORITY_NAVIGATION,
+    _WORKERS + 'update_symbol_index': PRIORITY_NAVIGATION,
+    _WORKERS + 'defined_names': PRIORITY_OUTLINE,
+    _WORKERS + 'defined_names_diff': PRIORITY_OUTLINE,
+    _WORKERS + 'run_pep8': PRIORITY_LINT,
+    _WORKERS + 'run_pyflakes': PRIORITY_LINT,
+    _WORKERS + 'run_frosted': PRIORITY_LINT,
+    _WORKERS + 'run_lint': PRIORITY_LINT,
+    WARMUP_WORKER: PRIORITY_WARMUP,
+}
+
+#: Number of seconds after which a queued request is promoted to the next
+#: priority (starvation protection). The document synchronisation requests
+#: are never overtaken by a promoted request.
+AGING_DELAY = 0.5
+
+#: Name of the worker that returns the queue statistics of the pool, it is
+#: answered by the server without going through the queues.
+QUEUE_STATS_WORKER = 'pyqode.python.backend.pool.queue_stats'
+
+#: Workers that are run by all the processes of the pool. The result of
+#: the request is the result of the first process (the interactive one)
+#: unless one of the processes returns False.
+BROADCAST_WORKERS = frozenset([
+    _WORKERS + 'open_document',
+    _WORKERS + 'update_document',
+    _WORKERS + 'close_document',
+])
+
+#: Workers that are run by all the processes of the pool, the results of the
+#: processes are merged by the associated function.
+GATHER_WORKERS = {
+    _WORKERS + 'get_stats': instrumentation.merge,
+}
+
+
+def _logger():
+    return logging.getLogger(__name__)
+
+
+_active_pool = None
+
+
+def queue_stats(data=None):
+    """
+    Worker that returns the statistics of the worker pool of the server (see
+    :meth:`WorkerPool.stats`).
+
+    The request is answered by the server itself, it is never queued behind
+    the other requests.
+
+    :returns: a dict or None if the server does not use a worker pool.
+    """
+    if _active_pool is None:
+        return None
+    return _active_pool.stats()
+
+
+def run_worker(worker, data):
+    """
+    Runs a worker the same way the pyqode server does.
+
+    :param worker: fully qualified name of the worker (function or class)
+    :param data: request data
+    :returns: the worker results, None if the worker failed or if the request
+        has been cancelled.
+    """
+    try:
+        worker = import_class(worker)
+        if inspect.isclass(worker):
+            worker = worker()
+        return worker(data)
+    except RequestCancelled:
+        _logger().debug('request cancelled: %r', worker)
+        return None
+    except Exception:
+        _logger().exception('something went bad with worker %r(data=%r)',
+                            worker, data)
+        return None
+
+
+def _process_main(connection, cancelled_job, lane, initializer, initargs):
+    """ Entry point of the worker processes. """
+    if initializer is not None:
+        initializer(lane, *initargs)
+    while True:
+        try:
+            job_id, worker, data = connection.recv()
+        except (EOFError, IOError):
+            break
+        cancellation.set_current_request(
+            lambda: cancelled_job.value == job_id)
+        connection.send((job_id, run_worker(worker, data)))
+
+
+class Job(object):
+    """
+    A request submitted to a worker process.
+    """
+    _ids = itertools.count(1)
+
+    def __init__(self, worker, data):
+        self.job_id = next(self._ids)
+        self.worker = worker
+        self.data = data
+        self.priority = PRIORITIES.get(worker, PRIORITY_INTERACTIVE)
+        #: Time at which the job has been queued
+        self.enqueued = time.time()
+        self.result = None
+        #: True if the job has been cancelled
+        self.cancelled = False
+        self._event = threading.Event()
+        #: The job supersedes the previous jobs that have the same key and
+        #: an older document version.
+        self.key = None
+        self.version = None
+        #: Id of the synchronised document the job is made on (or None)
+        self.document_id = None
+        if isinstance(data, dict):
+            self.document_id = data.get('document_id')
+        if worker not in BROADCAST_WORKERS and isinstance(data, dict):
+            version = data.get('version')
+            document_id = self.document_id
+            if document_id is not None and isinstance(version, int):
+                self.key = (worker, document_id)
+                self.version = version
+
+    def supersedes(self, job):
+        """
+        Returns True if this job makes the other job obsolete.
+        """
+        return (self.key is not None and job.key == self.key and
+                job.version < self.version)
+
+    def set_result(self, result):
+        self.result = result
+        self._event.set()
+
+    def wait(self, timeout=None):
+        """
+        Waits for the job to finish and returns its result (None if the
+        worker failed, if the request has been cancelled or if the process
+        died).
+        """
+        self._event.wait(timeout)
+        return self.result
+
+
+class JobQueue(object):
+    """
+    The priority queue of the jobs of an executor.
+
+    The job with the highest priority (i.e. the lowest :attr:`Job.priority`)
+    is run first, jobs with the same priority are run in FIFO order. The
+    priority of a queued job is raised every ``aging_delay`` seconds, up to
+    the interactive priority, so that the low priority jobs are eventually run
+    even if the high priority jobs keep coming.
+
+    The jobs of a synchronised document are kept in FIFO order around the
+    document synchronisation jobs: an update of the document is not run
+    before the jobs made on the previous version, and the jobs made on the
+    new version are not run before the update.
+
+    When a job is added, the queued jobs it supersedes (same worker and
+    document, older version) are dropped and the running job is cancelled
+    if it is superseded too.
+    """
+    def __init__(self, aging_delay=None):
+        """
+        :param aging_delay: number of seconds after which a queued job is
+            promoted to the next priority, defaults to :attr:`AGING_DELAY`.
+        """
+        if aging_delay is None:
+            aging_delay = AGING_DELAY
+        self.aging_delay = aging_delay
+        self._jobs = []
+        self._condition = threading.Condition()
+        self._closed = False
+        #: The job that is being run
+        self.running = None
+        #: Number of jobs that have been dropped or cancelled
+        self.cancelled = 0
+        #: Number of jobs run per priority
+        self.served = dict((priority, 0) for priority in PRIORITY_NAMES)
+        #: Longest time (in seconds) a job has waited, per priority
+        self.max_wait = dict((priority, 0.0) for priority in PRIORITY_NAMES)
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def put(self, job, cancel_running=None):
+        """
+        Adds a job to the queue.
+
+        :param cancel_running: callable that cancels the running job, called
+            if the running job is superseded by the new job.
+        """
+        dropped = []
+        with self._condition:
+            if job.key is not None:
+                dropped = [j for j in self._jobs if job.supersedes(j)]
+                for superseded in dropped:
+                    self._jobs.remove(superseded)
+                running = self.running
+                if running is not None and job.supersedes(running) and \
+                        not running.cancelled:
+                    running.cancelled = True
+                    self.cancelled += 1
+                    tracing.trace('cancel', worker=running.worker,
+                                  job_id=running.job_id,
+                                  version=running.version)
+                    if cancel_running is not None:
+                        cancel_running(running)
+            self.cancelled += len(dropped)
+            self._jobs.append(job)
+            self._condition.notify()
+        for superseded in dropped:
+            superseded.cancelled = True
+            superseded.set_result(None)
+            tracing.trace('drop', worker=superseded.worker,
+                          job_id=superseded.job_id,
+                          version=superseded.version)
+
+    def get(self):
+        """
+        Removes the next job from the queue and marks it as the running
+        job. Blocks until a job is available.
+
+        :returns: the job, None if the queue has been closed.
+        """
+        with self._condition:
+            self.running = None
+            while not self._jobs and not self._closed:
+                self._condition.wait()
+            if self._closed:
+                return None
+            now = time.time()
+            index = min((i for i in range(len(self._jobs))
+                         if self._is_ready(i)),
+                        key=lambda i: (self._effective_priority(
+                            self._jobs[i], now), i))
+            self.running = job = self._jobs.pop(index)
+            wait = now - job.enqueued
+            self.served[job.priority] = self.served.get(job.priority, 0) + 1
+            if wait > self.max_wait.get(job.priority, 0.0):
+                self.max_wait[job.priority] = wait
+            tracing.trace('dequeue', worker=job.worker, job_id=job.job_id,
+                          priority=job.priority, wait=wait,
+                          queued=len(self._jobs))
+            return job
+
+    def _is_ready(self, index):
+        """
+        Returns False if the job at ``index`` must not overtake an older
+        queued job of the same document (one of them is a document
+        synchronisation job).
+        """
+        job = self._jobs[index]
+        if job.document_id is None:
+            return True
+        for older in self._jobs[:index]:
+            if older.document_id == job.document_id and (
+                    job.priority == PRIORITY_SYNC or
+                    older.priority == PRIORITY_SYNC):
+                return False
+        return True
+
+    def _effective_priority(self, job, now):
+        if (job.priority <= PRIORITY_INTERACTIVE or
+                job.priority == PRIORITY_WARMUP or self.aging_delay <= 0):
+            return job.priority
+        promotions = int((now - job.enqueued) / self.aging_delay)
+        return max(PRIORITY_INTERACTIVE, job.priority - promotions)
+
+    def stats(self):
+        """
+        Returns the statistics of the queue: a dict with the following keys:
+
+            - depth: number of queued jobs per priority name
+            - served: number of jobs run per priority name
+            - max_wait: longest time (in seconds) a job waited in the queue,
+              per priority name
+            - running: name of the worker that is being run (or None)
+            - cancelled: number of jobs that have been dropped or cancelled
+        """
+        with self._condition:
+            depth = dict((name, 0) for name in PRIORITY_NAMES.values())
+            for job in self._jobs:
+                name = PRIORITY_NAMES.get(job.priority, job.priority)
+                depth[name] = depth.get(name, 0) + 1
+            running = self.running
+            return {
+                'depth': depth,
+                'served': dict((PRIORITY_NAMES[p], n)
+                               for p, n in self.served.items()),
+                'max_wait': dict((PRIORITY_NAMES[p], w)
+                                 for p, w in self.max_wait.items()),
+                'running': running.worker if running is not None else None,
+                'cancelled': self.cancelled,
+            }
+
+    def close(self):
+        """
+        Closes the queue, the queued jobs are finished with a None result.
+        """
+        with self._condition:
+            self._closed = True
+            jobs, self._jobs = self._jobs, []
+            self._condition.notify_all()
+        for job in jobs:
+            job.set_result(None)
+
+
+class _Executor(object):
+    """
+    Base class of the executors: runs the jobs of its queue one by one.
+    """
+    def __init__(self, lane):
+        self.lane = lane
+        self.queue = JobQueue()
+
+    @property
+    def pending(self):
+        """ Number of jobs that have been submitted but are not finished """
+        return len(self.queue) + (self.queue.running is not None)
+
+    def submit(self, worker, data):
+        """
+        Submits a job.
+
+        :returns: the :class:`Job`
+        """
+        job = Job(worker, data)
+        self.queue.put(job, self._cancel)
+        return job
+
+    def _cancel(self, job):
+        pass
+
+
+class WorkerThread(_Executor):
+    """
+    Runs the workers in a thread of the server process.
+    """
+    def __init__(self, lane):
+        super(WorkerThread, self).__init__(lane)
+        self._thread = None
+
+    def start(self):
+        """ Starts the thread. """
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """ Stops the thread. """
+        self.queue.close()
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            cancellation.set_current_request(lambda job=job: job.cancelled)
+            if job.cancelled:
+                job.set_result(None)
+            else:
+                job.set_result(run_worker(job.worker, job.data))
+
+
+class WorkerProcess(_Executor):
+    """
+    A worker process: runs the jobs it receives one by one, in the order
+    they have been submitted.
+
+    The process is restarted if it dies, the running job is then finished
+    with a None result.
+    """
+    def __init__(self, lane, initializer=None, initargs=()):
+        super(WorkerProcess, self).__init__(lane)
+        self._initializer = initializer
+        self._initargs = initargs
+        self._process = None
+        self._connection = None
+        self._cancelled_job = multiprocessing.Value('l', 0)
+        self._stopped = False
+
+    def start(self):
+        """ Starts the process. """
+        self._start_process()
+        thread = threading.Thread(target=self._run)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        """ Stops the process. """
+        self._stopped = True
+        self.queue.close()
+        process, self._process = self._process, None
+        if self._connection is not None:
+            self._connection.close()
+        if process is not None:
+            process.terminate()
+            process.join(1)
+
+    def _start_process(self):
+        connection, child_connection = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_process_main, args=(
+                child_connection, self._cancelled_job, self.lane,
+                self._initializer, self._initargs))
+        self._process.daemon = True
+        self._process.start()
+        child_connection.close()
+        self._connection = connection
+
+    def _cancel(self, job):
+        self._cancelled_job.value = job.job_id
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            if job.cancelled:
+                job.set_result(None)
+                continue
+            try:
+                self._connection.send((job.job_id, job.worker, job.data))
+                job_id, result = self._connection.recv()
+            except (EOFError, IOError, OSError):
+                job.set_result(None)
+                if self._stopped:
+                    break
+                _logger().warning('%s worker process died, restarting it',
+                                  self.lane)
+                self._start_process()
+            else:
+                job.set_result(result)
+
+
+class WorkerPool(object):
+    """
+    A pool of worker processes organised in lanes (see :attr:`ROUTES`).
+
+    If the number of lint processes is 0, all the workers are run by a
+    single thread of the server process (but the requests still benefit from
+    the cancellation of the superseded requests).
+    """
+    def __init__(self, lint_processes=1, initializer=None, initargs=()):
+        """
+        :param lint_processes: number of processes of the lint lane, 0 to run
+            the workers in the server process.
+        :param initializer: callable run by each worker process when it
+            starts, it receives the lane name followed by ``initargs``. Must
+            be picklable (i.e. a module level function).
+        :param initargs: extra arguments of ``initializer``
+        """
+        if lint_processes > 0:
+            self.lanes = {
+                LANE_INTERACTIVE: [
+                    WorkerProcess(LANE_INTERACTIVE, initializer, initargs)],
+                LANE_LINT: [WorkerProcess(LANE_LINT, initializer, initargs)
+                            for _ in range(lint_processes)]
+            }
+        else:
+            executor = WorkerThread(None)
+            self.lanes = {LANE_INTERACTIVE: [executor],
+                          LANE_LINT: [executor]}
+
+    @property
+    def executors(self):
+        """ All the executors, the interactive one first """
+        executors = []
+        for executor in self.lanes[LANE_INTERACTIVE] + self.lanes[LANE_LINT]:
+            if executor not in executors:
+                executors.append(executor)
+        return executors
+
+    def start(self):
+        """ Starts the executors. """
+        for executor in self.executors:
+            executor.start()
+
+    def stop(self):
+        """ Stops the executors. """
+        for executor in self.executors:
+            executor.stop()
+
+    def submit(self, worker, data):
+        """
+        Submits a request to the least busy process of the worker lane or to
+        all the processes for the broadcast workers.
+
+        :returns: a list of :class:`Job`
+        """
+        if worker in BROADCAST_WORKERS or worker in GATHER_WORKERS:
+            return [e.submit(worker, data) for e in self.executors]
+        lane = self.lanes[ROUTES.get(worker, LANE_INTERACTIVE)]
+        executor = min(lane, key=lambda e: e.pending)
+        return [executor.submit(worker, data)]
+
+    def run(self, worker, data):
+        """
+        Runs a request and waits for its result.
+        """
+        return self.wait(self.submit(worker, data))
+
+    @staticmethod
+    def wait(jobs, timeout=None):
+        """
+        Waits for the jobs returned by :meth:`submit` and returns the
+        request result.
+
+        :param timeout: maximum time to wait for each job, in seconds.
+        """
+        results = [job.wait(timeout) for job in jobs]
+        if jobs[0].worker in GATHER_WORKERS:
+            return GATHER_WORKERS[jobs[0].worker](results)
+        if len(results) > 1 and False in results:
+            return False
+        return results[0]
+
+    def stats(self):
+        """
+        Returns the statistics of each lane: a dict that maps the lane names
+        to the list of the queue statistics of the lane executors (see
+        :meth:`JobQueue.stats`).
+        """
+        return dict((name, [e.queue.stats() for e in executors])
+                    for name, executors in self.lanes.items())
+
+
+class _Sequencer(object):
+    """
+    Makes sure the requests are submitted to the pool in the order the
+    connections have been accepted (e.g. a document update must be submitted
+    before the completion request that follows it).
+    """
+    def __init__(self):
+        self._next = 0
+        self._done = set()
+        self._condition = threading.Condition()
+
+    def wait(self, ticket):
+        with self._condition:
+            while self._next < ticket:
+                self._condition.wait()
+
+    def release(self, ticket):
+        with self._condition:
+            if ticket < self._next or ticket in self._done:
+                return
+            self._done.add(ticket)
+            while self._next in self._done:
+                self._done.remove(self._next)
+                self._next += 1
+            self._condition.notify_all()
+
+
+class PoolServer(socketserver.ThreadingMixIn, JsonServer):
+    """
+    A JsonServer that handles the requests in threads and runs the workers
+    in a :class:`WorkerPool`.
+    """
+    daemon_threads = True
+
+    class _Handler(JsonServer._Handler):
+        ticket = None
+
+        def setup(self):
+            JsonServer._Handler.setup(self)
+            self.ticket = self.srv.tickets.pop(id(self.request), None)
+
+        def finish(self):
+            if self.ticket is not None:
+                self.srv.sequencer.release(self.ticket)
+            JsonServer._Handler.finish(self)
+
+        def _handle(self, data):
+            response = {'request_id': data.get('request_id'), 'results': []}
+            if data.get('worker') == QUEUE_STATS_WORKER:
+                # answered right away, without waiting for the requests
+                # that have been received before
+                if self.ticket is not None:
+                    self.srv.sequencer.release(self.ticket)
+                response['results'] = self.srv.pool.stats()
+                self.send(response)
+                return
+            try:
+                if self.ticket is not None:
+                    self.srv.sequencer.wait(self.ticket)
+                try:
+                    jobs = self.srv.pool.submit(data['worker'], data['data'])
+                finally:
+                    if self.ticket is not None:
+                        self.srv.sequencer.release(self.ticket)
+                results = self.srv.pool.wait(jobs)
+                if results is None:
+                    results = []
+                response['results'] = results
+            except Exception:
+                _logger().exception('error with data=%r', data)
+            finally:
+                try:
+                    self.send(response)
+                except (IOError, OSError):
+                    pass
+
+    def __init__(self, pool, args=None):
+        """
+        :param pool: the :class:`WorkerPool` (already started)
+        :param args: the server arguments, see
+            :class:`pyqode.core.backend.JsonServer`
+        """
+        global _active_pool
+        #: The worker pool
+        self.pool = pool
+        _active_pool = pool
+        self.sequencer = _Sequencer()
+        self.tickets = {}
+        self._tickets = itertools.count()
+        JsonServer.__init__(self, args=args)
+
+    def process_request(self, request, client_address):
+        self.tickets[id(request)] = next(self._tickets)
+        socketserver.ThreadingMixIn.process_request(
+            self, request, client_address)
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains utility classes for running pyflakes incrementally on a
+document that is being edited.
+
+The module is split into top-level statements. When the code changes, only
+the statements that overlap the modified lines are parsed again, the syntax
+trees of the untouched statements are reused (and their line numbers shifted
+if needed) to build the module tree that is given to pyflakes.
+"""
+import ast
+import io
+
+from pyqode.python.backend.documents import (
+    common_prefix_length, common_suffix_length)
+
+
+def split_lines(code):
+    """
+    Splits the code into lines (keeping the line endings) the same way the
+    python tokenizer does (only '\\r\\n', '\\r' and '\\n' are line
+    separators).
+    """
+    return io.StringIO(code, newline='').readlines()
+
+
+def _parse(code, filename):
+    return compile(code, filename, 'exec', ast.PyCF_ONLY_AST)
+
+
+def _first_line(node):
+    """
+    Returns the first line (0 based) of a statement, including its
+    decorators.
+    """
+    lines = [node.lineno]
+    lines += [d.lineno for d in getattr(node, 'decorator_list', [])]
+    return min(lines) - 1
+
+
+class Segment(object):
+    """
+    A range of lines that contains one or more top-level statements.
+
+    The first segment of a module starts at line 0, the following segments
+    start at the first line of their first statement. A segment ends where the
+    next one starts, so the segments of a module cover all of its lines.
+    """
+    def __init__(self, start, end, nodes):
+        #: First line (0 based)
+        self.start = start
+        #: Last line (excluded)
+        self.end = end
+        #: The top-level statement nodes
+        self.nodes = nodes
+
+    def __repr__(self):
+        return 'Segment(%d, %d, %r)' % (self.start, self.end, self.nodes)
+
+
+def make_segments(nodes, first_line, last_line):
+    """
+    Groups the top-level statements of a tree (or a part of a tree) by their
+    first line.
+
+    :param nodes: list of statement nodes
+    :param first_line: first line (0 based) covered by the nodes
+    :param last_line: last line covered by the nodes (excluded)
+    """
+    segments = []
+    for node in nodes:
+        start = _first_line(node)
+        if segments and start == segments[-1].start:
+            segments[-1].nodes.append(node)
+            continue
+        if segments:
+            segments[-1].end = start
+        elif start != first_line:
+            start = first_line
+        segments.append(Segment(start, last_line, [node]))
+    return segments
+
+
+class IncrementalParser(object):
+    """
+    Parses a python module, reusing the top-level statements that were parsed
+    by the previous call to :meth:`parse` if they are outside of the modified
+    lines.
+
+    If the modified statements cannot be parsed on their own (e.g. an
+    indented line was appended to a function body), the whole module is
+    parsed again so the results (and syntax errors) are always the same as a
+    full parse.
+    """
+    def __init__(self):
+        self._lines = None
+        self._segments = []
+        #: Number of lines that were parsed by the last call to parse
+        self.parsed_lines = 0
+
+    def reset(self):
+        """
+        Forgets the previous parse, the next call to :meth:`parse` will
+        parse the whole module.
+        """
+        self._lines = None
+        self._segments = []
+
+    def parse(self, code, filename='<unknown>', encoding=None, lines=None):
+        """
+        Parses the code and returns the module syntax tree.
+
+        :param code: the code to parse
+        :param filename: filename used in the syntax errors
+        :param encoding: if not None, the code is encoded before being
+            compiled when the whole module must be parsed (the coding cookie
+            of the module is then taken into account).
+        :param lines: the lines of the code (see :func:`split_lines`), if
+            they have already been computed by the caller.
+        :raises: SyntaxError
+        """
+        if lines is None:
+            lines = split_lines(code)
+        try:
+            if self._lines is None or not self._segments:
+                raise SyntaxError('no previous parse')
+            segments = self._parse_incremental(lines, filename)
+        except SyntaxError:
+            self.reset()
+            tree = _parse(code if encoding is None else code.encode(encoding),
+                          filename)
+            segments = make_segments(tree.body, 0, len(lines))
+            self.parsed_lines = len(lines)
+        else:
+            tree = _parse('', filename)
+            tree.body = [node for s in segments for node in s.nodes]
+        self._lines = lines
+        self._segments = segments
+        return tree
+
+    def _parse_incremental(self, lines, filename):
+        old_lines = self._lines
+        segments = self._segments
+        delta = len(lines) - len(old_lines)
+        prefix = common_prefix_length(old_lines, lines)
+        if prefix == len(old_lines) == len(lines):
+            self.parsed_lines = 0
+            return segments
+        limit = min(len(old_lines), len(lines)) - prefix
+        suffix = common_suffix_length(old_lines, lines, limit)
+        old_end = len(old_lines) - suffix
+        # find the segments that overlap the modified lines
+        first = self._segment_index(prefix)
+        last = max(first, self._segment_index(max(prefix, old_end - 1)))
+        start = segments[first].start
+        end = segments[last].end + delta
+        tree = _parse(''.join(lines[start:end]), filename)
+        if start:
+            ast.increment_lineno(tree, start)
+        new_segments = make_segments(tree.body, start, end)
+        tail = segments[last + 1:]
+        for segment in tail:
+            if delta:
+                for node in segment.nodes:
+                    ast.increment_lineno(node, delta)
+                segment.start += delta
+                segment.end += delta
+        if not new_segments:
+            # the modified segments only contain blank lines and comments,
+            # merge them with a neighbour segment
+            if first:
+                segments[first - 1].end = end
+            elif tail:
+                tail[0].start = 0
+        self.parsed_lines = end - start
+        return segments[:first] + new_segments + tail
+
+    def _segment_index(self, line):
+        segments = self._segments
+        lo, hi = 0, len(segments) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if segments[mid].start <= line:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
@@ -7,7 +7,11 @@ for writing your own server.
 
 ::
 
-    usage: server.py [-h] [-s [SYSPATH [SYSPATH ...]]] port
+    usage: server.py [-h] [-s [SYSPATH [SYSPATH ...]]] [-r PROJECT_ROOT]
+                     [-c CACHE_DIR] [-p [PRELOAD [PRELOAD ...]]]
+                     [-w POOL_SIZE] [--stats-file STATS_FILE]
+                     [--trace TRACE] [--trace-level {DEBUG,INFO,WARNING}]
+                     port
 
     positional arguments:
       port                  the local tcp port to use to run the server
@@ -15,38 +19,172 @@ for writing your own server.
     optional arguments:
       -h, --help            show this help message and exit
       -s [SYSPATH [SYSPATH ...]], --syspath [SYSPATH [SYSPATH ...]]
+      -r PROJECT_ROOT, --project-root PROJECT_ROOT
+                            index the definitions of the project modules
+      -c CACHE_DIR, --cache-dir CACHE_DIR
+                            directory of the persistent analysis cache
+      -p [PRELOAD [PRELOAD ...]], --preload [PRELOAD [PRELOAD ...]]
+                            modules to preload once the server is listening
+      -w POOL_SIZE, --pool-size POOL_SIZE
+                            number of lint worker processes, 0 (the default)
+                            to run all the workers in the server process
+      --stats-file STATS_FILE
+                            write the statistics of the workers to a json
+                            file when the server stops
+      --trace TRACE         write the debug trace events to a (rotating) file
+      --trace-level {DEBUG,INFO,WARNING}
+                            level of the trace events (default: DEBUG)
 
 """
 import argparse
 import logging
+import os
+import signal
 import sys
+import time
 
 
-if __name__ == '__main__':
+class Unbuffered(object):
     """
-    Server process' entry point
+    Flushes the wrapped stream after each write so that the messages printed
+    by the backend are immediately logged on the client side.
     """
-    logging.basicConfig()
-    # setup argument parser and parse command line args
-    parser = argparse.ArgumentParser()
-    parser.add_argument("port", help="the local tcp port to use to run "
-                        "the server")
-    parser.add_argument('-s', '--syspath', nargs='*')
-    args = parser.parse_args()
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, data):
+        self.stream.write(data)
+        self.stream.flush()
+
+    def __getattr__(self, attr):
+        return getattr(self.stream, attr)
+
+
+def setup_backend(lane, syspath=None, cache_dir=None, project_root=None,
+                  preload=None, start_time=None, trace=None,
+                  trace_level='DEBUG'):
+    """
+    Configures the backend: tracing, sys.path, completion providers, caches
+    and project symbol index.
+
+    When a worker pool is used, this function is run by each worker process
+    (the project symbol index is only needed by the interactive lane). The
+    warm-up stage is queued on the pool once the backend is configured (see
+    :func:`pyqode.python.backend.warmup.submit`).
+
+    :param lane: the lane of the worker process, None if the workers run in
+        the server process.
+    """
+    from pyqode.python.backend import pool
+    from pyqode.python.backend import tracing
+    from pyqode.python.backend import warmup
+    if start_time is not None:
+        warmup.set_start_time(start_time)
+    if trace and lane is not None:
+        # each worker process writes its own trace file, the server process
+        # traces the scheduling of the requests
+        root, ext = os.path.splitext(trace)
+        tracing.enable('%s-%s-%d%s' % (root, lane, os.getpid(), ext),
+                       getattr(logging, trace_level))
 
     # add user paths to sys.path
-    if args.syspath:
-        for path in args.syspath:
-            print('append path %s to sys.path' % path)
-            sys.path.append(path)
+    if syspath:
+        for path in syspath:
+            if path not in sys.path:
+                tracing.trace('append_syspath', path=path)
+                sys.path.append(path)
 
+    import jedi
     from pyqode.core import backend
+    from pyqode.python.backend import workers
+    from pyqode.python.backend.diskcache import DiskCache
     from pyqode.python.backend.workers import JediCompletionProvider
 
+    if cache_dir:
+        jedi.settings.cache_directory = cache_dir
+        workers.module_cache = DiskCache(os.path.join(cache_dir, 'pyqode'))
+        workers.symbol_index.cache_dir = os.path.join(
+            cache_dir, 'pyqode', 'symbols')
+
     # setup completion providers
     backend.CodeCompletionWorker.providers.append(JediCompletionProvider())
     backend.CodeCompletionWorker.providers.append(
         backend.DocumentWordsProvider())
 
-    # starts the server
-    backend.serve_forever(args)
+    if lane in (None, pool.LANE_INTERACTIVE):
+        # index the project in a background thread
+        if project_root:
+            workers.symbol_index.set_root(project_root)
+
+
+if __name__ == '__main__':
+    """
+    Server process' entry point
+    """
+    start_time = time.time()
+    logging.basicConfig()
+    # setup argument parser and parse command line args
+    parser = argparse.ArgumentParser()
+    parser.add_argument("port", help="the local tcp port to use to run "
+                        "the server")
+    parser.add_argument('-s', '--syspath', nargs='*')
+    parser.add_argument('-r', '--project-root',
+                        help='index the definitions of the project modules')
+    parser.add_argument('-c', '--cache-dir',
+                        help='directory of the persistent analysis cache')
+    parser.add_argument('-p', '--preload', nargs='*', default=[],
+                        help='modules to preload once the server is listening')
+    parser.add_argument('-w', '--pool-size', type=int, default=0,
+                        help='number of lint worker processes, 0 (the '
+                        'default) to run all the workers in the server '
+                        'process')
+    parser.add_argument('--stats-file',
+                        help='write the statistics of the workers to a json '
+                        'file when the server stops')
+    parser.add_argument('--trace',
+                        help='write the debug trace events to a (rotating) '
+                        'file')
+    parser.add_argument('--trace-level', default='DEBUG',
+                        choices=['DEBUG', 'INFO', 'WARNING'],
+                        help='level of the trace events (default: DEBUG)')
+    args = parser.parse_args()
+
+    from pyqode.python.backend import instrumentation
+    from pyqode.python.backend import tracing
+    from pyqode.python.backend import warmup
+    from pyqode.python.backend.pool import PoolServer, WorkerPool
+
+    sys.stdout = Unbuffered(sys.stdout)
+    sys.stderr = Unbuffered(sys.stderr)
+    if args.trace:
+        tracing.enable(args.trace, getattr(logging, args.trace_level))
+    options = (args.syspath, args.cache_dir, args.project_root, args.preload,
+               start_time, args.trace, args.trace_level)
+    if args.pool_size > 0:
+        # run the workers in a pool of processes
+        pool = WorkerPool(lint_processes=args.pool_size,
+                          initializer=setup_backend, initargs=options)
+    else:
+        # run the workers in a thread of the server process
+        pool = WorkerPool(lint_processes=0)
+    pool.start()
+    # starts the server, the socket is listening once the server is created,
+    # the warm-up stage starts right after
+    server = PoolServer(pool, args=args)
+    if args.pool_size <= 0:
+        setup_backend(None, *options)
+    # load the persistent analysis cache and preload the modules, between the
+    # requests handled by the interactive lane
+    warmup.submit(pool, args.preload)
+    if args.stats_file:
+        # the client stops the server with SIGTERM, exit gracefully to write
+        # the statistics
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    finally:
+        if args.stats_file:
+            stats = pool.wait(pool.submit(
+                'pyqode.python.backend.workers.get_stats', {}), timeout=5)
+            instrumentation.dump(args.stats_file, stats)
+        pool.stop()
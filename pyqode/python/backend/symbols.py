@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the project symbol index.
+
+The index contains the definitions (classes, functions, methods and module
+level variables) of all the python modules found under the project root. It
+is built in a background thread using the ast module (which is a lot faster
+than letting jedi follow the imports), kept up to date when a file is saved
+and persisted on disk so that only the modified files are parsed again when
+the backend is restarted.
+
+The index is persisted as json (loading it cannot run any code) in a
+directory that is only accessible to the user.
+"""
+import ast
+import json
+import logging
+import os
+import threading
+
+from pyqode.python.backend.cache import content_hash
+
+#: Version of the on-disk format, bump it whenever the content of the index
+#: changes.
+INDEX_VERSION = 2
+
+#: Names of the directories that are not indexed
+SKIPPED_DIRECTORIES = frozenset([
+    '__pycache__', 'node_modules', 'site-packages', 'build', 'dist'])
+
+#: Files bigger than this size (in bytes) are not indexed
+MAX_FILE_SIZE = 1024 * 1024
+
+#: Number of seconds the index is saved after a file has been indexed again,
+#: the saves of the files saved in the meantime are coalesced.
+SAVE_DELAY = 2.0
+
+
+def _logger():
+    return logging.getLogger(__name__)
+
+
+def module_name(path, root):
+    """
+    Returns the dotted name of the module at ``path``, relative to the project
+    root.
+    """
+    relpath = os.path.relpath(os.path.splitext(path)[0], root)
+    parts = relpath.split(os.sep)
+    if parts[-1] == '__init__' and len(parts) > 1:
+        parts.pop()
+    return '.'.join(parts)
+
+
+def extract_symbols(code, module, path):
+    """
+    Extracts the definitions of a module: classes, functions, methods
+    (recursively for nested classes) and module level variables.
+
+    :param code: source code of the module
+    :param module: dotted name of the module
+    :param path: path of the module
+    :returns: list of (name, full_name, path, line, column, kind) tuples.
+        Lines are 0 based.
+    :raises: SyntaxError, ValueError
+    """
+    symbols = []
+
+    def visit(nodes, prefix, top_level):
+        for node in nodes:
+            if isinstance(node, ast.ClassDef):
+                kind = 'class'
+            elif isinstance(node, (ast.FunctionDef,
+                                   getattr(ast, 'AsyncFunctionDef', ()))):
+                kind = 'def'
+            elif isinstance(node, ast.Assign) and top_level:
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        symbols.append((
+                            target.id, '%s.%s' % (prefix, target.id), path,
+                            target.lineno - 1, target.col_offset,
+                            'statement'))
+                continue
+            else:
+                continue
+            full_name = '%s.%s' % (prefix, node.name)
+            symbols.append((node.name, full_name, path, node.lineno - 1,
+                            node.col_offset, kind))
+            if kind == 'class':
+                visit(node.body, full_name, False)
+
+    tree = compile(code, path, 'exec', ast.PyCF_ONLY_AST)
+    visit(tree.body, module, True)
+    return symbols
+
+
+def _symbol(name, full_name, path, line, column, kind):
+    """
+    Checks the fields of a symbol loaded from the persisted index.
+
+    :raises: TypeError, ValueError
+    """
+    return name, full_name, path, int(line), int(column), kind
+
+
+def bound_names(code):
+    """
+    Returns the set of names that are bound in a module (definitions,
+    parameters, assignments, loop variables,...), excluding the names bound
+    by import statements.
+
+    :raises: SyntaxError, ValueError
+    """
+    names = set()
+    tree = compile(code, '<unknown>', 'exec', ast.PyCF_ONLY_AST)
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.ClassDef, ast.FunctionDef,
+                             getattr(ast, 'AsyncFunctionDef', ()))):
+            names.add(node.name)
+        elif isinstance(node, ast.Name) and not isinstance(
+                node.ctx, ast.Load):
+            names.add(node.id)
+        elif isinstance(node, ast.ExceptHandler) and isinstance(
+                node.name, str):
+            names.add(node.name)
+        else:
+            # python 3 parameters (python 2 uses Name nodes in Param context)
+            name = getattr(node, 'arg', None)
+            if isinstance(node, getattr(ast, 'arg', ())) and name:
+                names.add(name)
+    return names
+
+
+def imported_names(code):
+    """
+    Returns the names bound by the import statements of a module.
+
+    :returns: a dict that maps the bound names to a list of (target,
+        top_level) tuples, one per import statement. target is the dotted name
+        of the imported module or object (it starts with dots for the relative
+        imports) and top_level is False if the import is made in a function or
+        in a class.
+    :raises: SyntaxError, ValueError
+    """
+    names = {}
+    scopes = (ast.ClassDef, ast.FunctionDef, ast.Lambda,
+              getattr(ast, 'AsyncFunctionDef', ()))
+
+    def visit(node, top_level):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.Import):
+                for alias in child.names:
+                    if alias.asname:
+                        name, target = alias.asname, alias.name
+                    else:
+                        # "import os.path" binds "os"
+                        name = target = alias.name.split('.')[0]
+                    names.setdefault(name, []).append((target, top_level))
+            elif isinstance(child, ast.ImportFrom):
+                module = '.' * (child.level or 0) + (child.module or '')
+                if not module.endswith('.'):
+                    module += '.'
+                for alias in child.names:
+                    if alias.name != '*':
+                        name = alias.asname or alias.name
+                        names.setdefault(name, []).append(
+                            (module + alias.name, top_level))
+            else:
+                visit(child, top_level and not isinstance(child, scopes))
+
+    visit(compile(code, '<unknown>', 'exec', ast.PyCF_ONLY_AST), True)
+    return names
+
+
+def resolve_import(target, module, is_package=False):
+    """
+    Returns the absolute dotted name of an import target (see
+    :func:`imported_names`).
+
+    :param target: the target, relative targets start with dots
+    :param module: dotted name of the importing module (or None)
+    :param is_package: True if the importing module is a package
+        (``__init__.py``)
+    :returns: the absolute name or None if a relative target cannot be
+        resolved.
+    """
+    if not target.startswith('.'):
+        return target
+    if module is None:
+        return None
+    level = len(target) - len(target.lstrip('.'))
+    parts = module.split('.')
+    if not is_package:
+        parts.pop()
+    if level - 1 > len(parts):
+        return None
+    parts = parts[:len(parts) - level + 1]
+    rest = target[level:]
+    if rest:
+        parts.append(rest)
+    return '.'.join(parts) or None
+
+
+class SymbolIndex(object):
+    """
+    An index of the definitions of the python modules of a project.
+
+    Call :meth:`set_root` to start indexing a project in a background thread,
+    the index can be queried (with :meth:`lookup`) while it is being built, it
+    then only contains the modules that have been indexed so far.
+    """
+    def __init__(self, cache_dir=None):
+        """
+        :param cache_dir: directory where the index is persisted, None to
+            keep the index in memory only.
+        """
+        #: Directory where the index is persisted
+        self.cache_dir = cache_dir
+        #: Project root directory
+        self.root = None
+        # path -> (mtime, size, symbols)
+        self._files = {}
+        # name -> list of symbols
+        self._names = {}
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self._save_timer = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def ready(self):
+        """
+        True once the index has been fully built.
+        """
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Waits until the index has been fully built.
+
+        :returns: True if the index is ready.
+        """
+        return self._ready.wait(timeout)
+
+    def __len__(self):
+        return len(self._files)
+
+    def set_root(self, root, background=True):
+        """
+        Sets the project root and (re)builds the index.
+
+        The persisted index of the project is loaded first, then the modules
+        that have been modified since the index was saved are indexed again.
+
+        :param root: the project root directory
+        :param background: True to build the index in a background thread.
+        """
+        root = os.path.abspath(root)
+        with self._lock:
+            if root == self.root:
+                return
+            self.root = root
+            self._files = {}
+            self._names = {}
+            self._ready.clear()
+            self._load()
+        if background:
+            self._thread = threading.Thread(target=self._build, args=(root, ))
+            self._thread.daemon = True
+            self._thread.start()
+        else:
+            self._build(root)
+
+    def update_file(self, path):
+        """
+        Indexes a module again (e.g. after it has been saved).
+
+        The index is persisted :attr:`SAVE_DELAY` seconds later, in a
+        background thread.
+
+        :returns: True if the module is part of the project.
+        """
+        if not path or self.root is None:
+            return False
+        path = os.path.abspath(path)
+        if not path.startswith(self.root + os.sep):
+            return False
+        self._index_file(path, self.root)
+        self._schedule_save()
+        return True
+
+    def flush(self):
+        """
+        Persists the index now if a save is pending.
+        """
+        with self._lock:
+            timer, self._save_timer = self._save_timer, None
+        if timer is not None:
+            timer.cancel()
+            self._save()
+
+    def lookup(self, name):
+        """
+        Finds the definitions of a name.
+
+        :returns: list of (name, full_name, path, line, column, kind) tuples
+        """
+        with self._lock:
+            return list(self._names.get(name, ()))
+
+    def stats(self):
+        """
+        Returns a dict with the number of indexed files and symbols.
+        """
+        with self._lock:
+            return {
+                'root': self.root,
+                'ready': self.ready,
+                'files': len(self._files),
+                'symbols': sum(len(f[2]) for f in self._files.values())
+            }
+
+    def _build(self, root):
+        found = set()
+        for dirpath, dirnames, filenames in os.walk(root):
+            if self.root != root:
+                # the project root changed while building
+                return
+            dirnames[:] = [d for d in dirnames if not d.startswith('.') and
+                           d not in SKIPPED_DIRECTORIES]
+            for filename in filenames:
+                if filename.endswith('.py'):
+                    path = os.path.join(dirpath, filename)
+                    found.add(path)
+                    self._index_file(path, root)
+        with self._lock:
+            if self.root != root:
+                return
+            for path in set(self._files) - found:
+                self._set_symbols(path, None)
+        self._save()
+        self._ready.set()
+        _logger().debug('symbol index ready: %r', self.stats())
+
+    def _index_file(self, path, root):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._set_symbols(path, None)
+            return
+        with self._lock:
+            entry = self._files.get(path)
+        if entry and entry[:2] == (stat.st_mtime, stat.st_size):
+            return
+        symbols = []
+        if stat.st_size <= MAX_FILE_SIZE:
+            try:
+                with open(path, 'rb') as f:
+                    code = f.read()
+                symbols = extract_symbols(code, module_name(path, root), path)
+            except (IOError, OSError, SyntaxError, ValueError, TypeError):
+                _logger().debug('failed to index %r', path)
+        with self._lock:
+            if self.root == root:
+                self._set_symbols(path, (stat.st_mtime, stat.st_size, symbols))
+
+    def _set_symbols(self, path, entry):
+        """ Replaces the symbols of a file, must be called with the lock. """
+        old = self._files.pop(path, None)
+        if old:
+            for symbol in old[2]:
+                definitions = self._names[symbol[0]]
+                definitions.remove(symbol)
+                if not definitions:
+                    del self._names[symbol[0]]
+        if entry:
+            self._files[path] = entry
+            for symbol in entry[2]:
+                self._names.setdefault(symbol[0], []).append(symbol)
+
+    def _cache_path(self):
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, 'symbols-%s.json' %
+                            content_hash(self.root))
+
+    def _load(self):
+        path = self._cache_path()
+        if not path or not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data['version'] != INDEX_VERSION or data['root'] != self.root:
+                return
+            for file_path, (mtime, size, symbols) in data['files'].items():
+                self._set_symbols(file_path, (mtime, size, [
+                    _symbol(*symbol) for symbol in symbols]))
+        except Exception:
+            _logger().exception('failed to load the symbol index %r', path)
+            self._files = {}
+            self._names = {}
+
+    def _schedule_save(self):
+        if not self._cache_path():
+            return
+        with self._lock:
+            if self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(SAVE_DELAY, self._delayed_save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _delayed_save(self):
+        with self._lock:
+            if self._save_timer is None:
+                # flushed in the meantime
+                return
+            self._save_timer = None
+        self._save()
+
+    def _save(self):
+        path = self._cache_path()
+        if not path:
+            return
+        with self._lock:
+            data = {'version': INDEX_VERSION, 'root': self.root,
+                    'files': dict(self._files)}
+        try:
+            with self._save_lock:
+                if not os.path.exists(self.cache_dir):
+                    os.makedirs(self.cache_dir, 0o700)
+                tmp_path = '%s.%d' % (path, os.getpid())
+                with open(tmp_path, 'w') as f:
+                    json.dump(data, f)
+                if os.path.exists(path):
+                    os.remove(path)
+                os.rename(tmp_path, path)
+        except (IOError, OSError):
+            _logger().exception('failed to save the symbol index %r', path)
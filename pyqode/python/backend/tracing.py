@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the opt-in debug tracing of the backend.
+
+A trace event is a name and a set of fields (e.g. the worker name and the
+duration of a request). The events are written as json lines to a rotating
+file (``server.py --trace FILE``), they are disabled by default.
+
+:func:`trace` returns right away if the level of the event is lower than the
+tracing level: the fields are only stored in the log record and formatted
+(with ``repr`` for the values that are not json serialisable) when the event
+is written, which means that the default path does not do any formatting
+work::
+
+    tracing.trace('completions', completions=completions)
+
+"""
+import json
+import logging
+import logging.handlers
+
+
+#: Name of the logger used to write the trace events
+LOGGER_NAME = 'pyqode.python.backend.trace'
+
+_DISABLED = logging.CRITICAL + 1
+_level = _DISABLED
+
+
+class TraceFormatter(logging.Formatter):
+    """
+    Formats the trace events as json lines.
+    """
+    def format(self, record):
+        event = {
+            'time': record.created,
+            'level': record.levelname,
+            'event': record.msg,
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        event.update(getattr(record, 'fields', {}))
+        return json.dumps(event, default=repr, sort_keys=True)
+
+
+def _logger():
+    return logging.getLogger(LOGGER_NAME)
+
+
+def enable(path, level=logging.DEBUG, max_bytes=10 * 1024 * 1024,
+           backup_count=3):
+    """
+    Enables the tracing.
+
+    :param path: path of the trace file, the file is rotated when its size
+        reaches ``max_bytes``.
+    :param level: level of the events to write
+    :param max_bytes: maximum size of the trace file
+    :param backup_count: number of rotated files to keep
+    """
+    global _level
+    disable()
+    handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backup_count)
+    handler.setFormatter(TraceFormatter())
+    logger = _logger()
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    # the events are only written to the trace file
+    logger.propagate = False
+    _level = level
+
+
+def disable():
+    """
+    Disables the tracing and closes the trace file.
+    """
+    global _level
+    _level = _DISABLED
+    logger = _logger()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def is_enabled(level=logging.DEBUG):
+    """
+    Returns True if the events of the given level are written.
+    """
+    return level >= _level
+
+
+def trace(event, level=logging.DEBUG, **fields):
+    """
+    Writes a trace event.
+
+    :param event: name of the event
+    :param level: level of the event
+    :param fields: fields of the event, they are formatted only if the event
+        is written.
+    """
+    if level < _level:
+        return
+    _logger().log(level, event, extra={'fields': fields})
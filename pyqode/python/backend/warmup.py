@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the backend warm-up stage.
+
+The first completion request made on a fresh backend has to import jedi,
+analyse the builtins module and the modules imported by the document. The
+warm-up stage does that work as soon as the server is listening, before the
+user asks for a completion.
+
+jedi is not thread-safe: the warm-up stage is not run in its own thread but
+as a series of low priority jobs (see :func:`submit`) queued on the
+executor of the interactive lane, the one that serves the completion
+requests. A completion request only waits for the warm-up step that is being
+run (e.g. the preloading of a module), not for the whole stage.
+
+The module also records a few timings (see :func:`status`) that can be used
+to measure the time to the first useful completion.
+"""
+import logging
+import threading
+import time
+
+from pyqode.python.backend import tracing
+
+
+_lock = threading.Lock()
+_ready = threading.Event()
+_status = {
+    'start_time': time.time(),
+    'modules': [],
+    'failed_modules': [],
+    'ready_time': None,
+    'warmup_duration': None,
+    'first_completion_time': None,
+    'first_completion_duration': None,
+}
+
+
+def _logger():
+    return logging.getLogger(__name__)
+
+
+def set_start_time(start_time):
+    """
+    Sets the time the backend process started, the timings reported by
+    :func:`status` are relative to this time.
+    """
+    with _lock:
+        _status['start_time'] = start_time
+
+
+def warm_up(modules=()):
+    """
+    Runs the warm-up stage in the calling thread: loads the persistent module
+    cache (see :attr:`pyqode.python.backend.workers.module_cache`), analyses
+    the builtins with a dummy completion and then preloads the given modules.
+    The members of the installed modules are stored in the module cache.
+
+    The calling thread must be the only one that uses jedi, use
+    :func:`submit` to run the stage on a worker pool.
+
+    :param modules: names of the modules to preload.
+    """
+    for step in steps(modules):
+        run_step(step)
+
+
+def steps(modules=()):
+    """
+    Returns the request data of the steps of the warm-up stage (see
+    :func:`run_step`).
+
+    :param modules: names of the modules to preload.
+    """
+    return ([{'step': 'start'}] +
+            [{'step': 'preload', 'module': name} for name in modules] +
+            [{'step': 'end'}])
+
+
+def run_step(request_data):
+    """
+    Worker that runs a step of the warm-up stage (see :func:`steps`).
+
+    :param request_data: dict with the following keys: 'step' ('start',
+        'preload' or 'end') and 'module' (the name of the module to preload).
+    """
+    import jedi
+    from pyqode.python.backend import workers
+    step = request_data['step']
+    if step == 'start':
+        with _lock:
+            _status['warmup_start'] = time.time()
+        workers.module_cache.load()
+        try:
+            jedi.Script('', 1, 0, None, 'utf-8').completions()
+        except Exception:
+            _logger().exception('warm-up: dummy completion failed')
+    elif step == 'preload':
+        name = request_data['module']
+        try:
+            jedi.preload_module(name)
+            workers._module_members(name)
+        except Exception:
+            _logger().exception('warm-up: failed to preload %r', name)
+            with _lock:
+                _status['failed_modules'].append(name)
+        else:
+            with _lock:
+                _status['modules'].append(name)
+    else:
+        end = time.time()
+        with _lock:
+            start = _status.pop('warmup_start', end)
+            _status['warmup_duration'] = end - start
+            _status['ready_time'] = end - _status['start_time']
+        _ready.set()
+        tracing.trace('warmup', level=logging.INFO, duration=end - start,
+                      ready_time=end - _status['start_time'],
+                      modules=_status['modules'],
+                      failed_modules=_status['failed_modules'])
+    return True
+
+
+def submit(pool, modules=()):
+    """
+    Queues the steps of the warm-up stage on the executor of the interactive
+    lane of a worker pool, with the lowest priority (see
+    :attr:`pyqode.python.backend.pool.PRIORITY_WARMUP`): the steps are run
+    between the requests, by the thread or process that runs jedi.
+
+    :param pool: the :class:`pyqode.python.backend.pool.WorkerPool`
+    :param modules: names of the modules to preload.
+    :returns: the list of the submitted jobs
+    """
+    from pyqode.python.backend.pool import LANE_INTERACTIVE, WARMUP_WORKER
+    executor = pool.lanes[LANE_INTERACTIVE][0]
+    return [executor.submit(WARMUP_WORKER, data) for data in steps(modules)]
+
+
+def is_ready():
+    """
+    Returns True once the warm-up stage is finished.
+    """
+    return _ready.is_set()
+
+
+def record_completion(duration):
+    """
+    Records the time of the first completion request, this is a no-op for
+    the next requests.
+
+    :param duration: time (in seconds) it took to compute the completions.
+    """
+    if _status['first_completion_time'] is not None:
+        return
+    with _lock:
+        if _status['first_completion_time'] is None:
+            _status['first_completion_time'] = \
+                time.time() - _status['start_time']
+            _status['first_completion_duration'] = duration
+
+
+def status():
+    """
+    Returns the warm-up status and timings: a dict with the following keys:
+
+        - ready: True if the warm-up stage is finished
+        - modules: the preloaded modules
+        - failed_modules: the modules that could not be preloaded
+        - ready_time: time (since the start of the backend) at which the
+          warm-up stage finished
+        - warmup_duration: duration of the warm-up stage
+        - first_completion_time: time (since the start of the backend) at
+          which the first completion request was served
+        - first_completion_duration: duration of the first completion
+          request
+    """
+    with _lock:
+        ret_val = dict(_status)
+        ret_val['modules'] = list(_status['modules'])
+        ret_val['failed_modules'] = list(_status['failed_modules'])
+    ret_val['ready'] = is_ready()
+    del ret_val['start_time']
+    ret_val.pop('warmup_start', None)
+    return ret_val
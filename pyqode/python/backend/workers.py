@@ -3,12 +3,39 @@
 """
 Contains the worker classes/functions executed on the server side.
 """
+import copy
+import itertools
 import logging
 import os
+import re
+import sys
+import sysconfig
 import tempfile
+import time
+import uuid
 import jedi
+try:
+    import builtins
+except ImportError:
+    builtins = __import__('__builtin__')
 from pyqode.core.share import Definition
 from pyflakes import messages
+from pyqode.python.backend.cache import LRUCache, content_hash
+from pyqode.python.backend.cancellation import (
+    RequestCancelled, check_cancelled)
+from pyqode.python.backend import completion
+from pyqode.python.backend.diskcache import DiskCache
+from pyqode.python.backend.documents import DocumentStore
+from pyqode.python.backend.instrumentation import instrumented
+from pyqode.python.backend import instrumentation
+from pyqode.python.backend import outline
+from pyqode.python.backend.outline import OutlineEngine
+from pyqode.python.backend.pyflakesutils import (
+    IncrementalParser, split_lines)
+from pyqode.python.backend.symbols import (
+    SymbolIndex, bound_names, imported_names, module_name, resolve_import)
+from pyqode.python.backend import tracing
+from pyqode.python.backend import warmup
 
 
 def _logger():
@@ -18,6 +45,181 @@ def _logger():
     return logging.getLogger(__name__)
 
 
+#: Cache of the jedi scripts, keyed by (path, content hash). The size of an
+#: entry is the length of its source code.
+script_cache = LRUCache(max_entries=8, max_size=10 * 1024 * 1024)
+
+#: Cache of the completions computed at the anchor of a completion (the start
+#: of the typed word), keyed by (hash of the code without the typed prefix,
+#: path, line, column). The size of an entry is its number of completions.
+completion_cache = LRUCache(max_entries=4, max_size=100000)
+
+#: The completion sets that can be referenced by the completion handles (see
+#: :func:`resolve_completions`), keyed by completion set id.
+completion_sets = LRUCache(max_entries=16, max_size=400000)
+
+#: Cache of the resolved completions (description and docstring), keyed by
+#: completion handle.
+resolved_completions = LRUCache(max_entries=2000, max_size=2000)
+
+_completion_set_ids = itertools.count(1)
+
+_EOL = re.compile(r'\r\n|\r|\n')
+
+#: Shadow copies of the documents synchronised by the editors (see
+#: :class:`pyqode.python.modes.DocumentSyncMode`)
+document_store = DocumentStore()
+
+
+def _input_size(request_data):
+    """
+    Returns the size of the code of a request (see
+    :mod:`pyqode.python.backend.instrumentation`): the length of the code sent
+    with the request or of the shadow copy of the document.
+    """
+    try:
+        return len(request_data['code'])
+    except KeyError:
+        pass
+    code = document_store.get(request_data.get('document_id'))
+    return len(code) if code is not None else 0
+
+
+def get_stats(request_data):
+    """
+    Worker that returns the statistics of the workers: call count, wall
+    time histogram, input size and result size (see
+    :func:`pyqode.python.backend.instrumentation.snapshot`).
+
+    Set ``request_data['reset']`` to True to clear the statistics once they
+    have been returned.
+    """
+    stats = instrumentation.snapshot()
+    if request_data and request_data.get('reset'):
+        instrumentation.reset()
+    return stats
+
+
+@instrumented(input_size=_input_size)
+def open_document(request_data):
+    """
+    Worker that opens (or resets) the shadow copy of a document.
+
+    :param request_data: dict with the following keys: 'document_id', 'code',
+        'version' and 'path'.
+    """
+    document_store.open(request_data['document_id'], request_data['code'],
+                        request_data['version'], request_data.get('path'))
+    return True
+
+
+@instrumented(input_size=_input_size)
+def update_document(request_data):
+    """
+    Worker that applies a list of text edits to the shadow copy of a
+    document.
+
+    :param request_data: dict with the following keys: 'document_id',
+        'edits' (list of (start, end, replacement)), 'base_version',
+        'version', 'length' and 'path'.
+
+    :returns: True on success, False if the document must be opened again.
+    """
+    return document_store.update(
+        request_data['document_id'], request_data['edits'],
+        request_data['base_version'], request_data['version'],
+        length=request_data.get('length'), path=request_data.get('path'))
+
+
+@instrumented(input_size=_input_size)
+def close_document(request_data):
+    """
+    Worker that removes the shadow copy of a document.
+    """
+    document_store.close(request_data['document_id'])
+    return True
+
+
+def _get_code(request_data):
+    """
+    Returns the code to work on: the code sent with the request or the shadow
+    copy of the synchronised document if the request only contains the
+    document id and version.
+
+    :returns: the code or None if the shadow copy is not available (unknown
+        document or version mismatch).
+    """
+    try:
+        return request_data['code']
+    except KeyError:
+        document_id = request_data['document_id']
+        version = request_data.get('version')
+        code = document_store.get(document_id, version)
+        if code is None:
+            _logger().warning('document %r is not synchronised (version %r)',
+                              document_id, version)
+        return code
+
+
+@instrumented(input_size=_input_size)
+def warmup_status(request_data):
+    """
+    Worker that returns the status and timings of the backend warm-up stage
+    (see :func:`pyqode.python.backend.warmup.status`).
+    """
+    return warmup.status()
+
+
+def _strip_closing_paren(code, line):
+    """
+    Removes the closing parenthesis at the end of the given line (jedi has a
+    bug if the statement has a closing parenthesis).
+
+    :returns: the new code or None if the line does not exist.
+    """
+    lines = code.splitlines()
+    try:
+        l = lines[line].rstrip()
+    except IndexError:
+        # at the beginning of the last line (empty)
+        return None
+    if l.endswith(")"):
+        lines[line] = l[:-1]
+    return "\n".join(lines)
+
+
+def _get_script(code, line, column, path, encoding):
+    """
+    Returns a :class:`jedi.Script` for the given code and position, reusing
+    the parsed module of a previous request if the document did not change.
+
+    Scripts are cached by (path, content hash) and a cache hit only creates a
+    shallow copy bound to the new position, so that only the position
+    dependent query has to run.
+
+    :raises: ValueError if the position is not valid (same as jedi.Script).
+    """
+    key = (path, content_hash(code))
+    entry = script_cache.get(key)
+    if entry is None:
+        script = jedi.Script(code, line, column, path, encoding)
+        line_lengths = [len(l) for l in _EOL.split(code)]
+        script_cache.put(key, (script, line_lengths), size=len(code))
+        return script
+    script, line_lengths = entry
+    # mimic jedi.Script's position validation
+    if not 0 < line <= len(line_lengths):
+        raise ValueError('`line` parameter is not in a valid range.')
+    if not 0 <= column <= line_lengths[line - 1]:
+        raise ValueError('`column` parameter is not in a valid range.')
+    # jedi stores the position of the query in the private ``_pos`` attribute,
+    # the parsed module and the evaluator are shared with the cached script.
+    script = copy.copy(script)
+    script._pos = line, column
+    return script
+
+
+@instrumented(input_size=_input_size)
 def calltips(request_data):
     """
     Worker that returns a list of calltips.
@@ -31,7 +233,13 @@ def calltips(request_data):
 
     :returns tuple(module_name, call_name, params)
     """
-    code = request_data['code']
+    code = _get_code(request_data)
+    if code is not None and 'code' not in request_data:
+        # the editor only strips the closing parenthesis when it sends the
+        # code with the request
+        code = _strip_closing_paren(code, request_data['line'])
+    if code is None:
+        return []
     line = request_data['line'] + 1
     column = request_data['column']
     path = request_data['path']
@@ -39,13 +247,14 @@ def calltips(request_data):
     encoding = 'utf-8'
     # use jedi to get call signatures
     try:
-        script = jedi.Script(code, line, column, path, encoding)
+        script = _get_script(code, line, column, path, encoding)
     except ValueError:
         # Is triggered when an the position is invalid, for example if the
         # column is larger or equal to the line length. This may be due to a
         # bug elsewhere in PyQode, but this at least suppresses the error
         # message, and does not seem to hve any adverse side effects.
         return []
+    check_cancelled()
     signatures = script.call_signatures()
     for sig in signatures:
         results = (str(sig.module_name), str(sig.name),
@@ -57,17 +266,133 @@ def calltips(request_data):
     return []
 
 
+#: Index of the definitions of the project modules (see
+#: :func:`set_project_root`), persisted in the (per user) jedi cache
+#: directory.
+symbol_index = SymbolIndex(
+    cache_dir=os.path.join(jedi.settings.cache_directory, 'pyqode', 'symbols'))
+
+#: Names bound in the documents (see :func:`_document_names`), keyed by
+#: content hash
+_document_names_cache = LRUCache(max_entries=4)
+
+_IDENTIFIER = re.compile(r'[^\d\W]\w*', re.UNICODE)
+
+
+@instrumented(input_size=_input_size)
+def set_project_root(request_data):
+    """
+    Worker that sets the project root directory. The definitions of the
+    project modules are indexed in a background thread, the index is then
+    used by :func:`goto_assignments`.
+
+    :param request_data: dict with the following key: 'root'
+    """
+    symbol_index.set_root(request_data['root'])
+    return True
+
+
+@instrumented(input_size=_input_size)
+def update_symbol_index(request_data):
+    """
+    Worker that indexes a module of the project again, this must be called
+    when a file has been saved.
+
+    :param request_data: dict with the following key: 'path'
+    :returns: True if the file is part of the project.
+    """
+    return symbol_index.update_file(request_data['path'])
+
+
+def _document_names(code):
+    """
+    Returns the names bound in a document: a tuple made of the names bound
+    by definitions and assignments (see :func:`bound_names`) and of the names
+    bound by import statements (see :func:`imported_names`).
+
+    :returns: the tuple or None if the document cannot be parsed.
+    """
+    key = content_hash(code)
+    names = _document_names_cache.get(key)
+    if names is None:
+        try:
+            names = bound_names(code), imported_names(code)
+        except (SyntaxError, ValueError, TypeError):
+            return None
+        _document_names_cache.put(key, names)
+    return names
+
+
+def _goto_symbol_index(code, line, column, path=None):
+    """
+    Looks for the name under the cursor in the project symbol index.
+
+    The index is only used for the bare names (not for attributes) that are
+    not bound in the current document (i.e. imported or free names) and that
+    are not builtins, if there is exactly one definition with that name in the
+    project. Attributes are always resolved by jedi: the index cannot know the
+    type of the object. An imported name is only resolved by the index if it
+    is imported from the module of the definition.
+
+    :returns: the assignments list or None if jedi must be used.
+    """
+    if symbol_index.root is None:
+        return None
+    lines = code.splitlines()
+    if not 0 <= line < len(lines):
+        return None
+    name = None
+    for match in _IDENTIFIER.finditer(lines[line]):
+        if match.start() <= column <= match.end():
+            name = match.group()
+            break
+    if name is None or hasattr(builtins, name):
+        return None
+    if lines[line][:match.start()].rstrip().endswith('.'):
+        # attribute
+        return None
+    definitions = symbol_index.lookup(name)
+    if len(definitions) != 1:
+        return None
+    names = _document_names(code)
+    if names is None or name in names[0]:
+        return None
+    _, full_name, def_path, def_line, def_column, _ = definitions[0]
+    if name in names[1]:
+        module = None
+        is_package = False
+        root = symbol_index.root
+        if path and root and os.path.abspath(path).startswith(root + os.sep):
+            module = module_name(os.path.abspath(path), root)
+            is_package = os.path.basename(path) == '__init__.py'
+        targets = set(resolve_import(target, module, is_package)
+                      for target, _ in names[1][name])
+        if targets != set([full_name]):
+            return None
+    return [(def_path, def_line, def_column, full_name)]
+
+
+@instrumented(input_size=_input_size)
 def goto_assignments(request_data):
     """
     Go to assignements worker.
+
+    The project symbol index (see :func:`set_project_root`) is queried first,
+    jedi is used if the index cannot give an unambiguous answer.
     """
-    code = request_data['code']
+    code = _get_code(request_data)
+    if code is None:
+        return []
     line = request_data['line'] + 1
     column = request_data['column']
     path = request_data['path']
+    results = _goto_symbol_index(code, line - 1, column, path)
+    if results:
+        return results
     # encoding = request_data['encoding']
     encoding = 'utf-8'
-    script = jedi.Script(code, line, column, path, encoding)
+    script = _get_script(code, line, column, path, encoding)
+    check_cancelled()
     try:
         definitions = script.goto_assignments()
     except jedi.NotFoundError:
@@ -79,9 +404,6 @@ def goto_assignments(request_data):
         return ret_val
 
 
-_old_definitions = {}
-
-
 def _extract_def(d, path):
     d_line, d_column = d.line, d.column
     # use full name for import type
@@ -109,34 +431,156 @@ def _extract_def(d, path):
     return definition
 
 
-def defined_names(request_data):
+def _jedi_definitions(code, path):
     """
-    Returns the list of defined names for the document.
+    Returns the outline of a piece of code (list of definition dicts).
     """
-    global _old_definitions
     ret_val = []
-    path = request_data['path']
-    toplvl_definitions = jedi.names(
-        request_data['code'], path, 'utf-8')
-    for d in toplvl_definitions:
-        definition = _extract_def(d, path)
+    for d in jedi.names(code, path, 'utf-8'):
+        check_cancelled()
         if d.type != 'import':
-            ret_val.append(definition)
-    ret_val = [d.to_dict() for d in ret_val]
+            ret_val.append(_extract_def(d, path).to_dict())
     return ret_val
 
 
+def _outline_def(node, path):
+    name = node['name']
+    if node['params'] is not None:
+        name += '(' + ', '.join(node['params']) + ')'
+    definition = Definition(name, node['line'], node['column'],
+                            icon_from_typename(node['name'], node['type']),
+                            file_path=path)
+    for child in node['children']:
+        definition.add_child(_outline_def(child, path))
+    return definition
+
+
+def _ast_definitions(code, path):
+    """
+    Returns the outline of a piece of code (list of definition dicts), using
+    the ast module instead of jedi (see
+    :func:`pyqode.python.backend.outline.parse_outline`).
+    """
+    return [_outline_def(node, path).to_dict()
+            for node in outline.parse_outline(code)]
+
+
+#: Functions that compute the outline of a piece of code, by name. The
+#: provider used by :func:`defined_names` and :func:`defined_names_diff` is
+#: given by ``request_data['provider']`` (``'jedi'`` by default).
+OUTLINE_PROVIDERS = {
+    'jedi': _jedi_definitions,
+    'ast': _ast_definitions,
+}
+
+#: Outline of the blocks of top-level statements, keyed by (content hash,
+#: path, provider), shared by the outline engines. The size of an entry is 1.
+outline_block_cache = LRUCache(max_entries=2000, max_size=2000)
+
+#: Outline engines, keyed by (document id or path, provider). Each entry is
+#: a list: [engine, outline version, outline, version generator].
+outline_engines = LRUCache(max_entries=8)
+
+
+def _outline_versions():
+    """
+    Generates the versions of an outline. The versions are prefixed by a
+    random id so that they are unique across the processes of a worker pool
+    (a version produced by another process is never mistaken for a version
+    of this process).
+    """
+    prefix = uuid.uuid4().hex
+    for number in itertools.count(1):
+        yield '%s-%d' % (prefix, number)
+
+
+def _outline_entry(request_data):
+    provider = request_data.get('provider', 'jedi')
+    key = (request_data.get('document_id', request_data['path']), provider)
+    entry = outline_engines.get(key)
+    if entry is None:
+        engine = OutlineEngine(OUTLINE_PROVIDERS[provider],
+                               outline_block_cache)
+        entry = [engine, None, None, _outline_versions()]
+    outline_engines.put(key, entry)
+    return entry
+
+
+@instrumented(input_size=_input_size)
+def defined_names(request_data):
+    """
+    Returns the list of defined names for the document.
+
+    The outline is computed incrementally: only the top-level statements that
+    changed since the previous request are analysed again (see
+    :class:`pyqode.python.backend.outline.OutlineEngine`).
+
+    The outline is computed by jedi unless ``request_data['provider']`` is
+    ``'ast'``: the ast provider is a lot faster but it does not infer the
+    type of the variables.
+    """
+    code = _get_code(request_data)
+    if code is None:
+        return []
+    engine = _outline_entry(request_data)[0]
+    return engine.outline(code, request_data['path'])
+
+
+@instrumented(input_size=_input_size)
+def defined_names_diff(request_data):
+    """
+    Returns the outline of the document as a diff against the outline
+    previously returned for the same document.
+
+    The request contains the version of the outline of the editor
+    (``outline_version``, None for the first request). If it is the version
+    of the last outline computed by the backend, the result is a dict with
+    the new ``version``, the ``base_version`` and the ``diff`` (see
+    :func:`pyqode.python.backend.outline.diff`), otherwise it contains the
+    new ``version`` and the whole outline (``definitions``).
+
+    The versions are opaque strings, unique across the processes of a worker
+    pool: when consecutive requests are handled by different processes, the
+    base version is unknown and the whole outline is sent again.
+
+    The provider of the outline is given by ``request_data['provider']``,
+    see :func:`defined_names`.
+    """
+    code = _get_code(request_data)
+    if code is None:
+        return None
+    entry = _outline_entry(request_data)
+    engine, version, old_definitions, versions = entry
+    definitions = engine.outline(code, request_data['path'])
+    base_version = request_data.get('outline_version')
+    if old_definitions is not None and base_version == version:
+        changes = outline.diff(old_definitions, definitions)
+        if not outline.is_empty(changes):
+            entry[1] = version = next(versions)
+            entry[2] = definitions
+        return {'version': version, 'base_version': base_version,
+                'diff': changes}
+    if version is None or old_definitions != definitions:
+        entry[1] = version = next(versions)
+        entry[2] = definitions
+    return {'version': version, 'definitions': definitions}
+
+
+@instrumented(input_size=_input_size)
 def quick_doc(request_data):
     """
     Worker that returns the documentation of the symbol under cursor.
     """
-    code = request_data['code']
+    code = _get_code(request_data)
+    if code is None:
+        return []
     line = request_data['line'] + 1
     column = request_data['column']
     path = request_data['path']
     # encoding = 'utf-8'
     encoding = 'utf-8'
-    script = jedi.Script(code, line, column, path, encoding)
+    script = _get_script(code, line, column, path, encoding)
+    check_cancelled()
     try:
         definitions = script.goto_definitions()
     except jedi.NotFoundError:
@@ -146,30 +590,57 @@ def quick_doc(request_data):
         return ret_val
 
 
+@instrumented(input_size=_input_size)
 def run_pep8(request_data):
     """
     Worker that run the pep8 tool on the current editor text.
 
     :returns a list of tuples (msg, msg_type, line_number)
     """
-    import pycodestyle
-    from pyqode.python.backend.pep8utils import CustomChecker
+    code = _get_code(request_data)
+    if code is None:
+        return []
+    return _pep8_messages(
+        code.splitlines(True), request_data['path'],
+        request_data['max_line_length'], request_data['ignore_rules'])
+
+
+#: The pycodestyle style guides, by (max_line_length, ignore_rules)
+style_guides = LRUCache(max_entries=4)
+
+
+def _get_style_guide(max_line_length, ignore_rules):
+    """
+    Gets the style guide for the given configuration, the style guides are
+    cached with their logical lines results so that only the lines that
+    changed since the previous request are checked again.
+    """
+    from pyqode.python.backend.pep8utils import CustomStyleGuide
+    key = (max_line_length, tuple(sorted(ignore_rules)))
+    style_guide = style_guides.get(key)
+    if style_guide is None:
+        import pycodestyle
+        # ignore the rules of the editor configuration in addition to the
+        # checks that pycodestyle ignores by default
+        ignore = pycodestyle.DEFAULT_IGNORE.split(',') + list(key[1])
+        style_guide = CustomStyleGuide(
+            max_line_length=max_line_length, ignore=ignore)
+        style_guides.put(key, style_guide)
+    return style_guide
+
+
+def _pep8_messages(lines, path, max_line_length, ignore_rules):
     WARNING = 1
-    code = request_data['code']
-    path = request_data['path']
-    max_line_length = request_data['max_line_length']
-    ignore_rules = request_data['ignore_rules']
-    ignore_rules += ['W291', 'W292', 'W293', 'W391']
-    pycodestyle.MAX_LINE_LENGTH = max_line_length
+    ignore_rules = ignore_rules + ['W291', 'W292', 'W293', 'W391']
     # setup our custom style guide with our custom checker which returns a list
     # of strings instread of spitting the results at stdout
-    pep8style = pycodestyle.StyleGuide(parse_argv=False, config_file='',
-                                       checker_class=CustomChecker)
+    pep8style = _get_style_guide(max_line_length, ignore_rules)
     try:
-        results = pep8style.input_file(path, lines=code.splitlines(True))
+        results = pep8style.input_file(path, lines=lines)
+    except RequestCancelled:
+        raise
     except Exception:
-        _logger().exception('Failed to run PEP8 analysis with data=%r'
-                            % request_data)
+        _logger().exception('Failed to run PEP8 analysis on %r', path)
         return []
     else:
         messages = []
@@ -190,58 +661,114 @@ PYFLAKES_ERROR_MESSAGES = [
 ]
 
 
+#: Incremental parsers used by run_pyflakes, keyed by document (document id
+#: or path). Each entry is a list: [parser, (path, code), results].
+pyflakes_cache = LRUCache(max_entries=8, max_size=10 * 1024 * 1024)
+
+
+@instrumented(input_size=_input_size)
 def run_pyflakes(request_data):
     """
     Worker that run a frosted (the fork of pyflakes) code analysis on the
     current editor text.
+
+    By default, the analysis is incremental: only the top-level statements
+    that changed since the previous request made on the same document are
+    parsed again. Set ``request_data['incremental']`` to False to always
+    parse the whole module.
     """
     global prev_results
+    code = _get_code(request_data)
+    if not code:
+        return []
+    ret_val = _pyflakes_messages(request_data, code)
+    prev_results = ret_val
+    return ret_val
+
+
+def _pyflakes_messages(request_data, code, lines=None):
     from pyflakes import checker
     import _ast
     WARNING = 1
     ERROR = 2
     ret_val = []
-    code = request_data['code']
     path = request_data['path']
     encoding = request_data['encoding']
     if not encoding:
         encoding = 'utf-8'
     if not path:
         path = os.path.join(tempfile.gettempdir(), 'temp.py')
-    if not code:
-        return []
-    else:
-        # First, compile into an AST and handle syntax errors.
-        try:
+    entry = None
+    if request_data.get('incremental', True):
+        key = request_data.get('document_id', path)
+        entry = pyflakes_cache.get(key)
+        if entry is None:
+            entry = [IncrementalParser(), None, []]
+        elif entry[1] == (path, code):
+            return list(entry[2])
+        pyflakes_cache.put(key, entry, size=len(code))
+    # First, compile into an AST and handle syntax errors.
+    try:
+        if entry is not None:
+            tree = entry[0].parse(code, path, encoding, lines=lines)
+        else:
             tree = compile(code.encode(encoding), path, "exec",
                            _ast.PyCF_ONLY_AST)
-        except SyntaxError as value:
-            msg = '[pyFlakes] %s' % value.args[0]
-            (lineno, offset, text) = value.lineno - 1, value.offset, value.text
-            # If there's an encoding problem with the file, the text is None
-            if text is None:
-                # Avoid using msg, since for the only known case, it
-                # contains a bogus message that claims the encoding the
-                # file declared was unknown.s
-                _logger().warning("[SyntaxError] %s: problem decoding source",
-                                  path)
-            else:
-                ret_val.append((msg, ERROR, lineno))
+    except SyntaxError as value:
+        msg = '[pyFlakes] %s' % value.args[0]
+        (lineno, offset, text) = value.lineno - 1, value.offset, value.text
+        # If there's an encoding problem with the file, the text is None
+        if text is None:
+            # Avoid using msg, since for the only known case, it
+            # contains a bogus message that claims the encoding the
+            # file declared was unknown.s
+            _logger().warning("[SyntaxError] %s: problem decoding source",
+                              path)
         else:
-            # Okay, it's syntactically valid.  Now check it.
-            w = checker.Checker(tree, os.path.split(path)[1])
-            w.messages.sort(key=lambda m: m.lineno)
-            for message in w.messages:
-                msg = "[pyFlakes] %s" % str(message).split(':')[-1].strip()
-                line = message.lineno - 1
-                status = WARNING \
-                    if message.__class__ not in PYFLAKES_ERROR_MESSAGES \
-                    else ERROR
-                ret_val.append((msg, status, line))
-    prev_results = ret_val
+            ret_val.append((msg, ERROR, lineno))
+    else:
+        # Okay, it's syntactically valid.  Now check it.
+        check_cancelled()
+        w = checker.Checker(tree, os.path.split(path)[1])
+        w.messages.sort(key=lambda m: m.lineno)
+        for message in w.messages:
+            msg = "[pyFlakes] %s" % str(message).split(':')[-1].strip()
+            line = message.lineno - 1
+            status = WARNING \
+                if message.__class__ not in PYFLAKES_ERROR_MESSAGES \
+                else ERROR
+            ret_val.append((msg, status, line))
+    if entry is not None:
+        entry[1] = (path, code)
+        entry[2] = list(ret_val)
     return ret_val
 
 
+@instrumented(input_size=_input_size)
+def run_lint(request_data):
+    """
+    Worker that runs both pyflakes and pycodestyle on the current editor text
+    and returns their merged messages, sorted by line number.
+
+    This does the job of :func:`run_pyflakes` and :func:`run_pep8` in a
+    single request: the code is sent (or synchronised) and split into lines
+    only once.
+
+    :returns a list of tuples (msg, msg_type, line_number)
+    """
+    code = _get_code(request_data)
+    if not code:
+        return []
+    lines = split_lines(code)
+    messages = _pyflakes_messages(request_data, code, lines=lines)
+    check_cancelled()
+    messages += _pep8_messages(
+        lines, request_data['path'], request_data['max_line_length'],
+        request_data['ignore_rules'])
+    messages.sort(key=lambda msg: msg[2])
+    return messages
+
+
 ICON_CLASS = ('code-class', ':/pyqode_python_icons/rc/class.png')
 ICON_FUNC = ('code-function', ':/pyqode_python_icons/rc/func.png')
 ICON_FUNC_PRIVATE = ('code-function', ':/pyqode_python_icons/rc/func_priv.png')
@@ -252,82 +779,469 @@ ICON_VAR = ('code-variable', ':/pyqode_python_icons/rc/var.png')
 ICON_KEYWORD = ('quickopen', ':/pyqode_python_icons/rc/keyword.png')
 
 
+#: Icons of the jedi types (upper case). The 'PARAM' and 'FUNCTION' types
+#: have a variant for the private ('-PRIV') and protected ('-PROT') names.
+#: Use :func:`register_icon` to add an icon.
+ICONS = {
+    'CLASS': ICON_CLASS,
+    'IMPORT': ICON_NAMESPACE,
+    'STATEMENT': ICON_VAR,
+    'FORFLOW': ICON_VAR,
+    'FORSTMT': ICON_VAR,
+    'WITHSTMT': ICON_VAR,
+    'GLOBALSTMT': ICON_VAR,
+    'MODULE': ICON_NAMESPACE,
+    'KEYWORD': ICON_KEYWORD,
+    'PARAM': ICON_VAR,
+    'ARRAY': ICON_VAR,
+    'INSTANCEELEMENT': ICON_VAR,
+    'INSTANCE': ICON_VAR,
+    'PARAM-PRIV': ICON_VAR,
+    'PARAM-PROT': ICON_VAR,
+    'PROPERTY': ICON_VAR,
+    'PATH': ICON_NAMESPACE,
+    'FUNCTION': ICON_FUNC,
+    'DEF': ICON_FUNC,
+    'FUNCTION-PRIV': ICON_FUNC_PRIVATE,
+    'FUNCTION-PROT': ICON_FUNC_PROTECTED
+}
+
+#: Icons resolved by :func:`icon_from_typename`, keyed by (typename, suffix)
+_icon_cache = {}
+_unknown_icon_types = set()
+_VISIBILITY_SUFFIXES = ('', '-PROT', '-PRIV')
+
+
+def register_icon(typename, icon):
+    """
+    Registers the icon of a jedi type, e.g. to support a type introduced by
+    a new version of jedi.
+
+    :param typename: the jedi type, optionally followed by '-PRIV' or
+        '-PROT' to register the icon of the private or protected names.
+    :param icon: the icon: a tuple (theme icon name, icon resource filename)
+        or None.
+    """
+    ICONS[typename.upper()] = icon
+    _icon_cache.clear()
+
+
 def icon_from_typename(name, icon_type):
     """
     Returns the icon resource filename that corresponds to the given typename.
 
+    The resolved icons are memoized, an unknown typename is only reported
+    once.
+
     :param name: name of the completion. Use to make the distinction between
         public and private completions (using the count of starting '_')
     :pram typename: the typename reported by jedi
 
     :returns: The associate icon resource filename or None.
     """
-    ICONS = {
-        'CLASS': ICON_CLASS,
-        'IMPORT': ICON_NAMESPACE,
-        'STATEMENT': ICON_VAR,
-        'FORFLOW': ICON_VAR,
-        'FORSTMT': ICON_VAR,
-        'WITHSTMT': ICON_VAR,
-        'GLOBALSTMT': ICON_VAR,
-        'MODULE': ICON_NAMESPACE,
-        'KEYWORD': ICON_KEYWORD,
-        'PARAM': ICON_VAR,
-        'ARRAY': ICON_VAR,
-        'INSTANCEELEMENT': ICON_VAR,
-        'INSTANCE': ICON_VAR,
-        'PARAM-PRIV': ICON_VAR,
-        'PARAM-PROT': ICON_VAR,
-        'FUNCTION': ICON_FUNC,
-        'DEF': ICON_FUNC,
-        'FUNCTION-PRIV': ICON_FUNC_PRIVATE,
-        'FUNCTION-PROT': ICON_FUNC_PROTECTED
-    }
-    ret_val = None
-    icon_type = icon_type.upper()
     # jedi 0.8 introduced NamedPart class, which have a string instead of being
     # one
     if hasattr(name, "string"):
         name = name.string
-    if icon_type == "FORFLOW" or icon_type == "STATEMENT":
-        icon_type = "PARAM"
-    if icon_type == "PARAM" or icon_type == "FUNCTION":
-        if name.startswith("__"):
-            icon_type += "-PRIV"
-        elif name.startswith("_"):
-            icon_type += "-PROT"
-    if icon_type in ICONS:
-        ret_val = ICONS[icon_type]
-    elif icon_type:
-        _logger().warning("Unimplemented completion icon_type: %s", icon_type)
+    if name.startswith("__"):
+        visibility = 2
+    elif name.startswith("_"):
+        visibility = 1
+    else:
+        visibility = 0
+    key = (icon_type, visibility)
+    try:
+        return _icon_cache[key]
+    except KeyError:
+        pass
+    type_name = (icon_type or '').upper()
+    if type_name == "FORFLOW" or type_name == "STATEMENT":
+        type_name = "PARAM"
+    if type_name == "PARAM" or type_name == "FUNCTION":
+        type_name += _VISIBILITY_SUFFIXES[visibility]
+    ret_val = ICONS.get(type_name)
+    if type_name and type_name not in ICONS and \
+            type_name not in _unknown_icon_types:
+        _unknown_icon_types.add(type_name)
+        _logger().warning("Unimplemented completion icon_type: %s", type_name)
+    _icon_cache[key] = ret_val
+    return ret_val
+
+
+#: Persistent cache of the members of the installed modules (standard library
+#: and site-packages), used to complete ``module.`` expressions without
+#: analysing the module again after a restart of the backend.
+module_cache = DiskCache(
+    os.path.join(jedi.settings.cache_directory, 'pyqode'))
+
+_WORD = re.compile(r'\w*', re.UNICODE)
+_ATTRIBUTE = re.compile(r'(?:^|[^\w.])([^\d\W][\w.]*)\.(\w*)$', re.UNICODE)
+
+
+def _source_suffixes():
+    try:
+        from importlib import machinery
+    except ImportError:
+        return ['.py', '.so', '.pyd']
+    return machinery.SOURCE_SUFFIXES + machinery.EXTENSION_SUFFIXES
+
+
+def _installed_directories():
+    directories = set()
+    for key in ('stdlib', 'platstdlib', 'purelib', 'platlib'):
+        try:
+            directories.add(os.path.normpath(sysconfig.get_path(key)))
+        except (KeyError, TypeError):
+            pass
+    return tuple(d + os.sep for d in directories)
+
+
+def _find_installed_module(name):
+    """
+    Finds the file of a module of the standard library or of an installed
+    package, without importing it.
+
+    :returns: the path of the module, '' for builtin modules or None if the
+        module is not an installed module.
+    """
+    parts = name.split('.')
+    if parts[0] in sys.builtin_module_names:
+        return '' if len(parts) == 1 else None
+    suffixes = _source_suffixes()
+    for directory in sys.path:
+        if not directory or not os.path.isdir(directory):
+            continue
+        path = None
+        for part in parts:
+            package = os.path.join(directory, part)
+            init = os.path.join(package, '__init__.py')
+            if os.path.exists(init):
+                path = init
+                directory = package
+                continue
+            path = None
+            for suffix in suffixes:
+                if os.path.exists(package + suffix):
+                    path = package + suffix
+                    break
+            if path is None or part != parts[-1]:
+                path = None
+                break
+        if path:
+            path = os.path.normpath(os.path.abspath(path))
+            if path.startswith(_installed_directories()):
+                return path
+            return None
+    return None
+
+
+def _module_members(name):
+    """
+    Gets the members of an installed module (name, type, description), from
+    :attr:`module_cache` or using jedi.
+
+    :returns: the list of members or None if the module is not an installed
+        module
+    """
+    path = _find_installed_module(name)
+    if path is None:
+        return None
+    key = ('members', name)
+    members = module_cache.get(key)
+    if members is None:
+        script = jedi.Script('import %s\n%s.' % (name, name), 2,
+                             len(name) + 1, None, 'utf-8')
+        try:
+            members = [(c.name, c.type, c.description)
+                       for c in script.completions()]
+        except Exception:
+            # let the regular completion handle the error
+            _logger().exception('failed to get the members of %r', name)
+            return None
+        if members:
+            module_cache.put(key, members, [path] if path else [])
+    return members
+
+
+def _closing_brackets(text):
+    """
+    Returns the brackets that close the brackets opened in a line of code.
+    """
+    pairs = {'(': ')', '[': ']', '{': '}'}
+    stack = []
+    for char in text:
+        if char in pairs:
+            stack.append(pairs[char])
+        elif stack and char == stack[-1]:
+            stack.pop()
+    return ''.join(reversed(stack))
+
+
+def _complete_module_members(code, line, column):
+    """
+    Completes a ``module.attribute`` expression where module is an installed
+    module imported at the module level (e.g. ``import module [as name]``)
+    and never bound again in the document (assignment, parameter, import in a
+    function,...).
+
+    :returns: a list of (name, type, description) or None if the expression
+        cannot be completed this way.
+    """
+    lines = code.splitlines(True)
+    if not 0 <= line < len(lines):
+        return None
+    text = lines[line]
+    match = _ATTRIBUTE.search(text[:column])
+    if match is None:
+        return None
+    expression, prefix = match.groups()
+    first = expression.split('.')[0]
+    # the document is analysed with the expression replaced by its first
+    # name, the incomplete expression is not valid python
+    rest = text[column:]
+    rest = rest[_WORD.match(rest).end():]
+    lines[line] = text[:match.start(1)] + first + rest
+    names = _document_names(''.join(lines))
+    if names is None:
+        # the expression is an argument of a call that is not closed yet
+        lines[line] = '%s%s%s\n' % (
+            text[:match.start(1)], first,
+            _closing_brackets(text[:match.start(1)]))
+        names = _document_names(''.join(lines))
+    if names is None or first in names[0] or first not in names[1]:
+        return None
+    imports = names[1][first]
+    targets = set(target for target, _ in imports)
+    if len(targets) != 1 or not all(top_level for _, top_level in imports):
+        return None
+    target = targets.pop()
+    if target.startswith('.'):
+        return None
+    module = target + expression[len(first):]
+    members = _module_members(module)
+    if members is None:
+        return None
+    prefix = prefix.lower()
+    return [m for m in members if m[0].lower().startswith(prefix)]
+
+
+def _completion_items(code, line, column, path, encoding, prefix):
+    """
+    Gets the completions of the typed word, without filtering them by the
+    typed prefix (see :func:`_ranked_completions`). The column is either the
+    start of the word (the position sent by pyqode.core's
+    CodeCompletionMode) or the end of the word.
+
+    The completions are computed by jedi at the anchor of the completion
+    (i.e. the start of the typed word) and cached, the key of the cache does
+    not depend on the typed prefix: the completion set is refined (ranked
+    again) when the user types the next characters of the word, jedi is only
+    run again when the anchor or the rest of the document change.
+
+    :returns: a tuple (set_id, items, prefix) where set_id is the id of the
+        completion set (see :attr:`completion_sets`), items is a list of
+        (name, type, description) tuples and where prefix is the prefix to use
+        to rank the items. The type and description of the jedi completions
+        are computed lazily (see :func:`_completion_dict`): they are replaced
+        by the jedi completion.
+    """
+    lines = code.splitlines(True)
+    start = column
+    if not prefix or line >= len(lines):
+        prefix = ''
+    elif lines[line][column:column + len(prefix)] != prefix:
+        start = column - len(prefix)
+        if start < 0 or lines[line][start:column] != prefix:
+            # unknown prefix, let jedi filter the completions
+            start = column
+            prefix = ''
+    anchor = sum(len(text) for text in lines[:line]) + start
+    key = (content_hash(code[:anchor] + code[anchor + len(prefix):]), path,
+           line, start)
+    cached = completion_cache.get(key)
+    if cached is not None:
+        tracing.trace('refine_completions', line=line, column=start,
+                      prefix=prefix)
+        set_id, items = cached
+        if set_id not in completion_sets:
+            completion_sets.put(set_id, items, len(items))
+        return set_id, items, prefix
+    items = _complete_module_members(code, line, start)
+    if items is None:
+        try:
+            script = _get_script(code, line + 1, start, path, encoding)
+            completions = script.completions()
+            tracing.trace('completions', completions=completions)
+        except RuntimeError:
+            completions = []
+        items = [(c.name, c, c) for c in completions]
+    set_id = next(_completion_set_ids)
+    completion_cache.put(key, (set_id, items), len(items))
+    completion_sets.put(set_id, items, len(items))
+    return set_id, items, prefix
+
+
+def _ranked_completions(code, line, column, path, encoding, prefix):
+    """
+    Gets the completions that match the typed prefix, ranked from the best
+    match to the worst one (see :func:`pyqode.python.backend.completion.rank`).
+
+    :returns: a tuple (set_id, ranked) where ranked is a list of (index,
+        item) tuples, see :func:`_completion_items`.
+    """
+    set_id, items, prefix = _completion_items(
+        code, line, column, path, encoding, prefix)
+    return set_id, completion.rank(
+        list(enumerate(items)), prefix, key=lambda indexed: indexed[1][0])
+
+
+def _completion_dict(set_id, index, item, tooltip=False):
+    handle = '%d:%d' % (set_id, index)
+    name, typename, description = item
+    if hasattr(typename, 'type'):
+        typename = typename.type
+    ret_val = {'name': name, 'type': typename, 'handle': handle,
+               'icon': icon_from_typename(name, typename)}
+    if tooltip:
+        ret_val['tooltip'] = _resolve_completion(handle, item)['description']
     return ret_val
 
 
+def _resolve_completion(handle, item, docstring=False):
+    """
+    Resolves the description (and the docstring) of a completion, the
+    results are cached by handle.
+    """
+    resolved = resolved_completions.get(handle)
+    if resolved is None:
+        description = item[2]
+        if hasattr(description, 'description'):
+            description = description.description
+        resolved = {'description': description}
+        resolved_completions.put(handle, resolved, 1)
+    if docstring and 'docstring' not in resolved:
+        jedi_completion = item[2]
+        if hasattr(jedi_completion, 'docstring'):
+            resolved['docstring'] = jedi_completion.docstring()
+        else:
+            resolved['docstring'] = ''
+    return resolved
+
+
+@instrumented(input_size=lambda request_data: len(request_data['handles']))
+def resolve_completions(request_data):
+    """
+    Worker that resolves the description and the docstring of a batch of
+    completions (e.g. the rows of the completion popup that are visible).
+
+    The completions are identified by the handle returned by
+    :class:`JediCompletionProvider` and :func:`complete_page`, the handles
+    are valid as long as their completion set is in the cache (see
+    :attr:`completion_sets`).
+
+    The request data contains the list of handles ('handles') and a flag
+    that tells if the docstrings must be resolved ('docstring', False by
+    default).
+
+    :returns: a dict that maps the handles to a dict with the description
+        (and the docstring) of the completion. The handles that are no longer
+        valid are not in the dict.
+    """
+    ret_val = {}
+    docstring = request_data.get('docstring', False)
+    for handle in request_data['handles']:
+        check_cancelled()
+        try:
+            set_id, index = [int(part) for part in handle.split(':')]
+        except (AttributeError, ValueError):
+            continue
+        items = completion_sets.get(set_id)
+        if items is None or not 0 <= index < len(items):
+            continue
+        try:
+            ret_val[handle] = dict(_resolve_completion(
+                handle, items[index], docstring))
+        except Exception:
+            _logger().exception('failed to resolve completion %r', handle)
+    return ret_val
+
+
+@instrumented(input_size=_input_size)
+def complete_page(request_data):
+    """
+    Worker that returns a page of the ranked completions (see
+    :mod:`pyqode.python.backend.completion`), the completions computed at a
+    given position are cached so that the next pages are cheap to get.
+
+    The request data contains the code (or the document id and version),
+    the line and column of the cursor, the path, the encoding, the typed
+    prefix, the offset of the page (0 by default), the number of
+    completions per page (``limit``, :attr:`JediCompletionProvider.limit` by
+    default) and a flag that tells if the completions of the page must have a
+    tooltip ('tooltips', False by default, see :func:`resolve_completions`).
+
+    :returns: a dict with the completions of the page ('completions'), the
+        offset of the page ('offset') and the total number of completions
+        ('total').
+    """
+    code = _get_code(request_data)
+    if code is None:
+        return {'completions': [], 'offset': 0, 'total': 0}
+    set_id, ranked = _ranked_completions(
+        code, request_data['line'], request_data['column'],
+        request_data.get('path'), request_data.get('encoding', 'utf-8'),
+        request_data.get('prefix', ''))
+    offset = request_data.get('offset', 0)
+    limit = request_data.get('limit', JediCompletionProvider.limit)
+    end = offset + limit if limit else len(ranked)
+    tooltips = request_data.get('tooltips', False)
+    return {'completions': [_completion_dict(set_id, index, item, tooltips)
+                            for index, item in ranked[offset:end]],
+            'offset': offset, 'total': len(ranked)}
+
+
 class JediCompletionProvider:
     """
     Provides code completion using the awesome `jedi`_  library
 
+    The completions are filtered and ranked using a fuzzy match of the
+    prefix (see :mod:`pyqode.python.backend.completion`). If :attr:`limit`
+    is set, only the best completions are returned, use the
+    :func:`complete_page` worker to get the other ones.
+
+    Each completion has a name, a type, an icon and a handle that can be
+    used to resolve its description and docstring with the
+    :func:`resolve_completions` worker. Only the best :attr:`tooltip_limit`
+    completions have a tooltip.
+
     .. _`jedi`: https://github.com/davidhalter/jedi
     """
+    #: Maximum number of completions returned per request, 0 for no limit.
+    #: Only set it if the frontend gets the other completions with
+    #: :func:`complete_page`: the completion mode of pyqode.core filters the
+    #: completions it received and does not ask the backend again.
+    limit = 0
+    #: Number of completions (the best ranked ones) that have a tooltip,
+    #: computing the description of a completion can be expensive. Set it
+    #: if the editor shows the completion tooltips without resolving them
+    #: (e.g. CodeCompletionMode.show_tooltips).
+    tooltip_limit = 0
 
-    @staticmethod
-    def complete(code, line, column, path, encoding, prefix):
+    @classmethod
+    @instrumented('complete', input_size=lambda cls, code, *args: len(code))
+    def complete(cls, code, line, column, path, encoding, prefix):
         """
         Completes python code using `jedi`_.
 
         :returns: a list of completion.
         """
-        ret_val = []
-        try:
-            script = jedi.Script(code, line + 1, column, path, encoding)
-            completions = script.completions()
-            print('completions: %r' % completions)
-        except RuntimeError:
-            completions = []
-        for completion in completions:
-            ret_val.append({
-                'name': completion.name,
-                'icon': icon_from_typename(
-                    completion.name, completion.type),
-                'tooltip': completion.description})
+        start = time.time()
+        set_id, ranked = _ranked_completions(code, line, column, path,
+                                             encoding, prefix)
+        if cls.limit:
+            ranked = ranked[:cls.limit]
+        ret_val = [_completion_dict(set_id, index, item,
+                                    i < cls.tooltip_limit)
+                   for i, (index, item) in enumerate(ranked)]
+        warmup.record_completion(time.time() - start)
         return ret_val
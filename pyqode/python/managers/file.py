@@ -4,7 +4,9 @@ Contains the python specific FileManager.
 import ast
 import re
 from pyqode.core.api import TextBlockHelper
+from pyqode.core.backend import NotRunning
 from pyqode.core.managers import FileManager
+from pyqode.python.backend import workers
 
 
 class PyFileManager(FileManager):
@@ -20,6 +22,9 @@ class PyFileManager(FileManager):
     #: True to fold docstring on open
     fold_docstrings = False
 
+    # True while waiting for the lazy highlighting of the opened document
+    _fold_pending = False
+
     def detect_encoding(self, path):
         """
         For the implementation of encoding definitions in Python, look at:
@@ -50,6 +55,29 @@ class PyFileManager(FileManager):
         encoding = self.detect_encoding(path)
         super(PyFileManager, self).open(
             path, encoding=encoding, use_cached_encoding=use_cached_encoding)
+        if not self.fold_imports and not self.fold_docstrings:
+            return
+        sh = self.editor.syntax_highlighter
+        if getattr(sh, 'lazy_highlighting', False):
+            # large document: the imports and docstrings outside of the
+            # viewport are known once the whole document is highlighted
+            if not self._fold_pending:
+                self._fold_pending = True
+                sh.lazy_highlighting_finished.connect(self._fold_on_open)
+        else:
+            self._fold_on_open()
+
+    def _fold_on_open(self):
+        """
+        Folds the import statements and/or the docstrings.
+        """
+        sh = self.editor.syntax_highlighter
+        if self._fold_pending:
+            self._fold_pending = False
+            try:
+                sh.lazy_highlighting_finished.disconnect(self._fold_on_open)
+            except (RuntimeError, TypeError):
+                pass
         try:
             folding_panel = self.editor.panels.get('FoldingPanel')
         except KeyError:
@@ -57,17 +85,26 @@ class PyFileManager(FileManager):
         else:
             # fold imports and/or docstrings
             blocks_to_fold = []
-            sh = self.editor.syntax_highlighter
-
+            document = self.editor.document()
             if self.fold_imports and sh.import_statements:
-                blocks_to_fold += sh.import_statements
+                blocks_to_fold += sh.import_statements.blocks(document)
             if self.fold_docstrings and sh.docstrings:
-                blocks_to_fold += sh.docstrings
+                blocks_to_fold += sh.docstrings.blocks(document)
 
             for block in blocks_to_fold:
                 if TextBlockHelper.is_fold_trigger(block):
                     folding_panel.toggle_fold_trigger(block)
 
+    def save(self, path=None, encoding=None, fallback_encoding=None):
+        super(PyFileManager, self).save(
+            path=path, encoding=encoding, fallback_encoding=fallback_encoding)
+        # keep the backend project symbol index up to date
+        try:
+            self.editor.backend.send_request(
+                workers.update_symbol_index, {'path': self.path})
+        except NotRunning:
+            pass
+
     def clone_settings(self, original):
         super(PyFileManager, self).clone_settings(original)
         self.fold_docstrings = original.fold_docstrings
@@ -8,12 +8,15 @@ from .autocomplete import PyAutoCompleteMode
 from .autoindent import PyAutoIndentMode
 from .calltips import CalltipsMode
 from .comments import CommentsMode
+from .document_sync import DocumentSyncMode
 from .frosted_checker import PyFlakesChecker
 # for backward compatibility, will be removed in a future release
 from .frosted_checker import PyFlakesChecker as FrostedCheckerMode
 from .goto_assignements import Assignment
 from .goto_assignements import GoToAssignmentsMode
 from .indenter import PyIndenterMode
+from .linter import PyLinterMode
+from .outline import PyOutlineMode
 from .sh import PythonSH
 from .pep8_checker import PEP8CheckerMode
 
@@ -31,6 +34,7 @@ __all__ = [
     'Assignment',
     'CalltipsMode',
     'CommentsMode',
+    'DocumentSyncMode',
     'PyFlakesChecker',
     'FrostedCheckerMode',
     'GoToAssignmentsMode',
@@ -38,5 +42,7 @@ __all__ = [
     'PyAutoCompleteMode',
     'PyAutoIndentMode',
     'PyIndenterMode',
+    'PyLinterMode',
+    'PyOutlineMode',
     'PythonSH',
 ]
@@ -8,6 +8,7 @@ from pyqode.core.api import Mode, TextHelper
 from pyqode.qt import QtCore, QtWidgets
 
 from pyqode.python.backend import workers
+from pyqode.python.modes.document_sync import DocumentSyncMode
 
 
 def _logger():
@@ -28,7 +29,9 @@ class CalltipsMode(Mode, QtCore.QObject):
         QtCore.QObject.__init__(self)
         self.tooltipDisplayRequested.connect(self._display_tooltip)
         self.tooltipHideRequested.connect(QtWidgets.QToolTip.hideText)
-        self.__requestCnt = 0
+        self._request_id = 0
+        # number of requests in flight that are not document-synced
+        self._pending_requests = 0
 
     def on_state_changed(self, state):
         if state:
@@ -44,19 +47,28 @@ class CalltipsMode(Mode, QtCore.QObject):
             col = tc.columnNumber()
             fn = self.editor.file.path
             encoding = self.editor.file.encoding
-            source = self.editor.toPlainText()
-            # jedi has a bug if the statement has a closing parenthesis
-            # remove it!
-            lines = source.splitlines()
             try:
-                l = lines[line].rstrip()
-            except IndexError:
-                # at the beginning of the last line (empty)
-                return
-            if l.endswith(")"):
-                lines[line] = l[:-1]
-            source = "\n".join(lines)
-            self._request_calltip(source, line, col, fn, encoding)
+                mode = self.editor.modes.get(DocumentSyncMode)
+            except KeyError:
+                mode = None
+            if mode is not None and mode.enabled:
+                # the backend strips the closing parenthesis of the shadow
+                # copy
+                code_data = mode.request_data()
+            else:
+                source = self.editor.toPlainText()
+                # jedi has a bug if the statement has a closing parenthesis
+                # remove it!
+                lines = source.splitlines()
+                try:
+                    l = lines[line].rstrip()
+                except IndexError:
+                    # at the beginning of the last line (empty)
+                    return
+                if l.endswith(")"):
+                    lines[line] = l[:-1]
+                code_data = {'code': "\n".join(lines)}
+            self._request_calltip(code_data, line, col, fn, encoding)
         elif (event.key() in [
                 QtCore.Qt.Key_ParenRight,
                 QtCore.Qt.Key_Return,
@@ -71,16 +83,32 @@ class CalltipsMode(Mode, QtCore.QObject):
                 QtCore.Qt.Key_Backspace, QtCore.Qt.Key_Delete]):
             QtWidgets.QToolTip.hideText()
 
-    def _request_calltip(self, source, line, col, fn, encoding):
-        if self.__requestCnt == 0:
-            self.__requestCnt += 1
-            self.editor.backend.send_request(
-                workers.calltips,
-                {'code': source, 'line': line, 'column': col, 'path': None,
-                 'encoding': encoding}, on_receive=self._on_results_available)
+    def _request_calltip(self, code_data, line, col, fn, encoding):
+        # when the document is synchronised, the backend cancels the
+        # requests made on older versions of the document. The results of
+        # the previous requests are ignored.
+        # Otherwise (the request carries the whole code), the backend cannot
+        # supersede the requests: only one request is sent at a time.
+        synced = 'document_id' in code_data and 'version' in code_data
+        if not synced and self._pending_requests:
+            return
+        self._request_id += 1
+        request_id = self._request_id
+        request_data = {'line': line, 'column': col, 'path': None,
+                        'encoding': encoding}
+        request_data.update(code_data)
+        self.editor.backend.send_request(
+            workers.calltips, request_data,
+            on_receive=lambda results: self._on_results_available(
+                results, request_id, synced))
+        if not synced:
+            self._pending_requests += 1
 
-    def _on_results_available(self, results):
-        self.__requestCnt -= 1
+    def _on_results_available(self, results, request_id=None, synced=True):
+        if not synced:
+            self._pending_requests -= 1
+        if request_id is not None and request_id != self._request_id:
+            return
         if results:
             call = {"call.module.name": results[0],
                     "call.call_name": results[1],
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Contains the document synchronisation mode.
+"""
+import logging
+import uuid
+
+from pyqode.core.api import Mode
+from pyqode.core.backend import NotRunning
+from pyqode.core.modes import CheckerMode
+from pyqode.qt import QtCore
+
+from pyqode.python.backend import workers
+from pyqode.python.backend.documents import compute_edit
+
+
+def _logger():
+    return logging.getLogger(__name__)
+
+
+class DocumentSyncMode(Mode):
+    """ Keeps a shadow copy of the document on the backend.
+
+    The whole document is sent once, then only the text edits made since the
+    previous synchronisation are sent to the backend. Requests made by the
+    python modes and panels (calltips, go to assignments, quick doc and the
+    checker modes) then only contain the document id and version instead of
+    the full text of the document.
+
+    The synchronisation is lazy: it happens right before a request is sent
+    (see :meth:`request_data`).
+    """
+    def __init__(self):
+        super(DocumentSyncMode, self).__init__()
+        #: Unique id of the document on the backend side
+        self.document_id = str(uuid.uuid4())
+        #: Version of the last synchronised text
+        self.version = 0
+        self._synced_text = None
+
+    def on_state_changed(self, state):
+        if not state:
+            self._close()
+
+    def request_data(self):
+        """
+        Synchronises the backend shadow copy with the editor text and returns
+        the request data that identifies the document.
+
+        :returns: dict(document_id=self.document_id, version=self.version)
+        :raises: pyqode.core.backend.NotRunning if the backend is not running
+        """
+        text = self.editor.toPlainText()
+        if self._synced_text is None:
+            request_data = {
+                'document_id': self.document_id,
+                'code': text,
+                'version': self.version + 1,
+                'path': self.editor.file.path
+            }
+            self.editor.backend.send_request(
+                workers.open_document, request_data)
+        else:
+            edit = compute_edit(self._synced_text, text)
+            if edit is None:
+                return self._document_data()
+            request_data = {
+                'document_id': self.document_id,
+                'edits': [edit],
+                'base_version': self.version,
+                'version': self.version + 1,
+                'length': len(text),
+                'path': self.editor.file.path
+            }
+            self.editor.backend.send_request(
+                workers.update_document, request_data,
+                on_receive=self._on_update_finished)
+        self.version += 1
+        self._synced_text = text
+        return self._document_data()
+
+    def _document_data(self):
+        return {'document_id': self.document_id, 'version': self.version}
+
+    def _on_update_finished(self, results):
+        if not results:
+            _logger().debug('document %s out of sync, sending the whole '
+                            'text again', self.document_id)
+            self._resync()
+
+    def _resync(self):
+        """
+        Sends the whole text of the last synchronised version after an update
+        has been rejected (version gap or length mismatch), so that the
+        requests made on that version do not return empty results until the
+        next edit. The synced checker modes are run again since their last
+        request was made on a document the backend did not know.
+        """
+        if self._synced_text is None:
+            return
+        request_data = {
+            'document_id': self.document_id,
+            'code': self._synced_text,
+            'version': self.version,
+            'path': self.editor.file.path
+        }
+        try:
+            self.editor.backend.send_request(
+                workers.open_document, request_data)
+        except NotRunning:
+            # send the whole text with the next request
+            self._synced_text = None
+            return
+        for mode in self.editor.modes:
+            if isinstance(mode, SyncedCheckerMode) and mode.enabled:
+                mode.request_analysis()
+
+    def _close(self):
+        if self._synced_text is None:
+            return
+        self._synced_text = None
+        try:
+            self.editor.backend.send_request(
+                workers.close_document, {'document_id': self.document_id})
+        except NotRunning:
+            pass
+
+
+def document_request_data(editor):
+    """
+    Returns the request data that identifies the code of an editor.
+
+    If the editor has a :class:`DocumentSyncMode`, the shadow copy is
+    synchronised and only the document id and version are returned, otherwise
+    the whole text of the editor is returned.
+
+    :param editor: CodeEdit instance
+    :returns: a dict that can be merged into the request data of any
+        pyqode.python worker.
+    """
+    try:
+        mode = editor.modes.get(DocumentSyncMode)
+    except KeyError:
+        mode = None
+    if mode is None or not mode.enabled:
+        return {'code': editor.toPlainText()}
+    return mode.request_data()
+
+
+class SyncedCheckerMode(CheckerMode):
+    """
+    Checker mode that uses the backend shadow copy of the document (see
+    :class:`DocumentSyncMode`) instead of sending the whole text of the
+    editor with each request.
+    """
+    def _request(self):
+        """ Requests a checking of the editor content. """
+        try:
+            self.editor.toPlainText()
+        except (TypeError, RuntimeError):
+            return
+        try:
+            max_line_length = self.editor.modes.get(
+                'RightMarginMode').position
+        except KeyError:
+            max_line_length = 79
+        request_data = {
+            'path': self.editor.file.path,
+            'encoding': self.editor.file.encoding,
+            'ignore_rules': self.ignore_rules,
+            'max_line_length': max_line_length,
+        }
+        try:
+            request_data.update(document_request_data(self.editor))
+            self.editor.backend.send_request(
+                self._worker, request_data, on_receive=self._on_work_finished)
+            self._finished = False
+        except NotRunning:
+            # retry later
+            QtCore.QTimer.singleShot(100, self._request)
@@ -2,11 +2,11 @@
 """
 This module contains the pyFlakes checker mode
 """
-from pyqode.core.modes import CheckerMode
 from pyqode.python.backend.workers import run_pyflakes
+from pyqode.python.modes.document_sync import SyncedCheckerMode
 
 
-class PyFlakesChecker(CheckerMode):
+class PyFlakesChecker(SyncedCheckerMode):
     """ Runs pyflakes on you code while you're typing
 
     This checker mode runs pyflakes on the fly to check your python syntax.
@@ -10,6 +10,7 @@ from pyqode.core.api import Mode, TextHelper, DelayJobRunner, CodeEdit
 from pyqode.core.backend import NotRunning
 from pyqode.core.modes import WordClickMode
 from pyqode.python.backend import workers
+from pyqode.python.modes.document_sync import document_request_data
 
 
 def _logger():
@@ -102,13 +103,13 @@ class GoToAssignmentsMode(WordClickMode):
             tc = TextHelper(self.editor).word_under_cursor()
 
         request_data = {
-            'code': self.editor.toPlainText(),
             'line': tc.blockNumber(),
             'column': tc.columnNumber(),
             'path': self.editor.file.path,
             'encoding': self.editor.file.encoding
         }
         try:
+            request_data.update(document_request_data(self.editor))
             self.editor.backend.send_request(
                 workers.goto_assignments, request_data,
                 on_receive=self._on_results_available)
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""
+This module contains the python linter mode
+"""
+from pyqode.python.backend.workers import run_lint
+from pyqode.python.modes.document_sync import SyncedCheckerMode
+
+
+class PyLinterMode(SyncedCheckerMode):
+    """ Runs pyflakes and pycodestyle on your code while you're typing
+
+    This checker mode combines :class:`PyFlakesChecker` and
+    :class:`PEP8CheckerMode`: both analyses are run by the backend in a single
+    request. Use it instead of the two checker modes (not in addition to
+    them).
+    """
+    def __init__(self):
+        super(PyLinterMode, self).__init__(run_lint, delay=1200)
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Contains the python outline mode.
+"""
+import logging
+
+from pyqode.core.backend import NotRunning
+from pyqode.core.modes import OutlineMode
+from pyqode.core.share import Definition
+from pyqode.qt import QtCore
+
+from pyqode.python.backend import outline
+from pyqode.python.backend.workers import defined_names_diff
+from pyqode.python.modes.document_sync import document_request_data
+
+
+def _logger():
+    return logging.getLogger(__name__)
+
+
+class PyOutlineMode(OutlineMode):
+    """ Outline mode that receives the changes of the document structure
+    instead of the whole structure.
+
+    The backend computes the outline incrementally and only sends the
+    difference with the outline it previously sent (see
+    :func:`pyqode.python.backend.defined_names_diff`). The difference is
+    applied in place on :attr:`definitions`: the definitions that did not
+    change keep their identity.
+
+    :attr:`document_changed` is only emitted when the structure really
+    changed, :attr:`definitions_changed` is emitted with the difference so
+    that widgets can patch themselves instead of rebuilding everything.
+
+    The outline is computed by jedi by default, set :attr:`provider` to
+    ``'ast'`` to use the (much faster) ast based provider instead.
+
+    The mode is registered as ``OutlineMode`` so that it can be used by the
+    widgets and panels that look up the generic outline mode.
+    """
+    #: Signal emitted with the outline diff when the document structure
+    #: changed (see :func:`pyqode.python.backend.outline.diff`). The diff is
+    #: None if the whole structure has been replaced.
+    definitions_changed = QtCore.Signal(object)
+
+    def __init__(self, delay=1000, provider='jedi'):
+        super(PyOutlineMode, self).__init__(defined_names_diff, delay=delay)
+        self.name = 'OutlineMode'
+        #: Name of the outline provider: 'jedi' or 'ast' (see
+        #: :func:`pyqode.python.backend.defined_names`)
+        self.provider = provider
+        #: Version of the outline, as known by the backend
+        self.outline_version = None
+
+    def _run_analysis(self):
+        try:
+            self.editor.file
+            self.editor.toPlainText()
+        except (RuntimeError, AttributeError):
+            # called by the timer after the editor got deleted
+            return
+        if self.enabled:
+            request_data = {
+                'path': self.editor.file.path,
+                'encoding': self.editor.file.encoding,
+                'outline_version': self.outline_version,
+                'provider': self.provider
+            }
+            try:
+                request_data.update(document_request_data(self.editor))
+                self.editor.backend.send_request(
+                    self._worker, request_data,
+                    on_receive=self._on_results_available)
+            except NotRunning:
+                QtCore.QTimer.singleShot(100, self._run_analysis)
+        else:
+            self._results = []
+            self.outline_version = None
+            self.document_changed.emit()
+
+    def _on_results_available(self, results):
+        if not results:
+            return
+        if 'diff' in results:
+            if results['base_version'] != self.outline_version:
+                # a response to an outdated request, the next request will
+                # fetch the whole structure
+                _logger().debug('outdated outline diff, version %r instead '
+                                'of %r', results['base_version'],
+                                self.outline_version)
+                self.outline_version = None
+                return
+            changes = results['diff']
+            self.outline_version = results['version']
+            if outline.is_empty(changes):
+                return
+            self._results = outline.apply_diff(
+                self._results, changes, Definition.from_dict)
+        else:
+            changes = None
+            self.outline_version = results['version']
+            self._results = [Definition.from_dict(ddict)
+                             for ddict in results['definitions']]
+        _logger().log(5, "Document structure changed")
+        self.definitions_changed.emit(changes)
+        self.document_changed.emit()
@@ -2,13 +2,13 @@
 """
 This module contains the pyFlakes checker mode
 """
-from pyqode.core.modes import CheckerMode
 from pyqode.python.backend.workers import run_pep8
+from pyqode.python.modes.document_sync import SyncedCheckerMode
 
 
-class PEP8CheckerMode(CheckerMode):
+class PEP8CheckerMode(SyncedCheckerMode):
     """
     This checker mode runs pep8.py on the fly to check your python style.
     """
     def __init__(self):
-        CheckerMode.__init__(self, run_pep8)
+        SyncedCheckerMode.__init__(self, run_pep8)
@@ -15,9 +15,18 @@ except ImportError:
     #it works on osx
     builtins = __import__('__builtin__')
 
+import bisect
 import re
+import time
 from pyqode.core.api import SyntaxHighlighter as BaseSH
 from pyqode.core.api import TextBlockHelper
+from pyqode.python.backend.cache import LRUCache
+from pyqode.qt import QtCore, QtGui
+
+try:
+    clock = time.perf_counter
+except AttributeError:
+    clock = time.time
 
 
 def any(name, alternates):
@@ -58,19 +67,24 @@ kw_namespace_list = ['from', 'import', 'as']
 wordop_list = ['and', 'or', 'not', 'in', 'is']
 
 
-def make_python_patterns(additional_keywords=[], additional_builtins=[]):
-    """Strongly inspired from idlelib.ColorDelegator.make_pat"""
-    kw = r"\b" + any("keyword", kwlist + additional_keywords) + r"\b"
-    kw_namespace = r"\b" + any("namespace", kw_namespace_list) + r"\b"
-    word_operators = r"\b" + any("operator_word", wordop_list) + r"\b"
+def _builtin_names(additional_builtins=[]):
+    """
+    Returns the list of the builtin names that are highlighted.
+    """
     builtinlist = [str(name) for name in dir(builtins)
                    if not name.startswith('_')] + additional_builtins
     for v in ['None', 'True', 'False']:
         builtinlist.remove(v)
-    builtin = r"([^.'\"\\#]\b|^)" + any("builtin", builtinlist) + r"\b"
+    return builtinlist
+
+
+def _token_patterns():
+    """
+    Returns the patterns of the tokens that are not words (decorators,
+    special methods, comments, strings and numbers), by group name.
+    """
     builtin_fct = any("builtin_fct", [r'_{2}[a-zA-Z_]*_{2}'])
     comment = any("comment", [r"#[^\n]*"])
-    instance = any("instance", [r"\bself\b", r"\bcls\b"])
     decorator = any('decorator', [r'@\w*', r'.setter'])
     number = any("number",
                  [r"\b[+-]?[0-9]+[lLjJ]?\b",
@@ -91,10 +105,561 @@ def make_python_patterns(additional_keywords=[], additional_builtins=[]):
     ufstring2 = any("uf_dqstring", [uf_dqstring])
     ufstring3 = any("uf_sq3string", [uf_sq3string])
     ufstring4 = any("uf_dq3string", [uf_dq3string])
-    return "|".join([instance, decorator, kw, kw_namespace, builtin,
-                     word_operators, builtin_fct, comment,
-                     ufstring1, ufstring2, ufstring3, ufstring4, string,
-                     number, any("SYNC", [r"\n"])])
+    return {'decorator': decorator, 'builtin_fct': builtin_fct,
+            'comment': comment, 'uf_sqstring': ufstring1,
+            'uf_dqstring': ufstring2, 'uf_sq3string': ufstring3,
+            'uf_dq3string': ufstring4, 'string': string, 'number': number,
+            'SYNC': any("SYNC", [r"\n"])}
+
+
+def make_python_patterns(additional_keywords=[], additional_builtins=[]):
+    """Strongly inspired from idlelib.ColorDelegator.make_pat"""
+    kw = r"\b" + any("keyword", kwlist + additional_keywords) + r"\b"
+    kw_namespace = r"\b" + any("namespace", kw_namespace_list) + r"\b"
+    word_operators = r"\b" + any("operator_word", wordop_list) + r"\b"
+    builtinlist = _builtin_names(additional_builtins)
+    builtin = r"([^.'\"\\#]\b|^)" + any("builtin", builtinlist) + r"\b"
+    instance = any("instance", [r"\bself\b", r"\bcls\b"])
+    tokens = _token_patterns()
+    return "|".join([instance, tokens['decorator'], kw, kw_namespace, builtin,
+                     word_operators] + [tokens[name] for name in (
+                         'builtin_fct', 'comment', 'uf_sqstring',
+                         'uf_dqstring', 'uf_sq3string', 'uf_dq3string',
+                         'string', 'number', 'SYNC')])
+
+
+def make_lookup_patterns():
+    """
+    Returns the pattern used by :func:`highlight_lookup`: the words are
+    matched by a single ``word`` group, after the other tokens, instead of
+    the keywords and builtins alternations of :func:`make_python_patterns`.
+    """
+    tokens = _token_patterns()
+    return "|".join([tokens[name] for name in (
+        'decorator', 'builtin_fct', 'comment', 'uf_sqstring', 'uf_dqstring',
+        'uf_sq3string', 'uf_dq3string', 'string', 'number')] + [
+            any("word", [r"\b\w+\b"]), tokens['SYNC']])
+
+
+def make_word_sets(additional_keywords=[], additional_builtins=[]):
+    """
+    Returns the sets of words used by :func:`highlight_lookup` to classify
+    the words, by group name: ``instance`` (self and cls), ``keyword``,
+    ``namespace``, ``builtin`` and ``operator_word``.
+
+    Unlike the ones of :func:`make_python_patterns`, the additional keywords
+    and builtins are plain words, not patterns.
+    """
+    return {
+        'instance': frozenset(['self', 'cls']),
+        'keyword': frozenset(kwlist + list(additional_keywords)),
+        'namespace': frozenset(kw_namespace_list),
+        'builtin': frozenset(_builtin_names(list(additional_builtins))),
+        'operator_word': frozenset(wordop_list),
+    }
+
+
+#: Syntax highlighting states (from one text block to another)
+(NORMAL, INSIDE_SQ3STRING, INSIDE_DQ3STRING,
+ INSIDE_SQSTRING, INSIDE_DQSTRING) = list(range(5))
+
+#: Text prepended to a line that continues a string, by state
+_STATE_PREFIXES = {
+    INSIDE_DQ3STRING: r'""" ',
+    INSIDE_SQ3STRING: r"''' ",
+    INSIDE_DQSTRING: r'" ',
+    INSIDE_SQSTRING: r"' ",
+}
+
+
+def _continue_state(text, prev_state):
+    """
+    Prepends the opening quotes of the string continued by a line to its
+    text.
+
+    :returns: the text and the offset to apply to the positions in the text
+    """
+    prefix = _STATE_PREFIXES.get(prev_state)
+    if prefix is None:
+        return text, 0
+    return prefix + text, -len(prefix)
+
+
+def highlight_regex(sh, text, prev_state):
+    """
+    Regex highlighting engine: finds the tokens of a line with ``sh.PROG``
+    and looks for the named group that matched in the group dict of each
+    match.
+
+    :param sh: the highlighter (or its class), it provides the PROG, IDPROG
+        and ASPROG patterns.
+    :param text: the text of the line
+    :param prev_state: the state of the previous line
+    :returns: a tuple (ranges, state, docstring, import_stmt): the list of
+        the (start, length, format name) ranges to format (in order), the
+        state of the line, True if the line is part of a docstring and the
+        import statement of the line (None if the line is not an import).
+    """
+    text, offset = _continue_state(text, prev_state)
+    ranges = [(0, len(text), 'normal')]
+    docstring = False
+    import_stmt = None
+    state = NORMAL
+    match = sh.PROG.search(text)
+    while match:
+        for key, value in list(match.groupdict().items()):
+            if value:
+                start, end = match.span(key)
+                start = max([0, start + offset])
+                end = max([0, end + offset])
+                if key == "uf_sq3string":
+                    ranges.append((start, end - start, "docstring"))
+                    docstring = True
+                    state = INSIDE_SQ3STRING
+                elif key == "uf_dq3string":
+                    ranges.append((start, end - start, "docstring"))
+                    docstring = True
+                    state = INSIDE_DQ3STRING
+                elif key == "uf_sqstring":
+                    ranges.append((start, end - start, "string"))
+                    state = INSIDE_SQSTRING
+                elif key == "uf_dqstring":
+                    ranges.append((start, end - start, "string"))
+                    state = INSIDE_DQSTRING
+                elif key == 'builtin_fct':
+                    # trick to highlight __init__, __add__ and so on with
+                    # builtin color
+                    ranges.append((start, end - start, "constant"))
+                else:
+                    if ('"""' in value or "'''" in value) and \
+                            key != 'comment':
+                        # highlight docstring with a different color
+                        docstring = True
+                        ranges.append((start, end - start, "docstring"))
+                    elif key == 'decorator':
+                        # highlight decorators
+                        ranges.append((start, end - start, "decorator"))
+                    elif value in ['self', 'cls']:
+                        # highlight self attribute
+                        ranges.append((start, end - start, "self"))
+                    else:
+                        # highlight all other tokens
+                        ranges.append((start, end - start, key))
+                    if key == "keyword":
+                        if value in ("def", "class"):
+                            _highlight_definition(sh, text, value, end,
+                                                  ranges)
+                    if key == 'namespace':
+                        import_stmt = text.strip()
+                        _highlight_as(sh, text, end, ranges)
+        # next match
+        match = sh.PROG.search(text, match.end())
+    return ranges, state, docstring, import_stmt
+
+
+def _highlight_definition(sh, text, value, end, ranges):
+    """
+    Highlights the name of a class or a function (the word that follows the
+    "def" or "class" keyword).
+    """
+    match = sh.IDPROG.match(text, end)
+    if match:
+        start, end = match.span(1)
+        ranges.append((start, end - start,
+                       'definition' if value == 'class' else 'function'))
+
+
+def _highlight_as(sh, text, end, ranges):
+    """
+    Highlights all the "as" words of an import statement.
+    """
+    # color all the "as" words on same line, except if in a comment; cheap
+    # approximation to the truth
+    if '#' in text:
+        endpos = text.index('#')
+    else:
+        endpos = len(text)
+    while True:
+        match = sh.ASPROG.match(text, end, endpos)
+        if not match:
+            break
+        start, end = match.span(1)
+        ranges.append((start, end - start, "namespace"))
+
+
+#: Dispatch table of :func:`highlight_dispatch`: format name, state of the
+#: line (None to keep the current state) and docstring flag of the tokens, by
+#: group name.
+DISPATCH_TABLE = {
+    'instance': ('self', None, False),
+    'decorator': ('decorator', None, False),
+    'keyword': ('keyword', None, False),
+    'namespace': ('namespace', None, False),
+    'builtin': ('builtin', None, False),
+    'operator_word': ('operator_word', None, False),
+    'builtin_fct': ('constant', None, False),
+    'comment': ('comment', None, False),
+    'uf_sqstring': ('string', INSIDE_SQSTRING, False),
+    'uf_dqstring': ('string', INSIDE_DQSTRING, False),
+    'uf_sq3string': ('docstring', INSIDE_SQ3STRING, True),
+    'uf_dq3string': ('docstring', INSIDE_DQ3STRING, True),
+    'string': ('string', None, False),
+    'number': ('number', None, False),
+    'SYNC': ('SYNC', None, False),
+}
+
+
+def highlight_dispatch(sh, text, prev_state):
+    """
+    Dispatch highlighting engine: the token of each match of ``sh.PROG`` is
+    classified by the name of the group that matched (``match.lastgroup``)
+    using :data:`DISPATCH_TABLE` instead of scanning the group dict of the
+    match.
+
+    It produces the same result as :func:`highlight_regex` (see its
+    documentation for the parameters and the result).
+    """
+    text, offset = _continue_state(text, prev_state)
+    ranges = [(0, len(text), 'normal')]
+    append = ranges.append
+    docstring = False
+    import_stmt = None
+    state = NORMAL
+    search = sh.PROG.search
+    table = DISPATCH_TABLE
+    match = search(text)
+    while match:
+        key = match.lastgroup
+        fmt, new_state, is_docstring = table[key]
+        start, end = match.span(key)
+        if offset:
+            start = max(0, start + offset)
+            end = max(0, end + offset)
+        if key == 'string':
+            value = match.group(key)
+            if '"""' in value or "'''" in value:
+                fmt = 'docstring'
+                is_docstring = True
+        append((start, end - start, fmt))
+        if new_state is not None:
+            state = new_state
+        if is_docstring:
+            docstring = True
+        if key == 'keyword':
+            value = match.group(key)
+            if value == 'def' or value == 'class':
+                _highlight_definition(sh, text, value, end, ranges)
+        elif key == 'namespace':
+            import_stmt = text.strip()
+            _highlight_as(sh, text, end, ranges)
+        match = search(text, match.end())
+    return ranges, state, docstring, import_stmt
+
+
+#: Characters that prevent a builtin that follows them from being highlighted
+#: (see the builtin pattern of :func:`make_python_patterns`)
+_NOT_BEFORE_BUILTIN = frozenset('.\'"\\#')
+
+
+def _classify_word(words, value, text, start, pos):
+    """
+    Returns the group name of a word (None if the word is not highlighted),
+    with the priorities of the alternatives of :func:`make_python_patterns`.
+
+    :param words: the word sets (see :func:`make_word_sets`)
+    :param value: the word
+    :param text: the text of the line
+    :param start: the position of the word
+    :param pos: the position where the search of the word started
+    """
+    # the builtin pattern starts on the character that precedes the word, it
+    # is tried before the patterns that start on the word.
+    if (start > pos and value in words['builtin'] and
+            text[start - 1] not in _NOT_BEFORE_BUILTIN):
+        return 'builtin'
+    if value in words['instance']:
+        return 'instance'
+    if value in words['keyword']:
+        return 'keyword'
+    if value in words['namespace']:
+        return 'namespace'
+    if start == 0 and value in words['builtin']:
+        return 'builtin'
+    if value in words['operator_word']:
+        return 'operator_word'
+    return None
+
+
+def highlight_lookup(sh, text, prev_state):
+    """
+    Lookup highlighting engine: the words are matched by a single ``\\w+``
+    rule (see ``sh.LOOKUP_PROG``) and classified with set lookups (see
+    ``sh.WORDS``) instead of being matched by the keywords and builtins
+    alternations of ``sh.PROG``, which are tried at every position of the
+    line.
+
+    It produces the same result as :func:`highlight_regex` (see its
+    documentation for the parameters and the result) as long as ``sh.WORDS``
+    and ``sh.PROG`` define the same keywords and builtins.
+    """
+    text, offset = _continue_state(text, prev_state)
+    ranges = [(0, len(text), 'normal')]
+    append = ranges.append
+    docstring = False
+    import_stmt = None
+    state = NORMAL
+    search = sh.LOOKUP_PROG.search
+    words = sh.WORDS
+    table = DISPATCH_TABLE
+    pos = 0
+    match = search(text)
+    while match:
+        key = match.lastgroup
+        start, end = match.span(key)
+        value = match.group(key)
+        if key == 'word':
+            key = _classify_word(words, value, text, start, pos)
+            if key is None:
+                # decorators (".setter") and special names can start inside
+                # a word that is not highlighted
+                if value.find('setter', 2) != -1 or '__' in value[1:]:
+                    end = start + 1
+                match = search(text, end)
+                continue
+        fmt, new_state, is_docstring = table[key]
+        if offset:
+            start = max(0, start + offset)
+            end = max(0, end + offset)
+        if key == 'string':
+            if '"""' in value or "\'\'\'" in value:
+                fmt = 'docstring'
+                is_docstring = True
+        append((start, end - start, fmt))
+        if new_state is not None:
+            state = new_state
+        if is_docstring:
+            docstring = True
+        if key == 'keyword':
+            if value == 'def' or value == 'class':
+                _highlight_definition(sh, text, value, end, ranges)
+        elif key == 'namespace':
+            import_stmt = text.strip()
+            _highlight_as(sh, text, end, ranges)
+        pos = match.end()
+        match = search(text, pos)
+    return ranges, state, docstring, import_stmt
+
+
+#: The highlighting engines, by name (see :attr:`PythonSH.engine`)
+ENGINES = {
+    'regex': highlight_regex,
+    'dispatch': highlight_dispatch,
+    'lookup': highlight_lookup,
+}
+
+
+class LineCache(object):
+    """
+    A bounded cache of the highlighting results of the lines, keyed by (line
+    text, state of the previous line, engine).
+
+    The result of a line only depends on its text and on the state of the
+    previous line, identical lines (blank lines, ``pass``, ``return``,
+    decorators, imports,...) are highlighted by replaying the cached format
+    ranges instead of running the engine again.
+    """
+    def __init__(self, max_lines=4096, max_size=1024 * 1024):
+        """
+        :param max_lines: maximum number of cached lines
+        :param max_size: maximum cumulated length of the cached lines
+        """
+        self._cache = LRUCache(max_entries=max_lines, max_size=max_size)
+
+    def highlight(self, sh, text, prev_state, engine='regex'):
+        """
+        Returns the result of an engine for a line (see
+        :func:`highlight_regex`), from the cache if possible. The format
+        ranges of the result are a tuple.
+
+        :param sh: the highlighter (or its class)
+        :param text: the text of the line
+        :param prev_state: the state of the previous line
+        :param engine: name of the highlighting engine
+        """
+        if prev_state not in _STATE_PREFIXES:
+            # the other states are all equivalent to the normal state
+            prev_state = NORMAL
+        key = (text, prev_state, engine)
+        result = self._cache.get(key)
+        if result is None:
+            ranges, state, docstring, import_stmt = ENGINES[engine](
+                sh, text, prev_state)
+            result = (tuple(ranges), state, docstring, import_stmt)
+            self._cache.put(key, result, len(text) + 1)
+        return result
+
+    def clear(self):
+        """
+        Clears the cache (e.g. after changing the patterns of the
+        highlighter).
+        """
+        self._cache.clear()
+
+    def stats(self):
+        """
+        Returns the statistics of the cache (hits, misses,...).
+        """
+        return self._cache.stats()
+
+
+class BlockRegions(object):
+    """
+    An indexed set of block numbers, stored as a sorted list of regions
+    (ranges of consecutive block numbers).
+
+    The memory used and the cost of the updates are proportional to the
+    number of regions, not to the number of blocks, and the regions that
+    intersect a range of blocks are found with a binary search.
+
+    Iterating over the set yields the block numbers, in order.
+    """
+    def __init__(self):
+        # first and last block numbers of the regions (the regions are sorted
+        # and never overlap nor touch each other)
+        self._starts = []
+        self._ends = []
+
+    def __contains__(self, number):
+        i = bisect.bisect_right(self._starts, number) - 1
+        return i >= 0 and self._ends[i] >= number
+
+    def __iter__(self):
+        for start, end in zip(self._starts, self._ends):
+            for number in range(start, end + 1):
+                yield number
+
+    def __len__(self):
+        return sum(end - start + 1
+                   for start, end in zip(self._starts, self._ends))
+
+    def __bool__(self):
+        return bool(self._starts)
+
+    __nonzero__ = __bool__
+
+    def add(self, number):
+        """
+        Adds a block number, the regions that touch it are merged.
+        """
+        starts, ends = self._starts, self._ends
+        i = bisect.bisect_right(starts, number) - 1
+        if i >= 0 and ends[i] >= number:
+            return
+        merge_previous = i >= 0 and ends[i] == number - 1
+        merge_next = i + 1 < len(starts) and starts[i + 1] == number + 1
+        if merge_previous and merge_next:
+            ends[i] = ends[i + 1]
+            del starts[i + 1]
+            del ends[i + 1]
+        elif merge_previous:
+            ends[i] = number
+        elif merge_next:
+            starts[i + 1] = number
+        else:
+            starts.insert(i + 1, number)
+            ends.insert(i + 1, number)
+
+    def discard(self, number):
+        """
+        Removes a block number if it is present, the region that contains it
+        is split if needed.
+        """
+        starts, ends = self._starts, self._ends
+        i = bisect.bisect_right(starts, number) - 1
+        if i < 0 or ends[i] < number:
+            return
+        start, end = starts[i], ends[i]
+        if start == end:
+            del starts[i]
+            del ends[i]
+        elif number == start:
+            starts[i] = number + 1
+        elif number == end:
+            ends[i] = number - 1
+        else:
+            ends[i] = number - 1
+            starts.insert(i + 1, number + 1)
+            ends.insert(i + 1, end)
+
+    def shift(self, after, delta):
+        """
+        Updates the block numbers after blocks have been inserted or removed:
+        the numbers greater than ``after`` are moved by ``delta``. If
+        ``delta`` is negative, the numbers of the ``-delta`` blocks that
+        follow ``after`` are removed.
+
+        :param after: number of the block where the blocks have been inserted
+            or removed
+        :param delta: number of inserted blocks (negative for removed blocks)
+        """
+        if not delta:
+            return
+        if delta < 0:
+            removed = (after + 1, after - delta)
+        else:
+            removed = (after + 1, after)
+        starts, ends = [], []
+        for start, end in zip(self._starts, self._ends):
+            pieces = []
+            if start <= after:
+                pieces.append((start, min(end, after)))
+            if end >= removed[1] + 1:
+                pieces.append((max(start, removed[1] + 1) + delta,
+                               end + delta))
+            for first, last in pieces:
+                if starts and first <= ends[-1] + 1:
+                    ends[-1] = max(ends[-1], last)
+                else:
+                    starts.append(first)
+                    ends.append(last)
+        self._starts, self._ends = starts, ends
+
+    def regions(self, first=0, last=None):
+        """
+        Returns the regions that intersect a range of blocks.
+
+        :param first: number of the first block of the range
+        :param last: number of the last block of the range, None for the end
+            of the document
+        :returns: a list of (first block number, last block number)
+        """
+        i = bisect.bisect_left(self._ends, first)
+        if last is None:
+            j = len(self._starts)
+        else:
+            j = bisect.bisect_right(self._starts, last)
+        return list(zip(self._starts[i:j], self._ends[i:j]))
+
+    def blocks(self, document, first=0, last=None):
+        """
+        Yields the text blocks of a document whose numbers are in the set (and
+        in a range of blocks).
+        """
+        for start, end in self.regions(first, last):
+            start = max(start, first)
+            if last is not None:
+                end = min(end, last)
+            block = document.findBlockByNumber(start)
+            while block.isValid() and block.blockNumber() <= end:
+                yield block
+                block = block.next()
+
+    def clear(self):
+        """
+        Removes all the block numbers.
+        """
+        self._starts = []
+        self._ends = []
 
 
 #
@@ -103,11 +668,40 @@ def make_python_patterns(additional_keywords=[], additional_builtins=[]):
 class PythonSH(BaseSH):
     """
     Highlights python syntax in the editor.
+
+    The tokens are classified by an highlighting engine (see
+    :data:`ENGINES`): ``'regex'`` (the default), ``'dispatch'`` or
+    ``'lookup'``, which produce the same formats but are faster on long
+    lines. The 'lookup' engine classifies the words with the sets of
+    :attr:`WORDS` instead of matching them with the keywords and builtins
+    alternations of :attr:`PROG`, to highlight additional keywords or
+    builtins with this engine, set :attr:`WORDS` to
+    ``make_word_sets(additional_keywords, additional_builtins)``.
+
+    The results of the lines are cached (see :class:`LineCache`), set
+    :attr:`line_cache` to None to disable the cache.
+
+    Documents that have more than :attr:`lazy_threshold` blocks are
+    highlighted lazily: only the blocks of the viewport (plus
+    :attr:`lazy_margin` blocks above and below) are highlighted when they
+    change, the other blocks are highlighted later, in order, by chunks of
+    :attr:`lazy_time_slice` ms on the event loop. A block that is not
+    highlighted yet has no format, its fold level is not computed and its
+    state is not updated. Blocks that become visible are highlighted at once.
+    :attr:`lazy_highlighting_finished` is emitted once all the deferred
+    blocks have been highlighted (the import and docstring regions are then
+    complete).
     """
     mimetype = 'text/x-python'
 
+    #: Signal emitted when all the deferred blocks have been highlighted
+    lazy_highlighting_finished = QtCore.Signal()
+
     # Syntax highlighting rules:
     PROG = re.compile(make_python_patterns(), re.S)
+    # Syntax highlighting rules of the 'lookup' engine:
+    LOOKUP_PROG = re.compile(make_lookup_patterns(), re.S)
+    WORDS = make_word_sets()
     IDPROG = re.compile(r"\s+(\w+)", re.S)
     ASPROG = re.compile(r".*?\b(as)\b")
     # Syntax highlighting states (from one text block to another):
@@ -117,126 +711,215 @@ class PythonSH(BaseSH):
     # Comments suitable for Outline Explorer
     OECOMMENT = re.compile('^(# ?--[-]+|##[#]+ )[ -]*[^- ]+')
 
-    def __init__(self, parent, color_scheme=None):
+    def __init__(self, parent, color_scheme=None, engine='regex'):
         super(PythonSH, self).__init__(parent, color_scheme)
-        self.import_statements = []
+        #: Numbers of the blocks that contain an import statement
+        #: (:class:`BlockRegions`)
+        self.import_statements = BlockRegions()
         self.global_import_statements = []
-        self.docstrings = []
+        #: Numbers of the blocks that are part of a docstring
+        #: (:class:`BlockRegions`)
+        self.docstrings = BlockRegions()
+        # number of blocks of the document when the last block was
+        # highlighted, used to update the block numbers of the regions
+        self._block_count = 0
+        #: Name of the highlighting engine, see :data:`ENGINES`
+        self.engine = engine
+        #: Cache of the highlighting results of the lines
+        self.line_cache = LineCache()
+        #: Minimum number of blocks of a document to highlight it lazily,
+        #: 0 to always highlight the whole document at once.
+        self.lazy_threshold = 5000
+        #: Number of blocks around the viewport that are highlighted at once
+        self.lazy_margin = 100
+        #: Maximum duration (in ms) of a lazy highlighting chunk
+        self.lazy_time_slice = 10
+        # cursor on the first block that has not been highlighted (None if
+        # all the blocks are highlighted)
+        self._lazy_cursor = None
+        # number of the block highlighted by the current chunk
+        self._lazy_block_number = None
+        self._viewport_range = None
+        self._lazy_timer = QtCore.QTimer()
+        self._lazy_timer.setSingleShot(True)
+        self._lazy_timer.timeout.connect(self._highlight_chunk)
+
+    def on_state_changed(self, state):
+        super(PythonSH, self).on_state_changed(state)
+        scroll_bar = self.editor.verticalScrollBar()
+        if state:
+            scroll_bar.valueChanged.connect(self._on_scrolled)
+        else:
+            try:
+                scroll_bar.valueChanged.disconnect(self._on_scrolled)
+            except (RuntimeError, TypeError):
+                pass
+            self._lazy_timer.stop()
+            self._lazy_cursor = None
+
+    @property
+    def lazy_highlighting(self):
+        """
+        True while some blocks have not been highlighted yet.
+        """
+        return self._lazy_cursor is not None
+
+    def highlightBlock(self, text):
+        block = self.currentBlock()
+        self._update_regions(block)
+        if self._is_deferred(block):
+            # the block is highlighted later, its state is left untouched so
+            # that qt stops propagating the changes (multi-line strings) at
+            # the first deferred block, the chunks highlight the following
+            # blocks in order.
+            self.import_statements.discard(block.blockNumber())
+            self.docstrings.discard(block.blockNumber())
+            self._defer(block)
+            return
+        super(PythonSH, self).highlightBlock(text)
+
+    def _update_regions(self, block):
+        """
+        Moves the import and docstring regions when blocks have been inserted
+        or removed.
+
+        Qt highlights the blocks of a change starting from the block where
+        the change starts, the regions that follow this block are moved by the
+        number of blocks that have been added (or removed) by the change.
+        """
+        count = block.document().blockCount()
+        if count != self._block_count:
+            delta = count - self._block_count
+            number = block.blockNumber()
+            self.import_statements.shift(number, delta)
+            self.docstrings.shift(number, delta)
+            self._block_count = count
+
+    def _is_deferred(self, block):
+        """
+        Checks if the highlighting of a block must be deferred: the document
+        is large, the block is outside of the viewport and it is not part of
+        the chunk being highlighted.
+        """
+        if (not self.enabled or self.editor is None or
+                not self.lazy_threshold or
+                block.document().blockCount() < self.lazy_threshold):
+            return False
+        number = block.blockNumber()
+        if (self._lazy_block_number is not None and
+                number <= self._lazy_block_number):
+            return False
+        first, last = self._visible_range()
+        return not first <= number <= last
+
+    def _visible_range(self):
+        """
+        Returns the numbers of the first and last blocks that are highlighted
+        at once (the viewport and its margin).
+
+        The range is computed once per event loop iteration.
+        """
+        if self._viewport_range is None:
+            editor = self.editor
+            first = editor.firstVisibleBlock().blockNumber()
+            nb_lines = editor.viewport().height() // max(
+                1, editor.fontMetrics().height())
+            self._viewport_range = (first - self.lazy_margin,
+                                    first + nb_lines + self.lazy_margin)
+            QtCore.QTimer.singleShot(0, self._reset_visible_range)
+        return self._viewport_range
+
+    def _reset_visible_range(self):
+        self._viewport_range = None
+
+    def _defer(self, block):
+        """
+        Schedules the highlighting of a block (and of the following ones).
+        """
+        if (self._lazy_cursor is None or
+                block.position() < self._lazy_cursor.position()):
+            self._lazy_cursor = QtGui.QTextCursor(block)
+        if not self._lazy_timer.isActive():
+            self._lazy_timer.start(0)
+
+    def _highlight_chunk(self):
+        """
+        Highlights the deferred blocks, in order, during
+        :attr:`lazy_time_slice` ms at most.
+        """
+        if self._lazy_cursor is None or self.document() is None:
+            return
+        deadline = clock() + self.lazy_time_slice / 1000.0
+        block = self._lazy_cursor.block()
+        try:
+            while block.isValid():
+                next_block = block.next()
+                if next_block.isValid():
+                    self._lazy_cursor.setPosition(next_block.position())
+                self._lazy_block_number = block.blockNumber()
+                self.rehighlightBlock(block)
+                block = next_block
+                if clock() > deadline:
+                    break
+        finally:
+            self._lazy_block_number = None
+        if block.isValid():
+            self._lazy_timer.start(0)
+        else:
+            self._lazy_cursor = None
+            self.lazy_highlighting_finished.emit()
+
+    def _on_scrolled(self, *args):
+        """
+        Highlights the blocks that became visible and that are not highlighted
+        yet.
+
+        The state of the blocks above them may not be known yet, they are
+        highlighted again when the chunks reach them if their state changes.
+        """
+        self._viewport_range = None
+        if self._lazy_cursor is None:
+            return
+        first, last = self._visible_range()
+        document = self.document()
+        start = max(first, self._lazy_cursor.block().blockNumber())
+        block = document.findBlockByNumber(start)
+        while block.isValid() and block.blockNumber() <= last:
+            self.rehighlightBlock(block)
+            block = block.next()
 
     def highlight_block(self, text, block):
         prev_block = block.previous()
         prev_state = TextBlockHelper.get_state(prev_block)
-        if prev_state == self.INSIDE_DQ3STRING:
-            offset = -4
-            text = r'""" ' + text
-        elif prev_state == self.INSIDE_SQ3STRING:
-            offset = -4
-            text = r"''' " + text
-        elif prev_state == self.INSIDE_DQSTRING:
-            offset = -2
-            text = r'" ' + text
-        elif prev_state == self.INSIDE_SQSTRING:
-            offset = -2
-            text = r"' " + text
+        if self.line_cache is not None:
+            ranges, state, docstring, import_stmt = \
+                self.line_cache.highlight(self, text, prev_state, self.engine)
         else:
-            offset = 0
-
-        import_stmt = None
+            ranges, state, docstring, import_stmt = ENGINES[self.engine](
+                self, text, prev_state)
         # set docstring dynamic attribute, used by the fold detector.
-        block.docstring = False
-
-        self.setFormat(0, len(text), self.formats["normal"])
-
-        state = self.NORMAL
-        match = self.PROG.search(text)
-        while match:
-            for key, value in list(match.groupdict().items()):
-                if value:
-                    start, end = match.span(key)
-                    start = max([0, start + offset])
-                    end = max([0, end + offset])
-                    if key == "uf_sq3string":
-                        self.setFormat(start, end - start,
-                                       self.formats["docstring"])
-                        block.docstring = True
-                        state = self.INSIDE_SQ3STRING
-                    elif key == "uf_dq3string":
-                        self.setFormat(start, end - start,
-                                       self.formats["docstring"])
-                        block.docstring = True
-                        state = self.INSIDE_DQ3STRING
-                    elif key == "uf_sqstring":
-                        self.setFormat(start, end - start,
-                                       self.formats["string"])
-                        state = self.INSIDE_SQSTRING
-                    elif key == "uf_dqstring":
-                        self.setFormat(start, end - start,
-                                       self.formats["string"])
-                        state = self.INSIDE_DQSTRING
-                    elif key == 'builtin_fct':
-                        # trick to highlight __init__, __add__ and so on with
-                        # builtin color
-                        self.setFormat(start, end - start,
-                                       self.formats["constant"])
-                    else:
-                        if ('"""' in value or "'''" in value) and \
-                                key != 'comment':
-                            # highlight docstring with a different color
-                            block.docstring = True
-                            self.setFormat(start, end - start,
-                                           self.formats["docstring"])
-                        elif key == 'decorator':
-                            # highlight decorators
-                            self.setFormat(start, end - start,
-                                           self.formats["decorator"])
-                        elif value in ['self', 'cls']:
-                            # highlight self attribute
-                            self.setFormat(start, end - start,
-                                           self.formats["self"])
-                        else:
-                            # highlight all other tokens
-                            self.setFormat(start, end - start,
-                                           self.formats[key])
-                        if key == "keyword":
-                            if value in ("def", "class"):
-                                match1 = self.IDPROG.match(text, end)
-                                if match1:
-                                    start1, end1 = match1.span(1)
-                                    fmt_key = ('definition' if value == 'class'
-                                               else 'function')
-                                    fmt = self.formats[fmt_key]
-                                    self.setFormat(start1, end1 - start1, fmt)
-                        if key == 'namespace':
-                            import_stmt = text.strip()
-                            # color all the "as" words on same line, except
-                            # if in a comment; cheap approximation to the
-                            # truth
-                            if '#' in text:
-                                endpos = text.index('#')
-                            else:
-                                endpos = len(text)
-                            while True:
-                                match1 = self.ASPROG.match(text, end,
-                                                           endpos)
-                                if not match1:
-                                    break
-                                start, end = match1.span(1)
-                                self.setFormat(start, end - start,
-                                               self.formats["namespace"])
-            # next match
-            match = self.PROG.search(text, match.end())
+        block.docstring = docstring
+        formats = self.formats
+        for start, length, fmt in ranges:
+            self.setFormat(start, length, formats[fmt])
         TextBlockHelper.set_state(block, state)
 
         # update import zone
+        number = block.blockNumber()
         if import_stmt is not None:
             block.import_stmt = import_stmt
-            self.import_statements.append(block)
+            self.import_statements.add(number)
+            self.docstrings.discard(number)
             block.import_stmt = True
         elif block.docstring:
-            self.docstrings.append(block)
+            self.docstrings.add(number)
+            self.import_statements.discard(number)
+        else:
+            self.import_statements.discard(number)
+            self.docstrings.discard(number)
 
     def rehighlight(self):
-        self.import_statements[:] = []
+        self.import_statements.clear()
         self.global_import_statements[:] = []
-        self.docstrings[:] = []
+        self.docstrings.clear()
         super(PythonSH, self).rehighlight()
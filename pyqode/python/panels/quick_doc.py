@@ -7,6 +7,7 @@ from pyqode.core import icons
 from pyqode.qt import QtCore, QtWidgets
 from pyqode.core.api import Panel, TextHelper
 from pyqode.python.backend.workers import quick_doc
+from pyqode.python.modes.document_sync import document_request_data
 
 
 class QuickDocPanel(Panel):
@@ -67,12 +68,12 @@ class QuickDocPanel(Panel):
     def _on_action_quick_doc_triggered(self):
         tc = TextHelper(self.editor).word_under_cursor(select_whole_word=True)
         request_data = {
-            'code': self.editor.toPlainText(),
             'line': tc.blockNumber(),
             'column': tc.columnNumber(),
             'path': self.editor.file.path,
             'encoding': self.editor.file.encoding
         }
+        request_data.update(document_request_data(self.editor))
         self.editor.backend.send_request(
             quick_doc, request_data, on_receive=self._on_results_available)
 
@@ -12,7 +12,6 @@ from pyqode.core import panels
 from pyqode.python import managers as pymanagers
 from pyqode.python import modes as pymodes
 from pyqode.python import panels as pypanels
-from pyqode.python.backend.workers import defined_names
 from pyqode.python.folding import PythonFoldDetector
 
 
@@ -37,8 +36,8 @@ class PyCodeEditBase(api.CodeEdit):
         mimetype (since the python syntax highlighter does not use it).
         """
         try:
-            self.syntax_highlighter.docstrings[:] = []
-            self.syntax_highlighter.import_statements[:] = []
+            self.syntax_highlighter.docstrings.clear()
+            self.syntax_highlighter.import_statements.clear()
         except AttributeError:
             pass
         super(PyCodeEditBase, self).setPlainText(txt, mimetype, encoding)
@@ -66,7 +65,8 @@ class PyCodeEdit(PyCodeEditBase):
         self.setWindowTitle("pyQode - Python Editor")
 
         # install those modes first as they are required by other modes/panels
-        self.modes.append(modes.OutlineMode(defined_names))
+        self.modes.append(pymodes.DocumentSyncMode())
+        self.modes.append(pymodes.PyOutlineMode())
 
         # panels
         self.panels.append(panels.SearchAndReplacePanel(),
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the jedi and the ast outline providers of defined_names on
+generated modules of increasing sizes and on a few modules of the standard
+library.
+
+The outline is computed from scratch, as when a module is opened: the
+incremental outline engine is not used and the parser cache of jedi (parso)
+is cleared before each run.
+
+::
+
+    usage: bench_outline.py [-h] [-s SIZES [SIZES ...]] [-n ITERATIONS]
+
+"""
+import argparse
+import time
+
+import parso
+
+from pyqode.python.backend import workers
+
+import corpus
+
+try:
+    clock = time.perf_counter
+except AttributeError:
+    clock = time.time
+
+
+def run(provider, code, nb_iterations):
+    """
+    Returns the median duration (in ms) of an outline provider.
+    """
+    durations = []
+    for _ in range(nb_iterations):
+        parso.cache.parser_cache.clear()
+        start = clock()
+        workers.OUTLINE_PROVIDERS[provider](code, None)
+        durations.append(clock() - start)
+    durations.sort()
+    return 1000 * durations[len(durations) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-s', '--sizes', type=int, nargs='+',
+                        default=corpus.GENERATED_SIZES[:2],
+                        help='sizes (in lines) of the generated modules')
+    parser.add_argument('-n', '--iterations', type=int, default=5)
+    args = parser.parse_args()
+    samples = corpus.load(args.sizes, corpus.STDLIB_MODULES)
+    print('%-20s %8s %10s %10s %8s' % (
+        'module', 'lines', 'jedi (ms)', 'ast (ms)', 'speed-up'))
+    for name, code in samples:
+        jedi_time = run('jedi', code, args.iterations)
+        ast_time = run('ast', code, args.iterations)
+        print('%-20s %8d %10.1f %10.1f %7.1fx' % (
+            name, len(code.splitlines()), jedi_time, ast_time,
+            jedi_time / ast_time))
+
+
+if __name__ == '__main__':
+    main()
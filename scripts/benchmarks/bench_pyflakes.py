@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the full and the incremental pyflakes analysis (run_pyflakes) on a
+large generated module.
+
+The benchmark simulates a user typing in the middle of the module: a line of
+a function body is modified before each analysis.
+
+::
+
+    usage: bench_pyflakes.py [-h] [-l LINES] [-n ITERATIONS]
+
+"""
+import argparse
+import time
+
+from pyqode.python.backend import workers
+
+from corpus import generate_module
+
+
+def run(code, nb_iterations, incremental):
+    lines = code.splitlines()
+    middle = len(lines) // 2
+    while not lines[middle].startswith('    return'):
+        middle += 1
+    durations = []
+    workers.pyflakes_cache.clear()
+    for i in range(nb_iterations):
+        lines[middle] = '    return c.method(b + %d)' % i
+        data = {'code': '\n'.join(lines), 'path': 'generated.py',
+                'encoding': 'utf-8', 'incremental': incremental}
+        t = time.time()
+        workers.run_pyflakes(data)
+        durations.append(time.time() - t)
+    # the first run always parses the whole module
+    return durations[1:]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-l', '--lines', type=int, default=10000,
+                        help='number of lines of the generated module')
+    parser.add_argument('-n', '--iterations', type=int, default=20)
+    args = parser.parse_args()
+    code = generate_module(args.lines)
+    print('module of %d lines, %d iterations' % (
+        len(code.splitlines()), args.iterations))
+    for incremental in (False, True):
+        durations = sorted(run(code, args.iterations, incremental))
+        print('%-12s mean: %7.1f ms  median: %7.1f ms' % (
+            'incremental' if incremental else 'full',
+            1000 * sum(durations) / len(durations),
+            1000 * durations[len(durations) // 2]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the highlighting engines of PythonSH (see
+pyqode.python.modes.sh.ENGINES) on the benchmark corpus and on long lines.
+
+For each sample, the script checks that the engines produce the same formats
+and states as the 'regex' engine, then reports the time needed to highlight
+the whole sample (line by line, as QSyntaxHighlighter does). The script exits
+with a non-zero status if an engine produces different formats.
+
+The 'long-lines' and 'long-names' samples show the throughput of the engines
+on long lines: the 'lookup' engine matches the words with a single rule
+instead of trying the keywords and builtins alternations at every position.
+
+The last columns report the time needed by the default engine with a line
+cache (see pyqode.python.modes.sh.LineCache): when the cache is empty (the
+identical lines of the sample are only highlighted once) and when the whole
+sample is highlighted again, and the hit ratio of the cold cache.
+
+::
+
+    usage: bench_sh.py [-h] [-s SIZES [SIZES ...]] [-n ITERATIONS]
+
+"""
+import argparse
+import sys
+import time
+
+from pyqode.python.modes import sh
+
+import corpus
+
+try:
+    clock = time.perf_counter
+except AttributeError:
+    clock = time.time
+
+
+def long_lines(nb_lines=20, nb_items=200):
+    """
+    Generates a sample made of long lines with a lot of tokens.
+    """
+    items = ', '.join('(self.a%d, %d, "s%d", len(b), True)' % (i, i, i)
+                      for i in range(nb_items))
+    return '\n'.join('x%d = [%s]  # comment' % (i, items)
+                     for i in range(nb_lines)) + '\n'
+
+
+def long_names(nb_lines=20, nb_items=200):
+    """
+    Generates a sample made of long lines of names (keywords, builtins,
+    attributes and identifiers), where the keywords and builtins patterns
+    are tried at every position by the 'regex' and 'dispatch' engines.
+    """
+    items = ' '.join('value_%d = not isinstance(item.name, str) or '
+                     'len(items) in other_%d' % (i, i)
+                     for i in range(nb_items // 4))
+    return '\n'.join('if %s: pass' % items for _ in range(nb_lines)) + '\n'
+
+
+def highlight(engine, lines):
+    """
+    Highlights some lines with an engine, the state of each line is passed
+    to the next one.
+
+    :returns: the list of the results of the engine
+    """
+    results = []
+    state = sh.NORMAL
+    for line in lines:
+        result = engine(sh.PythonSH, line, state)
+        state = result[1]
+        results.append(result)
+    return results
+
+
+def cached_engine(cache):
+    """
+    Returns an engine that uses a line cache.
+    """
+    def engine(highlighter, text, prev_state):
+        return cache.highlight(highlighter, text, prev_state)
+    return engine
+
+
+def run_cached(lines, nb_iterations):
+    """
+    Returns the median durations (in ms) of the highlighting of some lines
+    with an empty cache and with a warm cache and the hit ratio of the empty
+    cache.
+    """
+    cold = []
+    warm = []
+    for _ in range(nb_iterations):
+        cache = sh.LineCache()
+        engine = cached_engine(cache)
+        start = clock()
+        highlight(engine, lines)
+        cold.append(clock() - start)
+        stats = cache.stats()
+        start = clock()
+        highlight(engine, lines)
+        warm.append(clock() - start)
+    cold.sort()
+    warm.sort()
+    hit_ratio = float(stats['hits']) / max(1, stats['hits'] + stats['misses'])
+    return (1000 * cold[len(cold) // 2], 1000 * warm[len(warm) // 2],
+            hit_ratio)
+
+
+def run(engine, lines, nb_iterations):
+    """
+    Returns the median duration (in ms) of an engine.
+    """
+    durations = []
+    for _ in range(nb_iterations):
+        start = clock()
+        highlight(engine, lines)
+        durations.append(clock() - start)
+    durations.sort()
+    return 1000 * durations[len(durations) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-s', '--sizes', type=int, nargs='+',
+                        default=corpus.GENERATED_SIZES[:1],
+                        help='sizes (in lines) of the generated modules')
+    parser.add_argument('-n', '--iterations', type=int, default=5)
+    args = parser.parse_args()
+    samples = corpus.load(args.sizes, corpus.STDLIB_MODULES)
+    samples.append(('long-lines', long_lines()))
+    samples.append(('long-names', long_names()))
+    names = sorted(sh.ENGINES, key=lambda name: name != 'regex')
+    print('%-20s %8s ' % ('sample', 'lines') + ' '.join(
+        '%12s' % ('%s (ms)' % name) for name in names) +
+        ' %12s %12s %8s' % ('cold (ms)', 'warm (ms)', 'hits'))
+    status = 0
+    for name, code in samples:
+        lines = code.splitlines()
+        reference = highlight(sh.ENGINES['regex'], lines)
+        for engine in names:
+            if highlight(sh.ENGINES[engine], lines) != reference:
+                print('%s: the %s engine produces different formats' % (
+                    name, engine))
+                status = 1
+        if highlight(cached_engine(sh.LineCache()), lines) != [
+                (tuple(r[0]), ) + r[1:] for r in reference]:
+            print('%s: the line cache produces different formats' % name)
+            status = 1
+        cold, warm, hit_ratio = run_cached(lines, args.iterations)
+        print('%-20s %8d ' % (name, len(lines)) + ' '.join(
+            '%12.1f' % run(sh.ENGINES[engine], lines, args.iterations)
+            for engine in names) + ' %12.1f %12.1f %7.0f%%' % (
+                cold, warm, 100 * hit_ratio))
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measures the latency and the peak memory usage of the backend workers on
+generated modules (1k, 10k and 50k lines) and on a few modules of the
+standard library (see corpus.py).
+
+The benchmark simulates a user typing at the end of the module: a comment is
+modified before each request so that the workers cannot simply return the
+results cached for the previous request. The p50/p95 latencies are computed
+over the iterations (the first request of each worker is reported separately
+as the cold latency), the peak memory is measured with tracemalloc during an
+extra run.
+
+The results can be saved (``--output``) and compared with a previous run
+(``--baseline``), the script exits with a non-zero status if the p50
+latency of a worker regressed by more than ``--threshold``.
+
+::
+
+    usage: bench_workers.py [-h] [-n ITERATIONS] [-s SIZES [SIZES ...]]
+                            [-m [MODULES [MODULES ...]]]
+                            [-w WORKERS [WORKERS ...]] [-o OUTPUT]
+                            [-b BASELINE] [-t THRESHOLD]
+
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from pyqode.python.backend import workers
+from pyqode.python.backend.workers import JediCompletionProvider
+
+import corpus
+
+try:
+    clock = time.perf_counter
+except AttributeError:
+    clock = time.time
+
+
+def _request(code, position, column=None):
+    line, name_column, attribute_column, call_column = position
+    return {'code': code, 'line': line, 'path': None, 'encoding': 'utf-8',
+            'column': attribute_column if column is None else column}
+
+
+def _calltips(code, position):
+    workers.calltips(_request(code, position, position[3]))
+
+
+def _goto_assignments(code, position):
+    workers.goto_assignments(_request(code, position))
+
+
+def _quick_doc(code, position):
+    workers.quick_doc(_request(code, position))
+
+
+def _defined_names(code, position):
+    workers.defined_names(_request(code, position))
+
+
+def _run_pep8(code, position):
+    workers.run_pep8({'code': code, 'path': None, 'max_line_length': 79,
+                      'ignore_rules': []})
+
+
+def _run_pyflakes(code, position):
+    workers.run_pyflakes(_request(code, position))
+
+
+def _complete(code, position):
+    line, _, column, _ = position
+    JediCompletionProvider.complete(code, line, column, None, 'utf-8', '')
+
+
+#: The benchmarked workers
+WORKERS = {
+    'calltips': _calltips,
+    'goto_assignments': _goto_assignments,
+    'quick_doc': _quick_doc,
+    'defined_names': _defined_names,
+    'run_pep8': _run_pep8,
+    'run_pyflakes': _run_pyflakes,
+    'complete': _complete,
+}
+
+
+def percentile(durations, percent):
+    """
+    Returns the given percentile (nearest rank) of a list of durations.
+    """
+    durations = sorted(durations)
+    index = int(round(percent / 100.0 * (len(durations) - 1)))
+    return durations[index]
+
+
+def bench(worker, code, nb_iterations):
+    """
+    Runs a worker ``nb_iterations`` times on the given code, the code is
+    modified before each run.
+
+    :returns: a dict with the cold, p50 and p95 latencies (in ms) and the
+        peak memory (in KiB).
+    """
+    position = corpus.find_call(code)
+    durations = []
+    for i in range(nb_iterations + 1):
+        edited = code + '# edit %d\n' % i
+        start = clock()
+        worker(edited, position)
+        durations.append(clock() - start)
+    tracemalloc.start()
+    try:
+        worker(code + '# edit -1\n', position)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    cold, durations = durations[0], durations[1:]
+    return {
+        'cold': 1000 * cold,
+        'p50': 1000 * percentile(durations, 50),
+        'p95': 1000 * percentile(durations, 95),
+        'peak_memory': peak / 1024.0,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Compares the p50 latencies with the baseline ones.
+
+    :returns: the list of regressions: (sample, worker, baseline p50, p50)
+    """
+    regressions = []
+    for sample, sample_results in sorted(results.items()):
+        for worker, stats in sorted(sample_results.items()):
+            try:
+                reference = baseline[sample][worker]['p50']
+            except KeyError:
+                continue
+            if stats['p50'] > reference * threshold:
+                regressions.append((sample, worker, reference, stats['p50']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--iterations', type=int, default=10)
+    parser.add_argument('-s', '--sizes', type=int, nargs='+',
+                        default=corpus.GENERATED_SIZES,
+                        help='sizes (in lines) of the generated modules')
+    parser.add_argument('-m', '--modules', nargs='*',
+                        default=corpus.STDLIB_MODULES,
+                        help='standard library modules to use as samples')
+    parser.add_argument('-w', '--workers', nargs='+', default=sorted(WORKERS),
+                        choices=sorted(WORKERS))
+    parser.add_argument('-o', '--output', help='save the results (json)')
+    parser.add_argument('-b', '--baseline',
+                        help='compare the results with a previous run')
+    parser.add_argument('-t', '--threshold', type=float, default=1.25,
+                        help='p50 latency ratio considered as a regression')
+    args = parser.parse_args()
+
+    print('python %s, %d iterations' % (platform.python_version(),
+                                        args.iterations))
+    print('%-18s %-17s %9s %9s %9s %11s' % (
+        'sample', 'worker', 'cold (ms)', 'p50 (ms)', 'p95 (ms)',
+        'peak (KiB)'))
+    results = {}
+    for sample, code in corpus.load(args.sizes, args.modules):
+        results[sample] = {}
+        for name in args.workers:
+            try:
+                stats = bench(WORKERS[name], code, args.iterations)
+            except Exception as e:
+                print('%-18s %-17s failed: %r' % (sample, name, e))
+                continue
+            results[sample][name] = stats
+            print('%-18s %-17s %9.1f %9.1f %9.1f %11.0f' % (
+                sample, name, stats['cold'], stats['p50'], stats['p95'],
+                stats['peak_memory']))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': platform.python_version(),
+                       'iterations': args.iterations,
+                       'results': results}, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for sample, worker, reference, p50 in regressions:
+            print('regression: %s %s p50 %.1f ms -> %.1f ms' % (
+                sample, worker, reference, p50))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
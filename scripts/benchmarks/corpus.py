@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Corpus of python modules used by the benchmarks: generated modules of a
+given size and a few modules of the standard library of the running
+interpreter.
+"""
+import io
+import os
+import re
+import sysconfig
+
+
+#: Modules of the standard library used as real-world samples
+STDLIB_MODULES = ['argparse', 'inspect', 'difflib']
+
+#: Sizes (in lines) of the generated modules
+GENERATED_SIZES = [1000, 10000, 50000]
+
+_CALL = re.compile(r'\b([A-Za-z_]\w*)\.([A-Za-z_]\w*)\(')
+
+
+def generate_module(nb_lines):
+    """
+    Generates a module made of classes and functions with approximately
+    ``nb_lines`` lines.
+    """
+    lines = ['"""', 'Generated module', '"""', 'import os', 'import sys', '']
+    i = 0
+    while len(lines) < nb_lines:
+        lines += [
+            '',
+            '',
+            'class Class%d(object):' % i,
+            '    """ Docstring of Class%d """' % i,
+            '    def __init__(self, value):',
+            '        self.value = value',
+            '',
+            '    def method(self, other):',
+            '        if other > self.value:',
+            '            return os.path.join(str(other), "x")',
+            '        return sys.argv[0]',
+            '',
+            '',
+            'def function%d(a, b=%d):' % (i, i),
+            '    c = Class%d(a)' % i,
+            '    return c.method(b)',
+        ]
+        i += 1
+    return '\n'.join(lines) + '\n'
+
+
+def stdlib_module(name):
+    """
+    Returns the source code of a pure python module of the standard library.
+    """
+    path = os.path.join(sysconfig.get_paths()['stdlib'], name + '.py')
+    with io.open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def load(sizes=None, modules=None):
+    """
+    Loads the corpus.
+
+    :param sizes: sizes of the generated modules, defaults to
+        :data:`GENERATED_SIZES`.
+    :param modules: names of the standard library modules, defaults to
+        :data:`STDLIB_MODULES`.
+    :returns: a list of (name, code) tuples.
+    """
+    if sizes is None:
+        sizes = GENERATED_SIZES
+    if modules is None:
+        modules = STDLIB_MODULES
+    corpus = [('generated-%d' % size, generate_module(size))
+              for size in sizes]
+    corpus += [(name, stdlib_module(name)) for name in modules]
+    return corpus
+
+
+def find_call(code):
+    """
+    Finds the first ``name.attribute(`` expression found after the middle of
+    the module, this is where the position based workers (calltips, go to
+    assignments, quick doc, completion) are run.
+
+    :returns: a tuple (line, column_of_name, column_of_attribute,
+        column_after_parenthesis), the line is 0 based.
+    """
+    lines = code.splitlines()
+    for i in list(range(len(lines) // 2, len(lines))) + \
+            list(range(len(lines) // 2)):
+        match = _CALL.search(lines[i])
+        if match and not lines[i].lstrip().startswith('#'):
+            return i, match.start(1), match.start(2), match.end()
+    raise ValueError('no call expression found')
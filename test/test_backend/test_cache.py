@@ -0,0 +1,40 @@
+"""
+Test the backend caches.
+"""
+from pyqode.python.backend.cache import LRUCache, content_hash
+
+
+def test_content_hash():
+    assert content_hash('foo') == content_hash('foo')
+    assert content_hash('foo') != content_hash('bar')
+    assert content_hash(None) == content_hash('')
+
+
+def test_lru_cache():
+    cache = LRUCache(max_entries=2, max_size=100)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    # b is the least recently used entry
+    cache.put('c', 3)
+    assert 'b' not in cache
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    stats = cache.stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 1
+    assert stats['evictions'] == 1
+
+
+def test_lru_cache_max_size():
+    cache = LRUCache(max_entries=10, max_size=100)
+    cache.put('a', 1, size=60)
+    cache.put('b', 2, size=60)
+    assert 'a' not in cache
+    assert cache.size == 60
+    # too big to be cached
+    cache.put('c', 3, size=101)
+    assert 'c' not in cache
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.size == 0
@@ -0,0 +1,79 @@
+"""
+Test the cancellation of the superseded requests.
+"""
+import time
+
+import pytest
+
+from pyqode.python.backend import cancellation
+from pyqode.python.backend.pool import Job, JobQueue, WorkerPool
+
+WORKERS = 'pyqode.python.backend.workers.'
+
+
+def _job(worker, version, document_id='doc'):
+    return Job(WORKERS + worker, {'document_id': document_id,
+                                  'version': version})
+
+
+def test_job_queue_supersession():
+    queue = JobQueue()
+    old_lint = _job('run_pep8', 1)
+    old_calltip = _job('calltips', 1)
+    other_document = _job('run_pep8', 1, document_id='other')
+    update = _job('update_document', 1)
+    for job in (old_lint, old_calltip, other_document, update):
+        queue.put(job)
+    new_lint = _job('run_pep8', 2)
+    queue.put(new_lint)
+    assert old_lint.cancelled
+    assert old_lint.wait(0) is None
+    assert not old_calltip.cancelled
+    assert not other_document.cancelled
+    assert not update.cancelled
+    assert len(queue) == 4
+    assert queue.cancelled == 1
+    # the update is not run before the calltip made on the previous version
+    assert queue.get() is old_calltip
+    # the running job is cancelled
+    cancelled = []
+    queue.put(_job('calltips', 2), cancelled.append)
+    assert cancelled == [old_calltip]
+    assert old_calltip.cancelled
+    assert queue.get() is update
+
+
+def test_check_cancelled():
+    cancellation.set_current_request(None)
+    cancellation.check_cancelled()
+    cancellation.set_current_request(lambda: True)
+    try:
+        with pytest.raises(cancellation.RequestCancelled):
+            cancellation.check_cancelled()
+    finally:
+        cancellation.set_current_request(None)
+
+
+def test_cancel_running_request():
+    pool = WorkerPool(lint_processes=0)
+    pool.start()
+    try:
+        code = 'x=1\n' * 20000
+        pool.run(WORKERS + 'open_document', {
+            'document_id': 'doc', 'code': code, 'version': 1, 'path': None})
+        data = {'document_id': 'doc', 'path': None, 'max_line_length': 79,
+                'ignore_rules': [], 'version': 1}
+        jobs = pool.submit(WORKERS + 'run_pep8', data)
+        executor = pool.executors[0]
+        while executor.queue.running is not jobs[0]:
+            time.sleep(0.001)
+        update = pool.submit(WORKERS + 'update_document', {
+            'document_id': 'doc', 'edits': [(0, 0, 'y=2\n')],
+            'base_version': 1, 'version': 2})
+        results = pool.run(WORKERS + 'run_pep8', dict(data, version=2))
+        assert pool.wait(update)
+        assert jobs[0].cancelled
+        assert jobs[0].wait() is None
+        assert len(results) == 20001
+    finally:
+        pool.stop()
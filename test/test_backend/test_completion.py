@@ -0,0 +1,109 @@
+"""
+Test the ranking of the code completions.
+"""
+from pyqode.python.backend import completion
+from pyqode.python.backend import workers
+
+
+def test_match_score():
+    assert completion.match_score('path', 'pa')[0] == completion.MATCH_PREFIX
+    assert completion.match_score('PathLike', 'pa')[0] == \
+        completion.MATCH_PREFIX_IGNORE_CASE
+    assert completion.match_score('get_current_window', 'gcw')[0] == \
+        completion.MATCH_WORDS
+    assert completion.match_score('GetCurrentWindow', 'gcw')[0] == \
+        completion.MATCH_WORDS
+    assert completion.match_score('getcwd', 'gcw')[0] == \
+        completion.MATCH_SUBSEQUENCE
+    assert completion.match_score('path', 'px') is None
+
+
+def test_rank():
+    names = ['_private', 'fpathconf', '__dunder__', 'PathLike', 'pathsep',
+             'path', 'P_ALL', 'spam']
+    assert completion.rank(names, 'pa') == [
+        'path', 'pathsep', 'PathLike', 'P_ALL', 'fpathconf', 'spam',
+        '_private']
+    assert completion.rank(names, '')[-2:] == ['_private', '__dunder__']
+    items = [('b', 1), ('a', 2)]
+    assert completion.rank(items, '', key=lambda item: item[0]) == [
+        ('a', 2), ('b', 1)]
+
+
+def test_completion_limits(monkeypatch):
+    monkeypatch.setattr(workers.JediCompletionProvider, 'limit', 20)
+    monkeypatch.setattr(workers.JediCompletionProvider, 'tooltip_limit', 5)
+    code = 'import os\nos.'
+    completions = workers.JediCompletionProvider.complete(
+        code, 1, 3, None, 'utf-8', '')
+    assert len(completions) == 20
+    assert len([c for c in completions if 'tooltip' in c]) == 5
+    # get the other completions page by page
+    data = {'code': code, 'line': 1, 'column': 3, 'path': None,
+            'prefix': '', 'limit': 10}
+    page = workers.complete_page(data)
+    assert page['total'] > 20
+    assert [c['name'] for c in page['completions']] == \
+        [c['name'] for c in completions[:10]]
+    data['offset'] = 20
+    data['tooltips'] = True
+    page = workers.complete_page(data)
+    assert page['offset'] == 20
+    assert all('tooltip' in c for c in page['completions'])
+
+
+def test_refinement():
+    workers.completion_cache.clear()
+    workers.script_cache.clear()
+    code = 'import os\nos.p\nprint(os)\n'
+    names = [c['name'] for c in workers.JediCompletionProvider.complete(
+        code, 1, 4, None, 'utf-8', 'p')]
+    assert 'path' in names
+    # typing the next characters of the word refines the previous completion
+    # set, jedi is not run again
+    code = 'import os\nos.pat\nprint(os)\n'
+    names = [c['name'] for c in workers.JediCompletionProvider.complete(
+        code, 1, 6, None, 'utf-8', 'pat')]
+    assert names[0] == 'path'
+    assert 'pardir' not in names
+    assert workers.completion_cache.hits == 1
+    # the anchor changed
+    code = 'import os\nos.path.j\nprint(os)\n'
+    workers.JediCompletionProvider.complete(
+        code, 1, 9, None, 'utf-8', 'j')
+    assert workers.completion_cache.hits == 1
+    assert workers.completion_cache.misses == 2
+
+
+def test_word_start_column():
+    # pyqode.core's CodeCompletionMode sends the column of the start of the
+    # typed word
+    workers.completion_cache.clear()
+    names = [c['name'] for c in workers.JediCompletionProvider.complete(
+        'import os\nos.w', 1, 3, None, 'utf-8', 'w')]
+    assert 'walk' in names
+    assert 'write' in names
+    assert names[0].startswith('w')
+    names = [c['name'] for c in workers.JediCompletionProvider.complete(
+        'import os\nos.wal', 1, 3, None, 'utf-8', 'wal')]
+    assert names[0] == 'walk'
+    assert workers.completion_cache.hits == 1
+
+
+def test_resolve_completions():
+    code = 'def spam():\n    """ Spam docstring """\n\nsp'
+    completions = workers.JediCompletionProvider.complete(
+        code, 3, 2, None, 'utf-8', 'sp')
+    assert completions[0]['name'] == 'spam'
+    assert completions[0]['type'] == 'function'
+    assert 'tooltip' not in completions[0]
+    handles = [c['handle'] for c in completions[:3]]
+    resolved = workers.resolve_completions(
+        {'handles': handles + ['0:0', 'invalid'], 'docstring': True})
+    assert sorted(resolved) == sorted(handles)
+    assert resolved[handles[0]]['description'] == 'def spam'
+    assert 'Spam docstring' in resolved[handles[0]]['docstring']
+    # the results are cached per handle
+    hits = workers.resolved_completions.hits
+    workers.resolve_completions({'handles': handles[:1]})
+    assert workers.resolved_completions.hits == hits + 1
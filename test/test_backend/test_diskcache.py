@@ -0,0 +1,74 @@
+"""
+Test the persistent analysis cache.
+"""
+import os
+import time
+
+from pyqode.python.backend import workers
+from pyqode.python.backend.diskcache import DiskCache
+
+
+def test_disk_cache(tmpdir):
+    dependency = tmpdir.join('module.py')
+    dependency.write('x = 1\n')
+    cache = DiskCache(str(tmpdir.join('cache')))
+    assert cache.get('key') is None
+    cache.put('key', [1, 2, 3], [str(dependency)])
+    assert cache.get('key') == [1, 2, 3]
+
+    # the entries are persisted
+    cache = DiskCache(str(tmpdir.join('cache')))
+    assert cache.load() == 1
+    assert cache.get('key') == [1, 2, 3]
+
+    # and invalidated when a dependency changes
+    dependency.write('x = 12\n')
+    os.utime(str(dependency), (time.time() + 10, time.time() + 10))
+    assert cache.get('key') is None
+    cache = DiskCache(str(tmpdir.join('cache')))
+    assert cache.load() == 0
+
+
+def test_disk_cache_prune(tmpdir):
+    cache = DiskCache(str(tmpdir.join('cache')), max_size=1000)
+    for i in range(10):
+        cache.put(i, 'x' * 200)
+    assert sum(os.path.getsize(os.path.join(cache.directory, f))
+               for f in os.listdir(cache.directory)) <= 1000
+    assert cache.get(9) == 'x' * 200
+    assert cache.get(0) is None
+    cache.clear()
+    assert cache.get(9) is None
+
+
+def test_module_members_completion(tmpdir, monkeypatch):
+    cache = DiskCache(str(tmpdir.join('cache')))
+    monkeypatch.setattr(workers, 'module_cache', cache)
+    code = 'import sys as system\nsystem.pa'
+    completions = workers.JediCompletionProvider.complete(
+        code, 1, len('system.pa'), None, 'utf-8', 'pa')
+    names = [c['name'] for c in completions]
+    assert 'path' in names
+    assert cache.stats()['misses'] == 1
+    workers.completion_cache.clear()
+    assert [c['name'] for c in workers.JediCompletionProvider.complete(
+        code, 1, len('system.pa'), None, 'utf-8', 'pa')] == names
+    assert cache.stats()['hits'] == 1
+    # not an installed module
+    assert workers._complete_module_members(
+        'import foo_bar_baz\nfoo_bar_baz.', 1, 12) is None
+    # the module name is bound again in a function
+    code = 'import time\n\n\ndef f():\n    time = 1.5\n    time.'
+    assert workers._complete_module_members(code, 5, 9) is None
+    code = 'import time\n\n\ndef f(): time = 1.5; time.'
+    assert workers._complete_module_members(code, 3, 26) is None
+    names = [c['name'] for c in workers.JediCompletionProvider.complete(
+        code, 3, 26, None, 'utf-8', '')]
+    assert 'is_integer' in names
+    assert 'sleep' not in names
+    # imported in a function only
+    code = 'def f():\n    import time\n    time.'
+    assert workers._complete_module_members(code, 2, 9) is None
+    code = 'import time\nprint(time.sl'
+    assert [m[0] for m in workers._complete_module_members(
+        code, 1, 13)] == ['sleep']
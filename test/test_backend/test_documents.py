@@ -0,0 +1,51 @@
+"""
+Test the backend document store.
+"""
+from pyqode.python.backend.documents import (
+    apply_edits, compute_edit, DocumentStore)
+
+
+def test_compute_edit():
+    assert compute_edit('foo', 'foo') is None
+    old = 'import os\nprint(os)\n'
+    for new in ['import os\nprint(os.path)\n', 'import sys\n' + old,
+                old + '\n', '', 'x', 'import os\n']:
+        edit = compute_edit(old, new)
+        assert apply_edits(old, [edit]) == new
+    assert compute_edit('aaa', 'aaaa') == (3, 3, 'a')
+
+
+def test_apply_edits():
+    assert apply_edits('foo', [(0, 0, 'x'), (4, 4, 'y')]) == 'xfooy'
+    try:
+        apply_edits('foo', [(2, 5, '')])
+    except ValueError:
+        pass
+    else:
+        assert False
+
+
+def test_document_store():
+    store = DocumentStore()
+    store.open('doc', 'print("foo")', 1)
+    assert store.get('doc') == 'print("foo")'
+    assert store.get('doc', 1) == 'print("foo")'
+    assert store.get('doc', 2) is None
+    assert store.update('doc', [(7, 10, 'bar')], 1, 2, length=12)
+    assert store.get('doc', 2) == 'print("bar")'
+    # wrong base version: the document must be opened again
+    assert not store.update('doc', [(0, 0, '#')], 1, 3)
+    assert store.get('doc') is None
+    # the editor sends the whole text of its last version again
+    store.open('doc', '#print("bar")', 3)
+    assert store.get('doc', 3) == '#print("bar")'
+    assert store.update('doc', [(0, 1, '')], 3, 4, length=12)
+    assert store.get('doc', 4) == 'print("bar")'
+    # length mismatch
+    store.open('doc', 'foo', 1)
+    assert not store.update('doc', [(0, 0, '#')], 1, 2, length=5)
+    assert store.get('doc') is None
+    assert not store.update('unknown', [], 0, 1)
+    store.open('doc', 'foo', 1)
+    store.close('doc')
+    assert len(store) == 0
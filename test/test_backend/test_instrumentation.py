@@ -0,0 +1,55 @@
+"""
+Test the instrumentation of the workers.
+"""
+import json
+
+import pytest
+
+from pyqode.python.backend import instrumentation
+from pyqode.python.backend import workers
+from pyqode.python.backend.cancellation import RequestCancelled
+
+
+def test_instrumented():
+    instrumentation.reset()
+
+    @instrumentation.instrumented()
+    def worker(request_data):
+        if request_data.get('fail'):
+            raise ValueError()
+        if request_data.get('cancel'):
+            raise RequestCancelled()
+        return [1, 2, 3]
+
+    assert worker({'code': 'foo'}) == [1, 2, 3]
+    with pytest.raises(ValueError):
+        worker({'fail': True})
+    with pytest.raises(RequestCancelled):
+        worker({'cancel': True})
+    stats = instrumentation.snapshot()['worker']
+    assert stats['count'] == 3
+    assert stats['errors'] == 1
+    assert stats['cancelled'] == 1
+    assert stats['input_size'] == 3
+    assert stats['result_size'] == 3
+    assert sum(count for _, count in stats['histogram']) == 3
+    assert stats['histogram'][-1][0] is None
+
+
+def test_get_stats(tmpdir):
+    workers.get_stats({'reset': True})
+    workers.run_pep8({'code': 'x=1\n', 'path': None,
+                      'max_line_length': 79, 'ignore_rules': []})
+    stats = workers.get_stats({})
+    assert stats['run_pep8']['count'] == 1
+    assert stats['run_pep8']['input_size'] == 4
+    assert stats['run_pep8']['result_size'] == 1
+    # the snapshots of the pool processes are merged
+    merged = instrumentation.merge([stats, stats, None])
+    assert merged['run_pep8']['count'] == 2
+    assert merged['run_pep8']['max_time'] == stats['run_pep8']['max_time']
+    assert sum(c for _, c in merged['run_pep8']['histogram']) == 2
+    path = str(tmpdir.join('stats.json'))
+    instrumentation.dump(path, merged)
+    with open(path) as f:
+        assert json.load(f)['run_pep8']['count'] == 2
@@ -0,0 +1,165 @@
+"""
+Test the incremental outline engine and the outline diffs.
+"""
+from pyqode.core.share import Definition
+from pyqode.python.backend import outline
+from pyqode.python.backend import workers
+from pyqode.python.backend.cache import LRUCache
+
+
+CODE = '''import os
+
+
+class Foo(object):
+    def spam(self, a):
+        pass
+
+    def eggs(self):
+        pass
+
+
+def bar():
+    x = 1
+    return x
+
+
+CONST = 2
+'''
+
+
+def _definition(name, line, children=(), column=0):
+    return {'name': name, 'line': line, 'column': column, 'icon': '',
+            'description': '', 'user_data': None, 'path': None,
+            'children': list(children)}
+
+
+def test_incremental_outline():
+    engine = outline.OutlineEngine(workers._jedi_definitions, LRUCache(100))
+    assert engine.outline(CODE) == workers._jedi_definitions(CODE, None)
+    nb_lines = engine.analysed_lines
+    edits = [
+        CODE.replace('CONST = 2', 'CONST = 3\nOTHER = 4'),
+        CODE.replace('    x = 1\n', '    x = 1\n    y = 2\n'),
+        CODE.replace('class Foo', 'class Bar'),
+        # syntax error: only the modified part is analysed again
+        CODE.replace('def bar():', 'def bar(:'),
+        CODE + 'def baz(\n',
+        CODE,
+    ]
+    for code in edits:
+        assert engine.outline(code) == workers._jedi_definitions(code, None)
+        assert engine.analysed_lines < nb_lines
+
+
+def test_diff():
+    old = [_definition('Foo', 0, [_definition('spam(self)', 1),
+                                  _definition('eggs(self)', 3)]),
+           _definition('bar()', 6), _definition('x', 8)]
+    new = [_definition('Foo', 0, [_definition('spam(self)', 1),
+                                  _definition('ham(self)', 3),
+                                  _definition('eggs(self)', 5)]),
+           _definition('x', 7), _definition('x', 9, [_definition('y', 10)])]
+    changes = outline.diff(old, new)
+    assert changes['removed'] == ['/bar()']
+    assert [(a['key'], a['parent'], a['index']) for a in changes['added']] == [
+        ('/Foo/ham(self)', '/Foo', 1), ('/x#1', '', 2)]
+    assert [(m['key'], m['line']) for m in changes['moved']] == [
+        ('/Foo/eggs(self)', 5), ('/x', 7)]
+    assert changes['changed'] == []
+    assert outline.is_empty(outline.diff(new, new))
+
+    definitions = [Definition.from_dict(d) for d in old]
+    foo = definitions[0]
+    patched = outline.apply_diff(definitions, changes, Definition.from_dict)
+    assert [d.to_dict() for d in patched] == new
+    # the definitions that did not change are kept
+    assert patched[0] is foo
+
+
+def test_defined_names_diff():
+    workers.outline_engines.clear()
+    request = {'code': CODE, 'path': None, 'document_id': 'outline'}
+    results = workers.defined_names_diff(request)
+    assert results['definitions'] == workers._jedi_definitions(CODE, None)
+    version = results['version']
+    request = dict(request, outline_version=version,
+                   code=CODE.replace('CONST', 'CONSTANT'))
+    results = workers.defined_names_diff(request)
+    assert results['base_version'] == version
+    assert results['version'] != version
+    assert results['diff']['removed'] == ['/CONST']
+    new_version = results['version']
+    # unknown base version: the whole outline is returned
+    results = workers.defined_names_diff(dict(request, outline_version=None))
+    assert 'diff' not in results
+    assert results['version'] == new_version
+
+
+def test_defined_names_diff_processes(monkeypatch):
+    # two processes of a worker pool handle the requests of a document
+    engines = [LRUCache(8), LRUCache(8)]
+    request = {'code': CODE, 'path': None, 'document_id': 'outline'}
+    versions = []
+    for process_engines in engines:
+        monkeypatch.setattr(workers, 'outline_engines', process_engines)
+        versions.append(workers.defined_names_diff(request)['version'])
+    assert versions[0] != versions[1]
+    # the second process receives a request based on the outline of the
+    # first one: the whole outline is sent again
+    code = CODE.replace('CONST', 'CONSTANT')
+    results = workers.defined_names_diff(
+        dict(request, code=code, outline_version=versions[0]))
+    assert 'diff' not in results
+    assert results['definitions'] == workers._jedi_definitions(code, None)
+    assert results['version'] not in versions
+
+
+def _tree(nodes):
+    return [(n['name'], n['type'], n['line'], n['column'], n['params'],
+             _tree(n['children'])) for n in nodes]
+
+
+def test_parse_outline():
+    code = CODE + '''
+for i, (j, *k) in enumerate([]):
+    l = m = i
+
+
+@decorator
+async def coroutine(a, b=f(c), *args, d, **kwargs):
+    def inner(e):
+        local = 1
+'''
+    assert _tree(outline.parse_outline(code)) == [
+        ('Foo', 'class', 3, 6, None, [
+            ('spam', 'function', 4, 8, ['self', 'a'], []),
+            ('eggs', 'function', 7, 8, ['self'], [])]),
+        ('bar', 'function', 11, 4, [], []),
+        ('CONST', 'statement', 16, 0, None, []),
+        ('i', 'statement', 18, 4, None, []),
+        ('j', 'statement', 18, 8, None, []),
+        ('k', 'statement', 18, 12, None, []),
+        ('l', 'statement', 19, 4, None, []),
+        ('m', 'statement', 19, 8, None, []),
+        ('coroutine', 'function', 23, 10,
+         ['a', 'b', 'args', 'd', 'kwargs'], [
+             ('inner', 'function', 24, 8, ['e'], [])]),
+    ]
+    # the outline of a code that cannot be parsed is extracted from its
+    # tokens
+    assert outline._tokenize_nodes(outline.split_lines(code)) == \
+        outline.parse_outline(code)
+    broken = code.replace('def bar():', 'def bar(:')
+    assert _tree(outline.parse_outline(broken))[:2] == _tree(
+        outline.parse_outline(code))[:2]
+
+
+def test_ast_provider():
+    workers.outline_engines.clear()
+    request = {'code': CODE, 'path': None, 'provider': 'ast'}
+    assert workers.defined_names(request) == workers._ast_definitions(
+        CODE, None)
+    names = [d['name'] for d in workers.defined_names(request)]
+    assert names == ['Foo', 'bar()', 'CONST']
+    assert [d['name'] for d in workers.defined_names(request)[0][
+        'children']] == ['spam(self, a)', 'eggs(self)']
@@ -0,0 +1,191 @@
+"""
+Test the multi-process worker pool.
+"""
+import pytest
+
+from pyqode.python.backend import pool
+from pyqode.python.backend import workers
+
+WORKERS = 'pyqode.python.backend.workers.'
+
+
+@pytest.fixture
+def worker_pool():
+    worker_pool = pool.WorkerPool(lint_processes=2)
+    worker_pool.start()
+    yield worker_pool
+    worker_pool.stop()
+
+
+def test_routing(worker_pool):
+    assert worker_pool.submit(WORKERS + 'calltips', {})[0].job_id is not None
+    lint_lane = worker_pool.lanes[pool.LANE_LINT]
+    jobs = worker_pool.submit(WORKERS + 'run_pep8', {
+        'code': 'x=1\n', 'path': None, 'max_line_length': 79,
+        'ignore_rules': []})
+    assert len(jobs) == 1
+    results = worker_pool.wait(jobs)
+    assert len(results) == 1
+    assert results[0][0].startswith('[PEP8] E225')
+    assert [p.pending for p in lint_lane] == [0, 0]
+    # failing workers return None
+    assert worker_pool.run(WORKERS + 'unknown_worker', {}) is None
+
+
+def test_broadcast(worker_pool):
+    assert worker_pool.run(WORKERS + 'open_document', {
+        'document_id': 'doc', 'code': 'import os\n', 'version': 1,
+        'path': None})
+    assert worker_pool.run(WORKERS + 'update_document', {
+        'document_id': 'doc', 'edits': [(0, 0, 'x\n')], 'base_version': 1,
+        'version': 2})
+    # the shadow copy is available in all the processes
+    for process in worker_pool.executors:
+        results = process.submit(WORKERS + 'run_pyflakes', {
+            'document_id': 'doc', 'version': 2, 'path': None,
+            'encoding': 'utf-8'}).wait()
+        assert len(results) == 2
+    assert not worker_pool.run(WORKERS + 'update_document', {
+        'document_id': 'doc', 'edits': [], 'base_version': 1,
+        'version': 3})
+
+
+def test_sequencer():
+    sequencer = pool._Sequencer()
+    sequencer.release(1)
+    sequencer.wait(0)
+    sequencer.release(0)
+    # 1 was released before 0, the next ticket is 2
+    assert sequencer._next == 2
+
+
+def _send_request(port, worker, data):
+    import json
+    import socket
+    import struct
+    connection = socket.create_connection(('127.0.0.1', port))
+    message = json.dumps({'request_id': 'id', 'worker': worker,
+                          'data': data}).encode('utf-8')
+    connection.sendall(struct.pack('=I', len(message)) + message)
+    response = b''
+    while True:
+        data = connection.recv(4096)
+        if not data:
+            break
+        response += data
+    connection.close()
+    return json.loads(response[4:].decode('utf-8'))['results']
+
+
+def test_pool_server(worker_pool):
+    import argparse
+    import socket
+    import threading
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    server = pool.PoolServer(worker_pool, args=argparse.Namespace(port=port))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        results = _send_request(port, WORKERS + 'run_pep8', {
+            'code': 'x=1\n', 'path': None, 'max_line_length': 79,
+            'ignore_rules': []})
+        assert len(results) == 1
+        assert _send_request(port, WORKERS + 'unknown_worker', {}) == []
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_priorities():
+    queue = pool.JobQueue(aging_delay=0)
+    lint = pool.Job(WORKERS + 'run_pep8', {})
+    outline = pool.Job(WORKERS + 'defined_names', {})
+    goto = pool.Job(WORKERS + 'goto_assignments', {})
+    completion = pool.Job(
+        'pyqode.core.backend.workers.CodeCompletionWorker', {})
+    update = pool.Job(WORKERS + 'update_document', {})
+    unknown = pool.Job('foo.bar', {})
+    for job in (lint, outline, goto, completion, unknown, update):
+        queue.put(job)
+    stats = queue.stats()
+    assert stats['depth'] == {'sync': 1, 'interactive': 2, 'navigation': 1,
+                              'outline': 1, 'lint': 1, 'warmup': 0}
+    assert [queue.get() for _ in range(6)] == [
+        update, completion, unknown, goto, outline, lint]
+    stats = queue.stats()
+    assert stats['running'] == WORKERS + 'run_pep8'
+    assert stats['served']['interactive'] == 2
+    assert sum(stats['depth'].values()) == 0
+
+
+def test_document_order():
+    workers.open_document({'document_id': 'order', 'code': 'import os\n',
+                           'version': 1})
+    queue = pool.JobQueue(aging_delay=0)
+    lint = pool.Job(WORKERS + 'run_pyflakes', {
+        'document_id': 'order', 'version': 1, 'path': 'order.py',
+        'encoding': 'utf-8'})
+    update = pool.Job(WORKERS + 'update_document', {
+        'document_id': 'order', 'edits': [(0, 0, 'import sys\n')],
+        'base_version': 1, 'version': 2, 'length': 21})
+    calltips = pool.Job(WORKERS + 'calltips', {
+        'document_id': 'order', 'version': 2, 'line': 0, 'column': 0,
+        'path': 'order.py', 'encoding': 'utf-8'})
+    other = pool.Job(WORKERS + 'close_document', {'document_id': 'other'})
+    for job in (lint, update, calltips, other):
+        queue.put(job)
+    # the update of the document waits for the lint job made on the
+    # previous version, it only overtakes the jobs of the other documents
+    jobs = [queue.get() for _ in range(4)]
+    assert jobs == [other, lint, update, calltips]
+    results = dict((job, pool.run_worker(job.worker, job.data))
+                   for job in jobs)
+    assert results[lint] == [("[pyFlakes] 'os' imported but unused", 1, 0)]
+    assert results[update]
+    workers.close_document({'document_id': 'order'})
+
+
+def test_starvation_protection():
+    queue = pool.JobQueue(aging_delay=0.5)
+    lint = pool.Job(WORKERS + 'run_pep8', {})
+    queue.put(lint)
+    completion = pool.Job(WORKERS + 'calltips', {})
+    queue.put(completion)
+    assert queue.get() is completion
+    # the lint job waited long enough to be promoted to the interactive
+    # priority, it is run before the newer interactive jobs
+    lint.enqueued -= 10
+    completion = pool.Job(WORKERS + 'calltips', {})
+    update = pool.Job(WORKERS + 'update_document', {})
+    queue.put(completion)
+    queue.put(update)
+    assert queue.get() is update
+    assert queue.get() is lint
+    assert queue.get() is completion
+    assert queue.max_wait[pool.PRIORITY_LINT] >= 10
+
+
+def test_queue_stats(worker_pool):
+    import argparse
+    server = pool.PoolServer(worker_pool, args=argparse.Namespace(port=0))
+    try:
+        stats = pool.queue_stats()
+        assert len(stats[pool.LANE_LINT]) == 2
+        assert stats[pool.LANE_INTERACTIVE][0]['depth']['lint'] == 0
+    finally:
+        server.server_close()
+
+
+def test_gather_stats(worker_pool):
+    worker_pool.run(WORKERS + 'get_stats', {'reset': True})
+    for _ in range(2):
+        worker_pool.run(WORKERS + 'run_pep8', {
+            'code': 'x=1\n', 'path': None, 'max_line_length': 79,
+            'ignore_rules': []})
+    # the statistics of the two lint processes are merged
+    stats = worker_pool.run(WORKERS + 'get_stats', {})
+    assert stats['run_pep8']['count'] == 2
@@ -0,0 +1,82 @@
+"""
+Test the incremental parser used by run_pyflakes.
+"""
+import ast
+
+from pyqode.python.backend.pyflakesutils import (
+    IncrementalParser, split_lines)
+
+
+CODE = '''"""
+Module docstring
+"""
+import os
+
+
+@decorator
+def foo(a, b):
+    return a + b
+
+
+class Bar(object):
+    def spam(self):
+        pass
+
+x = 1; y = 2
+'''
+
+
+def _dump(tree):
+    return ast.dump(tree, include_attributes=True)
+
+
+def _check(parser, code):
+    tree = parser.parse(code)
+    assert _dump(tree) == _dump(ast.parse(code))
+
+
+def test_split_lines():
+    assert split_lines('a\nb\r\nc\rd\x0ce') == [
+        'a\n', 'b\r\n', 'c\r', 'd\x0ce']
+
+
+def test_incremental_parse():
+    parser = IncrementalParser()
+    _check(parser, CODE)
+    assert parser.parsed_lines == len(split_lines(CODE))
+    # modify a function body
+    code = CODE.replace('return a + b', 'return a - b')
+    _check(parser, code)
+    assert parser.parsed_lines == 5
+    # insert lines at the beginning (all following statements are shifted)
+    code = 'import sys\n\n' + code
+    _check(parser, code)
+    assert parser.parsed_lines < len(split_lines(code))
+    # append a method to the class
+    code = code.replace('        pass\n',
+                        '        pass\n\n    def eggs(self):\n'
+                        '        pass\n')
+    _check(parser, code)
+    # remove a whole function
+    code = code.replace('@decorator\ndef foo(a, b):\n    return a - b\n', '')
+    _check(parser, code)
+    # unchanged
+    _check(parser, code)
+    assert parser.parsed_lines == 0
+
+
+def test_incremental_syntax_error():
+    parser = IncrementalParser()
+    _check(parser, CODE)
+    code = CODE.replace('return a + b', 'return a +')
+    try:
+        parser.parse(code)
+    except SyntaxError as e:
+        assert e.lineno == 9
+    else:
+        assert False
+    _check(parser, CODE)
+    # appending an indented line to the last statement of a function can't be
+    # parsed on its own, the whole module is parsed again.
+    code = CODE.replace('        pass\n', '        pass\n\n    z = 3\n')
+    _check(parser, code)
@@ -0,0 +1,146 @@
+"""
+Test the project symbol index.
+"""
+import json
+import os
+import time
+
+from pyqode.python.backend import workers
+from pyqode.python.backend.symbols import (
+    SymbolIndex, bound_names, extract_symbols, imported_names, module_name,
+    resolve_import)
+
+
+def _write(path, code):
+    with open(path, 'w') as f:
+        f.write(code)
+
+
+def _make_project(root):
+    os.makedirs(os.path.join(str(root), 'pkg'))
+    _write(os.path.join(str(root), 'pkg', '__init__.py'), '')
+    _write(os.path.join(str(root), 'pkg', 'shapes.py'),
+           'ORIGIN = (0, 0)\n\n\nclass Shape(object):\n'
+           '    def area(self):\n        pass\n')
+    _write(os.path.join(str(root), 'pkg', 'utils.py'),
+           'def join(*paths):\n    pass\n')
+    return str(root)
+
+
+def test_module_name():
+    root = os.path.join('root', 'project')
+    assert module_name(os.path.join(root, 'pkg', 'mod.py'), root) == \
+        'pkg.mod'
+    assert module_name(os.path.join(root, 'pkg', '__init__.py'), root) == \
+        'pkg'
+
+
+def test_extract_symbols():
+    symbols = extract_symbols(
+        'X = 1\n\n\nclass Foo:\n    y = 2\n\n    def bar(self):\n'
+        '        z = 3\n', 'mod', 'mod.py')
+    assert symbols == [
+        ('X', 'mod.X', 'mod.py', 0, 0, 'statement'),
+        ('Foo', 'mod.Foo', 'mod.py', 3, 0, 'class'),
+        ('bar', 'mod.Foo.bar', 'mod.py', 6, 4, 'def')]
+
+
+def test_bound_names():
+    names = bound_names(
+        'import os\nfrom sys import path\n\n\ndef foo(a):\n'
+        '    for b in a:\n        c = b\n')
+    assert names == {'foo', 'a', 'b', 'c'}
+
+
+def test_imported_names():
+    names = imported_names(
+        'import os.path\nimport numpy as np\nfrom os.path import join\n'
+        'from . import shapes\nfrom ..utils import join as j\n'
+        'from sys import *\n\n\ndef foo():\n    import time\n')
+    assert names == {
+        'os': [('os', True)], 'np': [('numpy', True)],
+        'join': [('os.path.join', True)], 'shapes': [('.shapes', True)],
+        'j': [('..utils.join', True)], 'time': [('time', False)]}
+
+
+def test_resolve_import():
+    assert resolve_import('os.path', 'pkg.mod') == 'os.path'
+    assert resolve_import('.shapes.Shape', 'pkg.mod') == 'pkg.shapes.Shape'
+    assert resolve_import('.shapes', 'pkg', is_package=True) == 'pkg.shapes'
+    assert resolve_import('..utils', 'pkg.sub.mod') == 'pkg.utils'
+    assert resolve_import('...utils', 'pkg.mod') is None
+    assert resolve_import('.shapes', None) is None
+
+
+def test_symbol_index(tmpdir):
+    root = _make_project(tmpdir.join('project'))
+    cache_dir = str(tmpdir.join('cache'))
+    index = SymbolIndex(cache_dir=cache_dir)
+    index.set_root(root, background=False)
+    assert index.ready
+    assert len(index) == 3
+    shape, = index.lookup('Shape')
+    assert shape[1] == 'pkg.shapes.Shape'
+    assert shape[3] == 3
+    assert index.lookup('area')[0][1] == 'pkg.shapes.Shape.area'
+
+    # update on save
+    path = os.path.join(root, 'pkg', 'shapes.py')
+    _write(path, 'class Shape(object):\n    pass\n')
+    # make sure the mtime changes even on coarse grained file systems
+    os.utime(path, (time.time() + 10, time.time() + 10))
+    assert index.update_file(path)
+    assert index.lookup('area') == []
+    assert index.lookup('Shape')[0][3] == 0
+    assert not index.update_file(str(tmpdir.join('outside.py')))
+    # the index is saved later, in the background
+    index.flush()
+
+    # the index is persisted as json, in a private directory
+    assert os.stat(cache_dir).st_mode & 0o777 == 0o700
+    with open(index._cache_path()) as f:
+        assert json.load(f)['root'] == os.path.abspath(root)
+    index = SymbolIndex(cache_dir=cache_dir)
+    index.root = os.path.abspath(root)
+    index._load()
+    assert len(index) == 3
+    assert index.lookup('Shape')[0][3] == 0
+
+
+def test_goto_assignments_index(tmpdir):
+    root = _make_project(tmpdir.join('project'))
+    workers.symbol_index.cache_dir = None
+    workers.symbol_index.set_root(root, background=False)
+    try:
+        code = 'from pkg.shapes import Shape\n\nShape().area()\n'
+        results = workers.goto_assignments({
+            'code': code, 'line': 2, 'column': 0, 'path': None,
+            'encoding': 'utf-8'})
+        assert results == [(os.path.join(root, 'pkg', 'shapes.py'), 3, 0,
+                            'pkg.shapes.Shape')]
+        # attributes are resolved by jedi
+        assert workers._goto_symbol_index(code, 2, 9) is None
+        assert workers._goto_symbol_index(
+            'import os\nos . area\n', 1, 6) is None
+        # locally bound names are resolved by jedi
+        code = 'area = 1\narea\n'
+        results = workers.goto_assignments({
+            'code': code, 'line': 1, 'column': 0, 'path': None,
+            'encoding': 'utf-8'})
+        assert results[0][1] == 0
+        # names imported from another module are resolved by jedi
+        assert workers._goto_symbol_index(
+            'from os.path import join\njoin\n', 1, 0) is None
+        assert workers._goto_symbol_index(
+            'from pkg.utils import join\njoin\n', 1, 0) == [
+                (os.path.join(root, 'pkg', 'utils.py'), 0, 0,
+                 'pkg.utils.join')]
+        # relative imports
+        path = os.path.join(root, 'pkg', 'main.py')
+        assert workers._goto_symbol_index(
+            'from .utils import join\njoin\n', 1, 0, path)[0][3] == \
+            'pkg.utils.join'
+        assert workers._goto_symbol_index(
+            'from .utils import join\njoin\n', 1, 0) is None
+    finally:
+        workers.symbol_index.root = None
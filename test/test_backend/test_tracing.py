@@ -0,0 +1,49 @@
+"""
+Test the debug tracing.
+"""
+import json
+import logging
+
+from pyqode.python.backend import tracing
+
+
+class Unformattable(object):
+    def __repr__(self):
+        raise AssertionError('formatted while tracing is disabled')
+
+
+def test_disabled():
+    tracing.disable()
+    assert not tracing.is_enabled()
+    tracing.trace('event', value=Unformattable())
+
+
+def test_trace(tmpdir):
+    path = str(tmpdir.join('trace.log'))
+    tracing.enable(path, level=logging.INFO)
+    try:
+        assert tracing.is_enabled(logging.INFO)
+        assert not tracing.is_enabled(logging.DEBUG)
+        tracing.trace('debug_event', value=Unformattable())
+        tracing.trace('info_event', level=logging.INFO, value=[1, 2],
+                      obj=object)
+    finally:
+        tracing.disable()
+    with open(path) as f:
+        events = [json.loads(line) for line in f]
+    assert len(events) == 1
+    assert events[0]['event'] == 'info_event'
+    assert events[0]['value'] == [1, 2]
+    assert events[0]['obj'] == repr(object)
+
+
+def test_rotation(tmpdir):
+    path = str(tmpdir.join('trace.log'))
+    tracing.enable(path, max_bytes=1024, backup_count=2)
+    try:
+        for i in range(100):
+            tracing.trace('event', index=i)
+    finally:
+        tracing.disable()
+    assert sorted(f.basename for f in tmpdir.listdir()) == [
+        'trace.log', 'trace.log.1', 'trace.log.2']
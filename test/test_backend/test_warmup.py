@@ -0,0 +1,45 @@
+"""
+Test the backend warm-up stage.
+"""
+from pyqode.python.backend import pool, warmup, workers
+from pyqode.python.backend.diskcache import DiskCache
+
+
+def test_warm_up(tmpdir, monkeypatch):
+    cache = DiskCache(str(tmpdir.join('cache')))
+    monkeypatch.setattr(workers, 'module_cache', cache)
+    worker_pool = pool.WorkerPool(lint_processes=0)
+    worker_pool.start()
+    try:
+        for job in warmup.submit(worker_pool, ['sys', 'foo_bar_baz']):
+            assert job.wait(60)
+    finally:
+        worker_pool.stop()
+    status = workers.warmup_status({})
+    assert status['ready']
+    assert 'sys' in status['modules']
+    assert status['warmup_duration'] >= 0
+    assert status['ready_time'] >= status['warmup_duration']
+    # the members of the preloaded modules are cached
+    assert cache.get(('members', 'sys'))
+    workers.JediCompletionProvider.complete(
+        'import sys\nsys.', 1, 4, None, 'utf-8', '')
+    status = warmup.status()
+    first_completion_time = status['first_completion_time']
+    assert first_completion_time is not None
+    warmup.record_completion(10)
+    assert warmup.status()['first_completion_time'] == first_completion_time
+
+
+def test_warm_up_priority():
+    # the warm-up steps are run after the other requests, even the old ones
+    queue = pool.JobQueue(aging_delay=0.001)
+    steps = [pool.Job(pool.WARMUP_WORKER, data)
+             for data in warmup.steps(['sys'])]
+    for job in steps:
+        job.enqueued -= 10
+        queue.put(job)
+    lint = pool.Job('pyqode.python.backend.workers.run_lint', {})
+    queue.put(lint)
+    assert queue.get() is lint
+    assert [queue.get() for _ in steps] == steps
@@ -121,6 +121,54 @@ def test_run_pep8():
     assert messages[0][2] == 0
 
 
+def test_run_pep8_max_line_length():
+    code = 'x = "%s"\n' % ('a' * 80)
+    data = {'code': code, 'path': None, 'ignore_rules': []}
+    data['max_line_length'] = 79
+    assert len(workers.run_pep8(data)) == 1
+    data['max_line_length'] = 120
+    assert len(workers.run_pep8(data)) == 0
+    data['max_line_length'] = 79
+    data['ignore_rules'] = ['E501']
+    assert len(workers.run_pep8(data)) == 0
+
+
+def test_run_pep8_line_cache():
+    import pycodestyle
+    from pyqode.python.backend.pep8utils import CustomReport
+    with open(__file__) as f:
+        code = f.read()
+    code += 'def foo( a ,b):\n  return a+b ;\nclass Bar :\n pass\n'
+    data = {'code': code, 'path': None, 'max_line_length': 79,
+            'ignore_rules': []}
+    messages = workers.run_pep8(data)
+    assert messages
+    style_guide = workers._get_style_guide(
+        79, ['W291', 'W292', 'W293', 'W391'])
+    cache = style_guide.logical_line_cache
+    hits = cache.hits
+    # insert a line, the results of the other lines are reused
+    data['code'] = 'import os\n' + code
+    new_messages = workers.run_pep8(data)
+    assert cache.hits > hits
+    assert [(m, s, l + 1) for m, s, l in messages] == [
+        m for m in new_messages if m[2]]
+    # same results as an uncached style guide
+    reference = pycodestyle.StyleGuide(
+        parse_argv=False, config_file='', reporter=CustomReport,
+        max_line_length=79)
+    checker = pycodestyle.Checker(
+        lines=data['code'].splitlines(True), options=reference.options,
+        report=CustomReport(reference.options))
+    checker.check_all()
+    expected = sorted(
+        '%d:%s' % (line, code) for line, _, code, _, _ in
+        checker.report.get_file_results()
+        if code not in ('W291', 'W292', 'W293', 'W391'))
+    assert sorted('%d:%s' % (l + 1, m[7:11]) for m, _, l in new_messages) == \
+        expected
+
+
 def test_run_pyflakes():
     messages = workers.run_pyflakes(
         {'code': None, 'path': __file__, 'encoding': 'utf-8',
@@ -166,3 +214,86 @@ def test_make_icon():
     assert workers.icon_from_typename(Name(), 'FOO') is None
     assert workers.icon_from_typename('_protected', 'PARAM') is not None
     assert workers.icon_from_typename('__private', 'PARAM') is not None
+
+
+def test_register_icon(monkeypatch):
+    monkeypatch.setattr(workers, 'ICONS', dict(workers.ICONS))
+    assert workers.icon_from_typename('foo', 'NEW_TYPE') is None
+    workers.register_icon('new_type', workers.ICON_VAR)
+    assert workers.icon_from_typename('foo', 'new_type') == workers.ICON_VAR
+    workers.register_icon('function-prot', workers.ICON_FUNC)
+    assert workers.icon_from_typename('_foo', 'function') == \
+        workers.ICON_FUNC
+    workers.register_icon('function-prot', workers.ICON_FUNC_PROTECTED)
+    workers._icon_cache.clear()
+
+
+def test_script_cache():
+    workers.script_cache.clear()
+    data = {
+        'code': "import os\nos.path.join(",
+        'line': 1,
+        'column': len('os.path.join('),
+        'path': None
+    }
+    workers.calltips(data)
+    results = workers.calltips(data)
+    assert len(results) == 6
+    stats = workers.script_cache.stats()
+    assert stats['hits'] == 1
+    assert stats['entries'] == 1
+    # invalid positions are still reported on a cache hit
+    data['column'] = 100
+    assert workers.calltips(data) == []
+
+
+def test_document_sync():
+    code = "import os\nos.path.join(a)"
+    assert workers.open_document(
+        {'document_id': 'test', 'code': code, 'version': 1, 'path': None})
+    data = {
+        'document_id': 'test',
+        'version': 1,
+        'line': 1,
+        'column': len('os.path.join('),
+        'path': None
+    }
+    # the closing parenthesis is stripped on the backend side
+    assert len(workers.calltips(data)) == 6
+    assert workers.update_document(
+        {'document_id': 'test', 'edits': [(len(code), len(code), '\n')],
+         'base_version': 1, 'version': 2, 'length': len(code) + 1})
+    # outdated version
+    assert workers.calltips(data) == []
+    data['version'] = 2
+    assert len(workers.calltips(data)) == 6
+    messages = workers.run_pyflakes(
+        {'document_id': 'test', 'version': 2, 'path': None,
+         'encoding': 'utf-8'})
+    assert len(messages) == 1
+    workers.close_document({'document_id': 'test'})
+    assert workers.run_pyflakes(
+        {'document_id': 'test', 'version': 2, 'path': None,
+         'encoding': 'utf-8'}) == []
+
+
+def test_run_pyflakes_incremental():
+    with open(__file__, 'r', encoding='utf-8') as file:
+        code = file.read()
+    for code in [code, code.replace('import jedi', 'import jedi, os'),
+                 code + '\nprint(undefined_name)\n']:
+        data = {'code': code, 'path': __file__, 'encoding': 'utf-8'}
+        messages = workers.run_pyflakes(data)
+        data['incremental'] = False
+        assert messages == workers.run_pyflakes(data)
+
+
+def test_run_lint():
+    data = {'code': 'import sys; print("foo")\n', 'path': None,
+            'encoding': 'utf-8', 'max_line_length': 79, 'ignore_rules': []}
+    messages = workers.run_lint(data)
+    assert len(messages) == 2
+    pyflakes_messages = workers.run_pyflakes(data)
+    pep8_messages = workers.run_pep8(data)
+    assert sorted(messages) == sorted(pyflakes_messages + pep8_messages)
+    assert data['ignore_rules'] == []
@@ -0,0 +1,162 @@
+"""
+Test the highlighting engines of the python syntax highlighter
+"""
+import io
+
+from pyqode.core.api import TextBlockHelper
+from pyqode.qt.QtTest import QTest
+from pyqode.python.modes import sh
+
+from ..helpers import editor_open
+
+
+CODE = '\n'.join([
+    "import os.path as osp, sys as system  # as",
+    "from foo import (bar as baz,",
+    "                 spam)",
+    "",
+    "",
+    "@decorator",
+    "class Foo(object):",
+    '    """',
+    "    Docstring",
+    '    """',
+    "    def __init__(self, value=0x1f, *args):",
+    "        self.value = value or cls.default",
+    "        s = 'single \\",
+    "continued'",
+    '        d = "double \\',
+    'continued"',
+    "        return r'''raw''' + u'unicode' + " + '"' * 3,
+    '        triple' + '"' * 3 + ' if not None else -1.5e3',
+])
+
+
+def _highlight(engine, code):
+    results = []
+    state = sh.NORMAL
+    for line in code.splitlines():
+        result = engine(sh.PythonSH, line, state)
+        state = result[1]
+        results.append(result)
+    return results
+
+
+def test_engines():
+    with io.open(sh.__file__.replace('.pyc', '.py'), encoding='utf-8') as f:
+        module = f.read()
+    for code in (CODE, module):
+        reference = _highlight(sh.highlight_regex, code)
+        for engine in sh.ENGINES.values():
+            assert _highlight(engine, code) == reference
+
+
+def test_dispatch_engine():
+    results = _highlight(sh.highlight_dispatch, CODE)
+    ranges, state, docstring, import_stmt = results[0]
+    assert import_stmt == CODE.splitlines()[0]
+    assert (15, 2, 'namespace') in ranges
+    assert (27, 2, 'namespace') in ranges
+    assert results[5][0][1:] == [(0, 10, 'decorator')]
+    assert (6, 3, 'definition') in results[6][0]
+    assert results[7][1:3] == (sh.INSIDE_DQ3STRING, True)
+    assert results[9][1] == sh.NORMAL
+    assert (30, 3, 'self') in results[11][0]
+    assert results[12][1] == sh.INSIDE_SQSTRING
+    assert results[13][1] == sh.NORMAL
+    assert results[16][1] == sh.INSIDE_DQ3STRING
+
+
+def test_lookup_engine():
+    class Highlighter(sh.PythonSH):
+        WORDS = sh.make_word_sets(additional_keywords=['await'],
+                                  additional_builtins=['spam'])
+
+    ranges = sh.highlight_lookup(Highlighter, 'await spam(self.len, len)',
+                                 sh.NORMAL)[0]
+    # the builtins that follow a dot are attributes
+    assert ranges[1:] == [(0, 5, 'keyword'), (6, 4, 'builtin'),
+                          (11, 4, 'self'), (21, 3, 'builtin')]
+
+
+def test_line_cache():
+    cache = sh.LineCache(max_lines=100)
+
+    def engine(highlighter, text, prev_state):
+        return cache.highlight(highlighter, text, prev_state, 'dispatch')
+
+    reference = _highlight(sh.highlight_dispatch, CODE)
+    for _ in range(2):
+        assert _highlight(engine, CODE) == [
+            (tuple(result[0]), ) + result[1:] for result in reference]
+    stats = cache.stats()
+    # the 2 empty lines of the code and the second run are served by the
+    # cache
+    assert stats['misses'] == len(reference) - 1
+    assert stats['hits'] == len(reference) + 1
+
+
+def test_block_regions():
+    regions = sh.BlockRegions()
+    for number in [1, 2, 3, 7, 5, 6, 10, 3]:
+        regions.add(number)
+    assert regions.regions() == [(1, 3), (5, 7), (10, 10)]
+    assert regions.regions(4, 9) == [(5, 7)]
+    assert 6 in regions and 4 not in regions
+    regions.discard(6)
+    assert regions.regions() == [(1, 3), (5, 5), (7, 7), (10, 10)]
+    # 2 blocks inserted after the block 2
+    regions.shift(2, 2)
+    assert regions.regions() == [(1, 2), (5, 5), (7, 7), (9, 9), (12, 12)]
+    # 3 blocks removed after the block 4
+    regions.shift(4, -3)
+    assert regions.regions() == [(1, 2), (6, 6), (9, 9)]
+    assert list(regions) == [1, 2, 6, 9] and len(regions) == 4
+    regions.clear()
+    assert not regions
+
+
+@editor_open(__file__)
+def test_lazy_highlighting(editor):
+    highlighter = editor.syntax_highlighter
+    highlighter.lazy_threshold = 1000
+    editor.setPlainText('x = 1\n' * 2000 + '"""\ndocstring\n"""\n')
+    # only the viewport has been highlighted
+    assert highlighter._lazy_cursor is not None
+    QTest.qWait(2000)
+    assert highlighter._lazy_cursor is None
+    block = editor.document().findBlockByNumber(2000)
+    assert TextBlockHelper.get_state(block) == sh.INSIDE_DQ3STRING
+    assert TextBlockHelper.get_state(block.next().next()) == sh.NORMAL
+
+
+@editor_open(__file__)
+def test_lazy_highlighting_propagation(editor):
+    highlighter = editor.syntax_highlighter
+    highlighter.lazy_threshold = 1000
+    calls = []
+    update_regions = highlighter._update_regions
+
+    def count_calls(block):
+        calls.append(block.blockNumber())
+        update_regions(block)
+
+    highlighter._update_regions = count_calls
+    try:
+        # the states of the deferred blocks must not propagate the changes
+        # made by the chunks (opening/closing a docstring) to all the
+        # following deferred blocks
+        editor.setPlainText(('def foo():\n    """\n    docstring\n    """\n'
+                             '    pass\n' + 'x = 1\n' * 5) * 500)
+        for _ in range(100):
+            if not highlighter.lazy_highlighting:
+                break
+            QTest.qWait(100)
+        assert not highlighter.lazy_highlighting
+        nb_blocks = editor.document().blockCount()
+        assert len(calls) < 5 * nb_blocks
+        block = editor.document().findBlockByNumber(nb_blocks - 10)
+        assert TextBlockHelper.get_state(block) == sh.INSIDE_DQ3STRING
+        assert nb_blocks - 10 in highlighter.docstrings
+    finally:
+        del highlighter._update_regions